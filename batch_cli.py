@@ -0,0 +1,327 @@
+# batch_cli.py
+"""
+Procesamiento por lotes sin interfaz gráfica.
+
+Ejecuta el mismo flujo que la aplicación de escritorio (detección de texto,
+mejora con Real-ESRGAN, sharpening y guardado) sobre una carpeta completa,
+sin Tkinter. Cada evento de progreso se emite como una línea JSON en la
+salida estándar; los mensajes informativos van a stderr.
+
+Códigos de salida:
+    0  Todas las imágenes se procesaron correctamente
+    1  Alguna imagen falló (el resto se procesó igualmente)
+    2  Error fatal (argumentos, carpetas, modelo)
+    130  Lote cancelado (Ctrl+C / SIGTERM) antes de terminar
+
+Con --vigilar el proceso queda en ejecución: procesa lo que ya hay en la
+carpeta de entrada y luego cada imagen nueva en cuanto termina de copiarse,
+con el modelo ya cargado (solo el primer nivel de la carpeta). Se detiene
+con Ctrl+C o SIGTERM. Sin --vigilar se recorren también las subcarpetas
+(--no-recursivo lo evita) y su estructura se replica en la salida.
+
+Con --nodo varios procesos o equipos que comparten las carpetas se reparten la
+entrada: cada uno reclama imágenes con archivos de reclamo junto a ellas y escribe
+su propio fragmento del log (Nodo_*.log); `python node_coordinator.py unir salida/`
+los une en el Imagenes_Procesadas_*.log de siempre.
+
+Ejemplo:
+    python batch_cli.py entrada/ salida/ --modelo x4plus --nitidez 1.2 --formato png
+    python batch_cli.py entrada/ salida/ --vigilar --espera-estable 3
+    python batch_cli.py /red/entrada /red/salida --nodo equipo1
+"""
+import os
+import sys
+import json
+import signal
+import argparse
+from datetime import datetime
+
+from startup import ARRANQUE
+
+FORMATOS_SALIDA = ("auto", "png", "jpg", "bmp", "tiff", "webp")
+
+EXIT_OK = 0
+EXIT_ERRORES_PARCIALES = 1
+EXIT_FATAL = 2
+EXIT_CANCELADO = 130
+
+
+class EmisorEventos:
+    """Escribe eventos de progreso como líneas JSON (una por evento)"""
+
+    def __init__(self, flujo):
+        self.flujo = flujo
+
+    def emitir(self, evento, **datos):
+        datos = {"evento": evento, "marca_tiempo": datetime.now().isoformat(timespec="seconds"), **datos}
+        self.flujo.write(json.dumps(datos, ensure_ascii=False) + "\n")
+        self.flujo.flush()
+
+
+def construir_parser(config):
+    parser = argparse.ArgumentParser(
+        description="Mejora por lotes con Real-ESRGAN sin interfaz gráfica."
+    )
+    parser.add_argument("entrada", help="Carpeta con las imágenes a procesar")
+    parser.add_argument("salida", help="Carpeta donde se guardan los resultados")
+    parser.add_argument("--modelo", default=config.get("modelo"),
+                        help="Modelo a utilizar (x4plus, x4plus_2, general_x4v3; con sufijo _int8 "
+                             "para la variante cuantizada, p. ej. x4plus_int8)")
+    parser.add_argument("--nitidez", type=float, default=config.get("nitidez", float),
+                        help="Nitidez para imágenes sin texto (0.0 a 3.0)")
+    parser.add_argument("--nitidez-texto", type=float, default=config.get("nitidez_texto", float),
+                        help="Nitidez para imágenes con texto (0.0 a 3.0)")
+    parser.add_argument("--deteccion-texto", action=argparse.BooleanOptionalAction,
+                        default=config.get("deteccion_texto", bool),
+                        help="Habilita la detección automática de texto")
+    parser.add_argument("--min-palabras", type=int, default=config.get("minimo_palabras_texto", int),
+                        help="Mínimo de palabras válidas para considerar que hay texto")
+    parser.add_argument("--formato", choices=FORMATOS_SALIDA, default="auto",
+                        help="Formato de salida ('auto' mantiene el de entrada)")
+    parser.add_argument("--memoria-max-mb", type=int, default=config.get("memoria_max_mb", int),
+                        help="Presupuesto de RAM para la inferencia; por encima se procesa por tiles (0 = sin límite)")
+    parser.add_argument("--memoria-total-mb", type=int, default=config.get("memoria_total_mb", int),
+                        help="Techo de RAM para el lote completo: se eligen orden, colas y tile para no "
+                             "superarlo y se informan antes de empezar las imágenes que no entran (0 = no planificar)")
+    parser.add_argument("--franjas-mp", type=float, default=config.get("franjas_mp", float),
+                        help="Salidas 4x de al menos estos megapíxeles se mejoran y guardan de a franjas en un "
+                             "TIFF, sin tener la imagen completa en memoria (0 = nunca)")
+    parser.add_argument("--perfil", choices=("rapido", "equilibrado", "compacto"),
+                        default=config.get("perfil_codificacion"),
+                        help="Perfil de guardado: compresión PNG/TIFF y calidad JPEG/WEBP (velocidad frente a tamaño)")
+    parser.add_argument("--hilos-codificacion", type=int, default=config.get("hilos_codificacion", int),
+                        help="Imágenes que se codifican y guardan a la vez en segundo plano")
+    parser.add_argument("--hilos-lectura", type=int, default=config.get("hilos_lectura", int),
+                        help="Imágenes que se leen y analizan (detección de texto) a la vez")
+    parser.add_argument("--lote", type=int, default=config.get("tamano_lote", int),
+                        help="Imágenes (o tiles) del mismo tamaño que pasan juntas por el modelo")
+    parser.add_argument("--salida-modo", choices=("escala", "lado_max", "mp_max"), default=None,
+                        help="Cómo se fija el tamaño de salida: factor de escala, lado mayor en píxeles o megapíxeles "
+                             "(requiere --salida-valor)")
+    parser.add_argument("--salida-valor", type=float, default=None,
+                        help="Valor para --salida-modo (p. ej. 2, 3000 o 12). Nunca se supera 4x")
+    parser.add_argument("--backend", choices=("eager", "torchscript", "compile"), default=None,
+                        help="Modo de inferencia en CPU (por defecto, el de la configuración)")
+    parser.add_argument("--hilos", type=int, default=None,
+                        help="Hilos de PyTorch para la inferencia (0 = valor por defecto de PyTorch)")
+    parser.add_argument("--bf16", choices=("auto", "1", "0"), default=None,
+                        help="Autocast bfloat16 en CPU ('auto' solo si la CPU lo soporta de forma nativa)")
+    parser.add_argument("--cache", action=argparse.BooleanOptionalAction, default=config.get("usar_cache", bool),
+                        help="Omite las imágenes ya procesadas con los mismos parámetros (reanuda lotes)")
+    parser.add_argument("--borrar-origen", action="store_true",
+                        help="Borra los archivos de origen procesados correctamente")
+    parser.add_argument("--jsonl", action=argparse.BooleanOptionalAction, default=config.get("log_jsonl", bool),
+                        help="Además del log CSV, escribe las métricas por imagen en un archivo .jsonl")
+    parser.add_argument("--recursivo", action=argparse.BooleanOptionalAction, default=config.get("recursivo", bool),
+                        help="Incluye las subcarpetas de la entrada; la estructura se replica en la salida")
+    parser.add_argument("--orden", choices=("nombre", "mayor_primero", "menor_primero"),
+                        default=config.get("orden_entrada"),
+                        help="Orden del lote: por nombre, mayores primero (reparte la carga) o menores primero "
+                             "(resultados tempranos)")
+    parser.add_argument("--vigilar", action="store_true",
+                        help="Queda vigilando la carpeta de entrada y procesa las imágenes nuevas")
+    parser.add_argument("--espera-estable", type=float, default=2.0,
+                        help="Segundos sin cambios para considerar que un archivo terminó de copiarse")
+    parser.add_argument("--nodo", nargs="?", const="", default=None,
+                        help="Modo multinodo: reparte la carpeta con otros procesos/equipos mediante archivos de "
+                             "reclamo. El nombre identifica al nodo en su fragmento del log (por defecto, equipo-pid)")
+    parser.add_argument("--latido-nodo", type=float, default=config.get("latido_nodo_s", float),
+                        help="Segundos entre renovaciones de los reclamos propios (modo multinodo)")
+    parser.add_argument("--expira-nodo", type=float, default=config.get("expira_nodo_s", float),
+                        help="Segundos sin renovarse tras los cuales el reclamo de otro nodo se da por abandonado")
+    return parser
+
+
+def main(argv=None):
+    # La salida estándar queda reservada para los eventos JSON: los print()
+    # de los demás módulos (configuración, Tesseract, etc.) van a stderr.
+    eventos = EmisorEventos(sys.stdout)
+    sys.stdout = sys.stderr
+
+    from config_manager import ConfigManager
+    from input_discovery import (EXTENSIONES_ENTRADA, descubrir_imagenes, ordenar, megapixeles_totales,
+                                 dimensiones_por_archivo)
+
+    config = ConfigManager()
+    parser = construir_parser(config)
+    args = parser.parse_args(argv)
+    if args.salida_modo is not None and args.salida_valor is None:
+        # El salida_valor del .ini es del modo del .ini (4 en escala serían 4 px en lado_max)
+        parser.error("--salida-modo requiere --salida-valor")
+
+    if not os.path.isdir(args.entrada):
+        eventos.emitir("error", mensaje=f"La carpeta de entrada no existe: {args.entrada}")
+        return EXIT_FATAL
+
+    if args.vigilar and args.nodo is not None:
+        eventos.emitir("error", mensaje="--vigilar y --nodo no se pueden combinar.")
+        return EXIT_FATAL
+    if args.nodo is not None and args.cache:
+        # El manifiesto de caché es uno por carpeta de salida y lo reescribiría cada nodo;
+        # en este modo las marcas de terminado cumplen su función (reanudar)
+        print("Modo multinodo: se desactiva la caché de resultados; las imágenes terminadas quedan marcadas")
+        args.cache = False
+
+    if args.vigilar:
+        if os.path.abspath(args.entrada) == os.path.abspath(args.salida):
+            eventos.emitir("error", mensaje="En modo vigilancia la carpeta de salida debe ser distinta de la de entrada.")
+            return EXIT_FATAL
+        archivos = None
+        encontradas = []
+    else:
+        # Sin decodificar: solo encabezados, para ordenar y conocer el total antes de la inferencia
+        encontradas = ordenar(descubrir_imagenes(args.entrada, args.recursivo, excluir=[args.salida]), args.orden)
+        archivos = [imagen.relativa for imagen in encontradas]
+        if not archivos:
+            eventos.emitir("error", mensaje="No hay imágenes válidas en la carpeta seleccionada.")
+            return EXIT_FATAL
+
+    try:
+        os.makedirs(args.salida, exist_ok=True)
+    except OSError as e:
+        eventos.emitir("error", mensaje=f"No se pudo crear la carpeta de salida: {e}")
+        return EXIT_FATAL
+
+    from enhancer import ImageEnhancer
+    from model_registry import configurar_registro
+    from inference_backend import backend_desde_config
+    from quantization import cuantizacion_desde_config
+    from output_policy import politica_desde_config
+    from pipeline import BatchPipeline, ControlLote, COLUMNAS_LOG, ERROR_ABANDONADA
+    from metrics_log import RegistroMetricas
+    from result_cache import ResultCache
+
+    configurar_registro(max_modelos=config.get("modelos_en_memoria", int))
+    try:
+        politica = politica_desde_config(config, args.salida_modo, args.salida_valor)
+    except ValueError as e:
+        eventos.emitir("error", mensaje=str(e))
+        return EXIT_FATAL
+
+    try:
+        backend = backend_desde_config(config, modo=args.backend, hilos=args.hilos, bf16=args.bf16)
+        enhancer = ImageEnhancer(memoria_max_mb=args.memoria_max_mb, tamano_lote=args.lote, backend=backend,
+                                 cuantizacion=cuantizacion_desde_config(config))
+        enhancer.load_model(args.modelo)
+        ARRANQUE.marcar("modelo_cargado")
+    except Exception as e:
+        eventos.emitir("error", mensaje=f"No se pudo cargar el modelo: {e}")
+        return EXIT_FATAL
+
+    # Ctrl+C / SIGTERM cancelan el lote; lo ya mejorado se termina de guardar
+    control = ControlLote()
+
+    def cancelar(signum, frame):
+        control.cancelar = True
+
+    signal.signal(signal.SIGINT, cancelar)
+    signal.signal(signal.SIGTERM, cancelar)
+
+    total = None
+    if args.vigilar:
+        from watch_folder import VigilanteCarpeta
+        vigilante = VigilanteCarpeta(args.entrada, EXTENSIONES_ENTRADA, espera_estable=args.espera_estable)
+        archivos = vigilante.archivos_nuevos(lambda: control.cancelar)
+    else:
+        total = len(archivos)
+
+    coordinador = None
+    if args.nodo is not None:
+        from node_coordinator import CoordinadorNodos, ruta_fragmento
+        coordinador = CoordinadorNodos(args.entrada, args.nodo or None, latido=args.latido_nodo,
+                                       expira=args.expira_nodo)
+        # Cada nodo escribe su fragmento; node_coordinator.py unir los junta al final
+        log_path = ruta_fragmento(args.salida, coordinador.nodo)
+    else:
+        # El log se escribe a medida que termina cada imagen (en vigilancia nunca hay un "final")
+        log_path = os.path.join(args.salida, datetime.now().strftime("Imagenes_Procesadas_%Y-%m-%d_%H-%M.log"))
+    registro = RegistroMetricas(
+        log_path, COLUMNAS_LOG,
+        ruta_jsonl=os.path.splitext(log_path)[0] + ".jsonl" if args.jsonl else None
+    )
+
+    eventos.emitir("inicio", total=total, entrada=args.entrada, salida=args.salida,
+                   modelo=args.modelo, backend=enhancer.descripcion_backend, salida_tamano=politica.clave(),
+                   perfil=args.perfil, megapixeles_total=None if args.vigilar else megapixeles_totales(encontradas),
+                   log=log_path,
+                   vigilancia=vigilante.modo if args.vigilar else None,
+                   nodo=coordinador.nodo if coordinador else None)
+
+    pipeline = BatchPipeline(
+        enhancer, args.entrada, args.salida, args.nitidez, args.nitidez_texto, args.deteccion_texto,
+        min_palabras=args.min_palabras, formato_salida=args.formato,
+        borrar_originales=args.borrar_origen, modelo=args.modelo, control=control,
+        cache=ResultCache(args.salida) if args.cache else None, politica_salida=politica,
+        franjas_mp=args.franjas_mp, perfil_codificacion=args.perfil, hilos_codificacion=args.hilos_codificacion,
+        max_mb_codificando=config.get("max_mb_codificando", int), hilos_lectura=args.hilos_lectura,
+        # Si otro nodo retomó la imagen (este proceso estuvo detenido), se abandona sin guardarla
+        abandonar=(lambda archivo: not coordinador.vigente(archivo)) if coordinador else None
+    )
+    contadores = {"procesadas": 0, "errores": 0}
+
+    rechazadas = []
+    if args.memoria_total_mb and not args.vigilar:
+        plan = pipeline.planificar(archivos, args.memoria_total_mb, dimensiones_por_archivo(encontradas))
+        eventos.emitir("planificacion", techo_mb=args.memoria_total_mb, **plan.resumen())
+        for archivo, mb_necesarios in plan.rechazadas:
+            eventos.emitir("no_cabe", archivo=archivo, mb_necesarios=mb_necesarios,
+                           techo_mb=args.memoria_total_mb)
+        archivos = plan.orden
+        rechazadas = [archivo for archivo, _ in plan.rechazadas]
+
+    if coordinador:
+        # Solo las que este nodo logra reclamar; las de otros se esperan hasta que terminen o venzan
+        rechazadas = [archivo for archivo in rechazadas if coordinador.reclamar(archivo)]
+        indice_rechazadas = len(archivos)
+        total = None        # La parte de cada nodo no se conoce de antemano
+        archivos = coordinador.archivos_reclamados(archivos, lambda: control.cancelar)
+    else:
+        indice_rechazadas = len(archivos) if archivos is not None else 0
+
+    def al_completar(trabajo):
+        if coordinador and trabajo.error != ERROR_ABANDONADA and not coordinador.completar(trabajo.nombre_archivo):
+            # Otro nodo la retomó justo al terminar: es suya, y esta salida sobra
+            if not trabajo.error and trabajo.ruta_salida and os.path.exists(trabajo.ruta_salida):
+                os.remove(trabajo.ruta_salida)
+            trabajo.error = ERROR_ABANDONADA
+        if trabajo.error == ERROR_ABANDONADA:
+            # La registra el nodo que la retomó
+            eventos.emitir("imagen", indice=trabajo.indice + 1, total=total, archivo=trabajo.nombre_archivo,
+                           estado="abandonada")
+            return
+        if not trabajo.error:
+            ARRANQUE.marcar("primera_imagen")
+        registro.escribir(trabajo.registro())
+        if trabajo.error:
+            contadores["errores"] += 1
+            eventos.emitir("imagen", indice=trabajo.indice + 1, total=total, archivo=trabajo.nombre_archivo,
+                           estado="error", codigo=trabajo.error, mensaje=trabajo.mensaje_error)
+        else:
+            contadores["procesadas"] += 1
+            eventos.emitir("imagen", indice=trabajo.indice + 1, total=total, archivo=trabajo.nombre_archivo,
+                           estado="ok", desde_cache=trabajo.desde_cache, salida=trabajo.nombre_salida, contiene_texto=trabajo.contiene_texto,
+                           etapa_deteccion=trabajo.etapa_texto, nitidez=trabajo.nivel_nitidez, tile=trabajo.tile,
+                           segundos=round((trabajo.hora_fin - trabajo.hora_inicio).total_seconds(), 3),
+                           tiempos=trabajo.tiempos, bytes=trabajo.bytes_escritos, perfil=trabajo.perfil_guardado)
+
+    try:
+        # Las que no entran en el techo se registran como error sin pasar por el pipeline
+        for indice, archivo in enumerate(rechazadas, start=indice_rechazadas):
+            al_completar(pipeline.trabajo_rechazado(indice, archivo))
+        pipeline.ejecutar(archivos, al_completar=al_completar)
+    finally:
+        registro.cerrar()
+        if coordinador:
+            # Lo reclamado y no terminado (p. ej. al cancelar) queda libre para otros nodos
+            coordinador.cerrar()
+
+    procesadas, errores = contadores["procesadas"], contadores["errores"]
+    eventos.emitir("fin", procesadas=procesadas, errores=errores, cancelado=control.cancelar, log=log_path,
+                   arranque=ARRANQUE.resumen())
+    if control.cancelar and not args.vigilar:
+        return EXIT_CANCELADO
+    return EXIT_ERRORES_PARCIALES if errores else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,343 @@
+# benchmark.py
+"""
+Benchmarks reproducibles de los caminos críticos (CPU).
+
+Genera entradas sintéticas (fotos con ruido, páginas con texto renderizado) en
+varias resoluciones, mide cada etapa por separado y el lote completo, y guarda
+los resultados en JSON. Con --baseline compara contra una corrida anterior y
+termina con código 1 si alguna etapa empeoró más que --tolerancia por ciento.
+
+Ejemplos:
+    python benchmark.py --salida bench.json
+    python benchmark.py --salida bench.json --baseline bench_base.json --tolerancia 15
+    python benchmark.py --sin-modelo --resoluciones 640x480 1920x1080
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import threading
+import statistics
+import tracemalloc
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from metrics_log import memoria_actual_mb, pico_memoria_mb
+from synthetic_inputs import generar_entradas
+
+EXIT_OK = 0
+EXIT_REGRESION = 1
+EXIT_FATAL = 2
+
+RESOLUCIONES_POR_DEFECTO = ["256x256", "640x480", "1280x960"]
+
+
+class MuestreoMemoria:
+    """Context manager que registra el RSS máximo observado mientras está activo"""
+
+    def __init__(self, intervalo=0.01):
+        self.intervalo = intervalo
+        self.pico_mb = None
+        self._detener = threading.Event()
+        self._hilo = threading.Thread(target=self._muestrear, daemon=True)
+
+    def _muestrear(self):
+        while not self._detener.is_set():
+            actual = memoria_actual_mb()
+            if actual is not None:
+                self.pico_mb = actual if self.pico_mb is None else max(self.pico_mb, actual)
+            self._detener.wait(self.intervalo)
+
+    def __enter__(self):
+        self._hilo.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._detener.set()
+        self._hilo.join()
+        if self.pico_mb is None:
+            self.pico_mb = pico_memoria_mb()
+
+
+def medir(funcion, entradas, repeticiones, calentamiento=1):
+    """
+    Ejecuta `funcion(imagen)` sobre todas las entradas `repeticiones` veces.
+
+    Returns:
+        dict con la mediana de segundos por pasada completa, imágenes/s, megapíxeles/s y pico de RSS
+    """
+    for _ in range(calentamiento):
+        funcion(entradas[0][1])
+
+    megapixeles = sum(imagen.shape[0] * imagen.shape[1] for _, imagen in entradas) / 1e6
+    tiempos = []
+    with MuestreoMemoria() as memoria:
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            for _, imagen in entradas:
+                funcion(imagen)
+            tiempos.append(time.perf_counter() - inicio)
+
+    resumen = resumir(tiempos, len(entradas), megapixeles, memoria.pico_mb)
+    resumen.update(medir_asignaciones(funcion, entradas))
+    return resumen
+
+
+def medir_asignaciones(funcion, entradas):
+    """
+    Pico de memoria asignada desde Python/NumPy (tracemalloc) por imagen, en una pasada aparte
+    para no afectar los tiempos. No incluye la memoria interna de PyTorch.
+    """
+    picos = []
+    tracemalloc.start()
+    try:
+        for _, imagen in entradas:
+            tracemalloc.reset_peak()
+            base = tracemalloc.get_traced_memory()[0]
+            funcion(imagen)
+            picos.append(tracemalloc.get_traced_memory()[1] - base)
+    finally:
+        tracemalloc.stop()
+    return {
+        "asignado_pico_mb_max": round(max(picos) / (1024 * 1024), 2),
+        "asignado_pico_mb_medio": round(statistics.mean(picos) / (1024 * 1024), 2),
+    }
+
+
+def resumir(tiempos, imagenes, megapixeles, pico_mb):
+    mediana = statistics.median(tiempos)
+    return {
+        "segundos_mediana": round(mediana, 5),
+        "segundos_min": round(min(tiempos), 5),
+        "repeticiones": len(tiempos),
+        "imagenes": imagenes,
+        "imagenes_por_seg": round(imagenes / mediana, 3) if mediana else None,
+        "megapixeles_por_seg": round(megapixeles / mediana, 3) if mediana else None,
+        "pico_rss_mb": pico_mb,
+    }
+
+
+def medir_lote(enhancer, entradas, repeticiones, modelo):
+    """Mide el lote completo (BatchPipeline) escribiendo las entradas como PNG en una carpeta temporal"""
+    from pipeline import BatchPipeline
+
+    carpeta = tempfile.mkdtemp(prefix="bench_mejora_")
+    try:
+        entrada = os.path.join(carpeta, "entrada")
+        os.makedirs(entrada)
+        for nombre, imagen in entradas:
+            cv2.imwrite(os.path.join(entrada, nombre + ".png"), imagen)
+        archivos = sorted(os.listdir(entrada))
+        megapixeles = sum(imagen.shape[0] * imagen.shape[1] for _, imagen in entradas) / 1e6
+
+        tiempos = []
+        with MuestreoMemoria() as memoria:
+            for i in range(repeticiones):
+                salida = os.path.join(carpeta, f"salida_{i}")
+                os.makedirs(salida)
+                pipeline = BatchPipeline(enhancer, entrada, salida, 1.0, 1.5, True,
+                                         formato_salida="png", modelo=modelo)
+                inicio = time.perf_counter()
+                pipeline.ejecutar(archivos)
+                tiempos.append(time.perf_counter() - inicio)
+                shutil.rmtree(salida, ignore_errors=True)
+
+        return resumir(tiempos, len(archivos), megapixeles, memoria.pico_mb)
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def medir_guardado(entradas, repeticiones, extension, perfil):
+    """Mide la codificación y escritura a disco con un perfil de encoder_pool; agrega el tamaño medio del archivo"""
+    from encoder_pool import codificar
+
+    carpeta = tempfile.mkdtemp(prefix="bench_guardado_")
+    try:
+        tamanos = {}
+
+        def guardar(imagen):
+            ruta = os.path.join(carpeta, f"{id(imagen)}{extension}")
+            tamanos[id(imagen)] = codificar(ruta, imagen, perfil)[1]
+
+        resumen = medir(guardar, entradas, repeticiones)
+        resumen["bytes_medio"] = round(statistics.mean(tamanos.values()))
+        return resumen
+    finally:
+        shutil.rmtree(carpeta, ignore_errors=True)
+
+
+def medir_importacion(modulo, repeticiones):
+    """
+    Mide en un intérprete nuevo cuánto tarda `import modulo` (p. ej. main_app, que
+    es todo lo que se importa antes de la primera ventana)
+
+    Raises:
+        RuntimeError: Si el módulo no se puede importar (p. ej. sin tkinter o sin pantalla)
+    """
+    codigo = f"import time; t = time.perf_counter(); import {modulo}; print(time.perf_counter() - t)"
+    carpeta = os.path.dirname(os.path.abspath(__file__))
+    tiempos = []
+    with MuestreoMemoria() as memoria:
+        for _ in range(repeticiones):
+            try:
+                salida = subprocess.run([sys.executable, "-c", codigo], cwd=carpeta, capture_output=True,
+                                        text=True, check=True)
+            except subprocess.CalledProcessError as e:
+                error = (e.stderr or "").strip().splitlines()
+                raise RuntimeError(error[-1] if error else f"código de salida {e.returncode}") from e
+            except OSError as e:
+                raise RuntimeError(str(e)) from e
+            tiempos.append(float(salida.stdout.strip().splitlines()[-1]))
+    return resumir(tiempos, 0, 0, memoria.pico_mb)
+
+
+def comparar(resultados, baseline, tolerancia):
+    """
+    Compara la mediana de cada etapa contra la baseline.
+
+    Returns:
+        list de (etapa, porcentaje_de_cambio, es_regresion)
+    """
+    comparacion = []
+    for etapa, actual in resultados["etapas"].items():
+        previo = baseline.get("etapas", {}).get(etapa)
+        if not previo or not previo.get("segundos_mediana"):
+            continue
+        cambio = (actual["segundos_mediana"] / previo["segundos_mediana"] - 1) * 100
+        comparacion.append((etapa, round(cambio, 1), cambio > tolerancia))
+    return comparacion
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de mejora, detección de texto y sharpening.")
+    parser.add_argument("--salida", default="benchmark_resultados.json", help="Archivo JSON de resultados")
+    parser.add_argument("--baseline", help="JSON de una corrida anterior contra el cual comparar")
+    parser.add_argument("--tolerancia", type=float, default=10.0,
+                        help="Empeoramiento máximo admitido por etapa, en porcentaje")
+    parser.add_argument("--resoluciones", nargs="+", default=RESOLUCIONES_POR_DEFECTO,
+                        help="Resoluciones de las entradas sintéticas (ANCHOxALTO)")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por etapa")
+    parser.add_argument("--semilla", type=int, default=1234, help="Semilla para generar las entradas")
+    parser.add_argument("--modelo", default="x4plus", help="Modelo para las etapas de mejora")
+    parser.add_argument("--backend", choices=("eager", "torchscript", "compile"), default="eager",
+                        help="Modo de inferencia en CPU")
+    parser.add_argument("--hilos", type=int, default=0, help="Hilos de PyTorch (0 = valor por defecto)")
+    parser.add_argument("--bf16", choices=("auto", "1", "0"), default="0",
+                        help="Autocast bfloat16 en CPU")
+    parser.add_argument("--sin-modelo", action="store_true",
+                        help="Omite las etapas que necesitan Real-ESRGAN (mejora y lote completo)")
+    args = parser.parse_args(argv)
+
+    from processor import ImageProcessor
+
+    entradas = generar_entradas(args.resoluciones, args.semilla)
+    resultados = {
+        "meta": {
+            "fecha": datetime.now().isoformat(timespec="seconds"),
+            "plataforma": platform.platform(),
+            "procesador": platform.processor(),
+            "python": platform.python_version(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "resoluciones": args.resoluciones,
+            "repeticiones": args.repeticiones,
+            "semilla": args.semilla,
+            "modelo": None if args.sin_modelo else args.modelo,
+        },
+        "etapas": {},
+        "omitidas": {},
+    }
+    etapas = resultados["etapas"]
+
+    print("→ Arranque (importación antes de la primera ventana)")
+    try:
+        etapas["importacion_interfaz"] = medir_importacion("main_app", args.repeticiones)
+    except RuntimeError as e:
+        print(f"No se pudo importar la interfaz ({e}); se omite la etapa de arranque", file=sys.stderr)
+        resultados["omitidas"]["importacion_interfaz"] = str(e)
+
+    print("→ Sharpen (sin texto / con texto)")
+    etapas["sharpen"] = medir(lambda img: ImageProcessor.aplicar_sharpen(img, 1.0, False), entradas, args.repeticiones)
+    etapas["sharpen_texto"] = medir(lambda img: ImageProcessor.aplicar_sharpen(img, 1.5, True), entradas, args.repeticiones)
+
+    print("→ Detección de texto")
+    etapas["deteccion_texto"] = medir(lambda img: ImageProcessor.detectar_texto(img, min_palabras=3),
+                                      entradas, args.repeticiones)
+
+    print("→ Guardado por formato y perfil")
+    for extension in (".png", ".jpg", ".webp"):
+        for perfil in ("rapido", "equilibrado", "compacto"):
+            etapas[f"guardado{extension.replace('.', '_')}_{perfil}"] = medir_guardado(
+                entradas, args.repeticiones, extension, perfil)
+
+    if not args.sin_modelo:
+        try:
+            from enhancer import ImageEnhancer
+            from inference_backend import ConfigBackend
+            backend = ConfigBackend(args.backend, hilos=args.hilos,
+                                    bf16=args.bf16 if args.bf16 == "auto" else args.bf16 == "1")
+            enhancer = ImageEnhancer(backend=backend)
+            enhancer.load_model(args.modelo)
+        except Exception as e:
+            print(f"No se pudo cargar el modelo ({e}); se omiten las etapas de mejora", file=sys.stderr)
+            resultados["omitidas"]["mejora"] = str(e)
+        else:
+            resultados["meta"]["dispositivo"] = enhancer.device
+            resultados["meta"]["backend"] = enhancer.descripcion_backend
+            print("→ Mejora (Real-ESRGAN)")
+            etapas["mejora"] = medir(lambda img: enhancer.enhance(img, args.modelo), entradas, args.repeticiones)
+
+            def mejora_y_sharpen(img):
+                # Mismo recorrido de buffers que el lote: sharpen en el lugar y buffer devuelto a la reserva
+                mejorada = enhancer.enhance(img, args.modelo)
+                ImageProcessor.aplicar_sharpen(mejorada, 1.0, False, destino=mejorada)
+                enhancer.liberar(mejorada)
+
+            etapas["mejora_y_sharpen"] = medir(mejora_y_sharpen, entradas, args.repeticiones)
+            print("→ Lote completo")
+            etapas["lote_completo"] = medir_lote(enhancer, entradas, args.repeticiones, args.modelo)
+
+    for etapa, datos in etapas.items():
+        print(f"  {etapa:<26} {datos['segundos_mediana']:>9.4f} s  "
+              f"{datos['imagenes_por_seg']:>8} img/s  {datos['megapixeles_por_seg']:>8} MP/s  "
+              f"pico {datos['pico_rss_mb']} MB  asignado/img {datos.get('asignado_pico_mb_max', '-')} MB"
+              + (f"  {datos['bytes_medio'] / 1024:.0f} KB/img" if "bytes_medio" in datos else ""))
+    for etapa, motivo in resultados["omitidas"].items():
+        print(f"  {etapa:<26} omitida: {motivo}")
+
+    codigo = EXIT_OK
+    if args.baseline:
+        try:
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        except Exception as e:
+            print(f"No se pudo leer la baseline: {e}", file=sys.stderr)
+            return EXIT_FATAL
+
+        comparacion = comparar(resultados, baseline, args.tolerancia)
+        resultados["comparacion"] = {
+            "baseline": args.baseline,
+            "tolerancia_pct": args.tolerancia,
+            "cambios_pct": {etapa: cambio for etapa, cambio, _ in comparacion},
+            "regresiones": [etapa for etapa, _, regresion in comparacion if regresion],
+        }
+        for etapa, cambio, regresion in comparacion:
+            print(f"  {'✗' if regresion else '✓'} {etapa}: {cambio:+.1f}% respecto de la baseline")
+        if resultados["comparacion"]["regresiones"]:
+            codigo = EXIT_REGRESION
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"Resultados guardados en {args.salida}")
+    return codigo
+
+
+if __name__ == "__main__":
+    sys.exit(main())
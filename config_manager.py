@@ -20,7 +20,32 @@ class ConfigManager:
             "deteccion_texto": "1",
             "modo_debug": "0",
             "minimo_palabras_texto": "2",
-            "idiomas": "spa+eng"
+            "idiomas": "spa+eng",
+            "memoria_max_mb": "4096",
+            "memoria_total_mb": "0",
+            "franjas_mp": "0",
+            "recursivo": "1",
+            "orden_entrada": "nombre",
+            "perfil_codificacion": "equilibrado",
+            "hilos_codificacion": "2",
+            "hilos_lectura": "2",
+            "max_mb_codificando": "1024",
+            "latido_nodo_s": "10",
+            "expira_nodo_s": "60",
+            "modelos_en_memoria": "2",
+            "tamano_lote": "4",
+            "backend": "eager",
+            "hilos": "0",
+            "hilos_interop": "0",
+            "bf16": "auto",
+            "modelo": "x4plus",
+            "salida_modo": "escala",
+            "salida_valor": "4",
+            "int8_psnr_min": "30.0",
+            "int8_ssim_min": "0.95",
+            "carpeta_calibracion": "",
+            "usar_cache": "1",
+            "log_jsonl": "0"
         }
 
     def load(self):
@@ -0,0 +1,49 @@
+# control_lote.py
+import threading
+
+
+class LoteCancelado(Exception):
+    """El lote se canceló en medio de una imagen; esa imagen se descarta sin registrarse"""
+
+    def __init__(self):
+        super().__init__("Lote cancelado")
+
+
+class ControlLote:
+    """Pausa/cancelación del lote, compartida entre hilos (la ventana de progreso, señales, etapas)"""
+
+    def __init__(self):
+        self._reanudado = threading.Event()
+        self._reanudado.set()
+        self._cancelado = threading.Event()
+
+    @property
+    def pausar(self):
+        return not self._reanudado.is_set()
+
+    @pausar.setter
+    def pausar(self, valor):
+        if valor and not self._cancelado.is_set():
+            self._reanudado.clear()
+        else:
+            self._reanudado.set()
+
+    @property
+    def cancelar(self):
+        return self._cancelado.is_set()
+
+    @cancelar.setter
+    def cancelar(self, valor):
+        if valor:
+            self._cancelado.set()
+            self._reanudado.set()       # Despierta a quien espere en una pausa
+
+    def esperar_reanudacion(self):
+        """Bloquea (sin sondeo) mientras esté en pausa. Devuelve True si se canceló el lote"""
+        self._reanudado.wait()
+        return self.cancelar
+
+    def punto_de_control(self):
+        """Para llamar entre unidades de trabajo (p. ej. tiles): espera la pausa y corta si se canceló"""
+        if self.esperar_reanudacion():
+            raise LoteCancelado()
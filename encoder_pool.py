@@ -0,0 +1,175 @@
+# encoder_pool.py
+import os
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+
+import cv2
+
+PERFILES_CODIFICACION = ("rapido", "equilibrado", "compacto")
+
+# Parámetros de cv2.imwrite por formato y perfil. WEBP se guarda con Pillow, que (a
+# diferencia de OpenCV) permite elegir el esfuerzo del compresor (`method`, 0 a 6).
+_PARAMETROS = {
+    ".png": {
+        "rapido": [cv2.IMWRITE_PNG_COMPRESSION, 1],
+        "equilibrado": [cv2.IMWRITE_PNG_COMPRESSION, 4],
+        "compacto": [cv2.IMWRITE_PNG_COMPRESSION, 9],
+    },
+    ".jpg": {
+        "rapido": [cv2.IMWRITE_JPEG_QUALITY, 92],
+        "equilibrado": [cv2.IMWRITE_JPEG_QUALITY, 95, cv2.IMWRITE_JPEG_OPTIMIZE, 1],
+        "compacto": [cv2.IMWRITE_JPEG_QUALITY, 88, cv2.IMWRITE_JPEG_OPTIMIZE, 1, cv2.IMWRITE_JPEG_PROGRESSIVE, 1],
+    },
+    ".tiff": {
+        # 1 = sin compresión, 5 = LZW, 8 = Deflate
+        "rapido": [cv2.IMWRITE_TIFF_COMPRESSION, 1],
+        "equilibrado": [cv2.IMWRITE_TIFF_COMPRESSION, 5],
+        "compacto": [cv2.IMWRITE_TIFF_COMPRESSION, 8],
+    },
+}
+_PARAMETROS[".jpeg"] = _PARAMETROS[".jpe"] = _PARAMETROS[".jpg"]
+_PARAMETROS[".tif"] = _PARAMETROS[".tiff"]
+
+_WEBP = {
+    "rapido": {"quality": 90, "method": 0},
+    "equilibrado": {"quality": 92, "method": 4},
+    "compacto": {"quality": 85, "method": 6},
+}
+
+
+def validar_perfil(perfil):
+    if perfil not in PERFILES_CODIFICACION:
+        raise ValueError(f"Perfil de codificación desconocido: {perfil}. Opciones válidas: {list(PERFILES_CODIFICACION)}")
+    return perfil
+
+
+def parametros_imwrite(extension, perfil):
+    """Flags de cv2.imwrite para la extensión (con punto) y el perfil; [] si el formato no tiene ajustes"""
+    return list(_PARAMETROS.get(extension.lower(), {}).get(perfil, []))
+
+
+def ruta_temporal(ruta):
+    """
+    Archivo oculto junto a `ruta` donde se escribe antes de renombrar. Conserva la
+    extensión (el codificador elige el formato por ella) y, por ser oculto, no lo
+    toma la búsqueda de imágenes de entrada.
+    """
+    carpeta, nombre = os.path.split(ruta)
+    return os.path.join(carpeta, f".{nombre}.parcial{os.path.splitext(nombre)[1]}")
+
+
+def codificar(ruta, imagen, perfil="equilibrado"):
+    """
+    Guarda la imagen BGR con los ajustes del perfil.
+
+    Se escribe en un temporal que se renombra al terminar: si el proceso se corta,
+    en `ruta` nunca queda un archivo a medio escribir.
+
+    Returns:
+        tuple: (segundos, bytes escritos)
+
+    Raises:
+        IOError: Si no se pudo guardar
+    """
+    validar_perfil(perfil)
+    inicio = time.perf_counter()
+    extension = os.path.splitext(ruta)[1].lower()
+    temporal = ruta_temporal(ruta)
+    try:
+        if extension == ".webp":
+            from PIL import Image
+            Image.fromarray(cv2.cvtColor(imagen, cv2.COLOR_BGR2RGB)).save(temporal, "WEBP", **_WEBP[perfil])
+        elif not cv2.imwrite(temporal, imagen, parametros_imwrite(extension, perfil)):
+            raise IOError(f"No se pudo guardar {os.path.basename(ruta)}")
+        os.replace(temporal, ruta)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+    return round(time.perf_counter() - inicio, 4), os.path.getsize(ruta)
+
+
+class ResultadoCodificacion:
+    def __init__(self, segundos=None, bytes_escritos=None, error=None):
+        self.segundos = segundos
+        self.bytes_escritos = bytes_escritos
+        self.error = error
+
+
+class CodificadorAsincrono:
+    def __init__(self, hilos=2, max_mb_en_vuelo=1024, perfil="equilibrado"):
+        """
+        Codifica y guarda imágenes en hilos de fondo (cv2.imwrite libera el GIL).
+
+        Los resultados se entregan en el mismo orden en que se enviaron. La memoria
+        retenida por imágenes pendientes de guardar se limita a `max_mb_en_vuelo`:
+        si no hay lugar, `enviar` espera a que terminen las más antiguas (siempre
+        se admite al menos una, aunque sola supere el límite).
+
+        Args:
+            hilos (int): Imágenes que se codifican a la vez
+            max_mb_en_vuelo (int): MB de imágenes enviadas y aún no guardadas
+            perfil (str): 'rapido', 'equilibrado' o 'compacto'
+        """
+        self.perfil = validar_perfil(perfil)
+        self.max_bytes_en_vuelo = max_mb_en_vuelo * 1024 * 1024
+        self._ejecutor = ThreadPoolExecutor(max_workers=max(1, hilos), thread_name_prefix="codificador")
+        self._pendientes = deque()      # (item, nbytes, futuro), en orden de envío
+        self._bytes_en_vuelo = 0
+
+    def enviar(self, item, ruta, imagen):
+        """
+        Encola el guardado de `imagen` en `ruta`. `imagen` no debe modificarse hasta que
+        su `item` vuelva como terminado.
+
+        Returns:
+            list: (item, ResultadoCodificacion) de los envíos ya terminados, en orden
+        """
+        terminados = []
+        while self._pendientes and self._bytes_en_vuelo + imagen.nbytes > self.max_bytes_en_vuelo:
+            terminados.append(self._esperar_primero())
+        futuro = self._ejecutor.submit(codificar, ruta, imagen, self.perfil)
+        self._pendientes.append((item, imagen.nbytes, futuro))
+        self._bytes_en_vuelo += imagen.nbytes
+        return terminados + self.listos()
+
+    def encolar_sin_guardado(self, item):
+        """
+        Encola un item que no hay que guardar (p. ej. desde caché o con error) para
+        que se entregue en su lugar, después de los envíos anteriores.
+
+        Returns:
+            list: Como `enviar`; el resultado de este item es un ResultadoCodificacion vacío
+        """
+        futuro = Future()
+        futuro.set_result(None)
+        self._pendientes.append((item, 0, futuro))
+        return self.listos()
+
+    def listos(self):
+        """(item, ResultadoCodificacion) de los envíos ya terminados, sin esperar y respetando el orden"""
+        terminados = []
+        while self._pendientes and self._pendientes[0][2].done():
+            terminados.append(self._esperar_primero())
+        return terminados
+
+    @property
+    def pendientes(self):
+        return len(self._pendientes)
+
+    def vaciar(self):
+        """Espera todos los guardados pendientes; devuelve sus (item, ResultadoCodificacion) en orden"""
+        return [self._esperar_primero() for _ in range(len(self._pendientes))]
+
+    def cerrar(self):
+        self._ejecutor.shutdown(wait=True)
+
+    def _esperar_primero(self):
+        item, nbytes, futuro = self._pendientes.popleft()
+        self._bytes_en_vuelo -= nbytes
+        try:
+            resultado = futuro.result()
+            return item, ResultadoCodificacion(*resultado) if resultado else ResultadoCodificacion()
+        except Exception as e:
+            return item, ResultadoCodificacion(error=e)
@@ -1,11 +1,29 @@
 # enhancer.py
 import os
 import sys
-import cv2
+import threading
 import numpy as np
-from PIL import Image
+import torch
 from realesrgan import RealESRGANer
 from basicsr.archs.rrdbnet_arch import RRDBNet
+from realesrgan.archs.srvgg_arch import SRVGGNetCompact
+
+from model_registry import REGISTRO_MODELOS, modelos_disponibles
+from inference_backend import (ConfigBackend, RedCPU, aplicar_hilos, describir_backend, elegir_dispositivo,
+                               optimizar_red, verificar_red)
+from output_policy import ESCALA_MODELO, reescalar
+from control_lote import LoteCancelado
+from quantization import (ConfigCuantizacion, es_variante_int8, modelo_base,
+                          obtener_variante_int8)
+
+# Memoria aproximada que consume RRDBNet en CPU por cada píxel de entrada
+# (mapas de características de 64 canales a 1x, 2x y 4x durante la inferencia)
+BYTES_POR_PIXEL_INFERENCIA = 10 * 1024
+TILE_MINIMO = 64
+# Tile de enhance_por_franjas cuando el presupuesto no obliga a usar uno más chico
+TILE_FRANJAS = 256
+# Buffers de salida que se conservan para reutilizar (uno en mejora, uno en cola, uno escribiéndose)
+MAX_BUFFERS_RESERVADOS = 3
 
 def resource_path(relative_path):
     """
@@ -56,33 +74,94 @@ def resource_path(relative_path):
 
     raise FileNotFoundError(f"No se pudo encontrar el recurso: {relative_path}")
 
+class ReservaBuffers:
+    def __init__(self, max_buffers=MAX_BUFFERS_RESERVADOS):
+        """
+        Buffers uint8 reutilizables para las salidas 4x.
+
+        En un lote de imágenes del mismo tamaño, la salida de una imagen ya
+        guardada se recicla como destino de la siguiente en lugar de pedir
+        otra vez cientos de MB al sistema.
+
+        Args:
+            max_buffers (int): Cantidad máxima de buffers retenidos
+        """
+        self.max_buffers = max_buffers
+        self._libres = []
+        self._lock = threading.Lock()
+
+    def obtener(self, forma):
+        """Devuelve un buffer libre con la forma pedida, o uno nuevo (sin inicializar)"""
+        with self._lock:
+            for i, buffer in enumerate(self._libres):
+                if buffer.shape == forma:
+                    return self._libres.pop(i)
+        return np.empty(forma, dtype=np.uint8)
+
+    def devolver(self, buffer):
+        """Marca `buffer` como libre. Quien lo devuelve no debe volver a usarlo"""
+        if buffer is None or buffer.dtype != np.uint8 or not buffer.flags.c_contiguous or buffer.base is not None:
+            return
+        with self._lock:
+            self._libres.append(buffer)
+            # Se descartan los más viejos (normalmente de otro tamaño)
+            del self._libres[:-self.max_buffers]
+
+
 class ImageEnhancer:
-    def __init__(self, weight_path='weights/RealESRGAN_x4plus.pth'):
+    def __init__(self, weight_path='weights/RealESRGAN_x4plus.pth', memoria_max_mb=0, solapamiento_tile=16,
+                 tamano_lote=1, backend=None, cuantizacion=None):
         """
         Inicializa el mejorador de imágenes.
         
         Args:
             weight_path (str): Ruta relativa al archivo de pesos del modelo.
                               Por defecto: 'weights/RealESRGAN_x4plus.pth'
+            memoria_max_mb (int): Presupuesto de RAM para la inferencia. Si la imagen
+                                  completa no entra, se procesa por tiles. 0 = sin límite
+            solapamiento_tile (int): Píxeles (en la entrada) que se solapan entre tiles
+                                     vecinos para fundir las costuras
+            tamano_lote (int): Máximo de imágenes (o tiles) del mismo tamaño que se pasan
+                               juntas por la red en una sola pasada
+            backend (ConfigBackend): Ajustes de inferencia en CPU (hilos, channels_last,
+                                     bf16, TorchScript / torch.compile). None = eager por defecto
+            cuantizacion (ConfigCuantizacion): Umbrales de calidad de las variantes int8
         """
-        self.device = 'cuda' if (cv2.cuda.getCudaEnabledDeviceCount() > 0) else 'cpu'
-        self.model_path = resource_path(weight_path)
+        self.device = elegir_dispositivo()
+        self.backend = backend if backend is not None else ConfigBackend()
+        if self.device == 'cpu':
+            aplicar_hilos(self.backend)
+        self.model_path = None
         self.model = None
-        self.available_models = {
-            'x4plus': resource_path('weights/RealESRGAN_x4plus.pth'),
-            'x4plus_2': resource_path('weights/RealESRGAN_x4plus_2.pth'),
-            'general_x4v3': resource_path('weights/realesr-general-x4v3.pth')
-        }
+        self.model_name = None
+        self.memoria_max_mb = memoria_max_mb
+        self.solapamiento_tile = solapamiento_tile
+        self.tamano_lote = max(1, int(tamano_lote))
+        self.ultimo_tile = 0
+        # ControlLote del lote en curso (lo asigna BatchPipeline): la pausa y la
+        # cancelación se atienden entre tiles, no solo entre imágenes
+        self.control = None
+        # El modelo y ultimo_tile son estado compartido: la vista previa y el lote
+        # pueden llamar a enhance desde hilos distintos
+        self._lock = threading.RLock()
+        self.reserva = ReservaBuffers()
+        self.cuantizacion = cuantizacion if cuantizacion is not None else ConfigCuantizacion()
+        # Incluye las variantes int8 (solo CPU), con los pesos del modelo fp32 del que derivan
+        self.available_models = modelos_disponibles(weight_path)
 
     def load_model(self, model_name='x4plus'):
         """
         Carga el modelo seleccionado.
         
+        El modelo se obtiene del registro global (REGISTRO_MODELOS): solo se
+        construye y se leen los pesos la primera vez; después queda en memoria.
+        
         Args:
             model_name (str): Nombre del modelo a cargar. Opciones:
                              - 'x4plus' (por defecto)
                              - 'x4plus_2'
                              - 'general_x4v3'
+                             - cualquiera de los anteriores con '_int8' (cuantizado, solo CPU)
         
         Raises:
             FileNotFoundError: Si no se encuentra el archivo de pesos
@@ -91,16 +170,40 @@ class ImageEnhancer:
         if model_name not in self.available_models:
             raise ValueError(f"Modelo desconocido: {model_name}. Opciones válidas: {list(self.available_models.keys())}")
         
-        self.model_path = self.available_models[model_name]
-        
-        if not os.path.exists(self.model_path):
+        try:
+            self.model_path = resource_path(self.available_models[model_name])
+        except FileNotFoundError:
             raise FileNotFoundError(
-                f"No se encontró el modelo en: {self.model_path}\n"
+                f"No se encontró el modelo en: {self.available_models[model_name]}\n"
                 f"Por favor asegúrese que el archivo .pth está en la carpeta weights/"
             )
 
         try:
-            model_rrdb = RRDBNet(
+            self.model = REGISTRO_MODELOS.obtener(
+                (self.model_path, self.device, es_variante_int8(model_name)) + self.backend.clave(),
+                lambda: self._construir_modelo(model_name, self.model_path)
+            )
+            self.model_name = model_name
+        except Exception as e:
+            raise Exception(f"Error al cargar el modelo: {str(e)}")
+
+    def _construir_modelo(self, model_name, model_path):
+        """Construye la red y lee los pesos desde disco (solo lo invoca el registro)"""
+        if es_variante_int8(model_name) and self.device != 'cpu':
+            raise ValueError(f"{model_name} es una variante int8: solo se puede usar en CPU")
+
+        if modelo_base(model_name) == 'general_x4v3':
+            # realesr-general-x4v3 usa la arquitectura compacta, no RRDBNet
+            red = SRVGGNetCompact(
+                num_in_ch=3,
+                num_out_ch=3,
+                num_feat=64,
+                num_conv=32,
+                upscale=4,
+                act_type='prelu'
+            )
+        else:
+            red = RRDBNet(
                 num_in_ch=3,
                 num_out_ch=3,
                 num_feat=64,
@@ -108,27 +211,42 @@ class ImageEnhancer:
                 num_grow_ch=32,
                 scale=4
             )
-            
-            self.model = RealESRGANer(
-                scale=4,
-                model_path=self.model_path,
-                model=model_rrdb,
-                tile=0,
-                tile_pad=10,
-                pre_pad=0,
-                half=False,
-                device=self.device
-            )
-        except Exception as e:
-            raise Exception(f"Error al cargar el modelo: {str(e)}")
 
-    def enhance(self, image_cv2, model_name='x4plus'):
+        upsampler = RealESRGANer(
+            scale=4,
+            model_path=model_path,
+            model=red,
+            tile=0,
+            tile_pad=10,
+            pre_pad=0,
+            half=False,
+            device=self.device
+        )
+        if es_variante_int8(model_name):
+            # La red fp32 recién cargada sirve para calibrar y como referencia de calidad
+            red_int8 = obtener_variante_int8(modelo_base(model_name), upsampler.model, model_path, self.cuantizacion)
+            verificar_red(red_int8, ESCALA_MODELO)
+            upsampler.model = RedCPU(red_int8, channels_last=False, bf16=False, modo="int8")
+        elif self.device == 'cpu':
+            upsampler.model = optimizar_red(upsampler.model, self.backend, model_path, escala=ESCALA_MODELO)
+        modo = getattr(upsampler.model, "modo", None)
+        print(f"Modelo {model_name} cargado ({describir_backend(self.device, self.backend, modo)})")
+        return upsampler
+
+    @property
+    def descripcion_backend(self):
+        """Backend efectivo (dispositivo, modo, hilos, formato y precisión), para la consola y el log"""
+        red = getattr(self.model, "model", None)
+        return describir_backend(self.device, self.backend, getattr(red, "modo", None))
+
+    def enhance(self, image_cv2, model_name='x4plus', outscale=None):
         """
         Mejora la imagen utilizando el modelo seleccionado.
         
         Args:
             image_cv2 (numpy.ndarray): Imagen en formato OpenCV (BGR)
             model_name (str): Nombre del modelo a usar (por defecto: 'x4plus')
+            outscale (float): Escala final respecto de la entrada (None = la del modelo, 4x)
         
         Returns:
             numpy.ndarray: Imagen mejorada en formato OpenCV (BGR)
@@ -137,20 +255,317 @@ class ImageEnhancer:
             Exception: Si hay errores durante el procesamiento
         """
         try:
-            if self.model is None or model_name not in self.available_models:
-                self.load_model(model_name)
-            
-            # Convertir de BGR (OpenCV) a RGB (PIL)
-            imagen_pil = Image.fromarray(cv2.cvtColor(image_cv2, cv2.COLOR_BGR2RGB))
-            imagen_np = np.array(imagen_pil)
-            
-            # Aplicar mejora
-            imagen_mejorada, _ = self.model.enhance(imagen_np)
-            
-            # Convertir de RGB a BGR
-            return cv2.cvtColor(imagen_mejorada, cv2.COLOR_RGB2BGR)
+            with self._lock:
+                if self.model is None or model_name != self.model_name:
+                    self.load_model(model_name)
+                
+                # RealESRGANer recibe y devuelve BGR (convierte a RGB internamente para la red):
+                # la imagen de OpenCV se pasa tal cual, sin conversiones ni copias intermedias.
+                # Por tiles si la imagen no entra en el presupuesto de memoria
+                self.ultimo_tile = self.calcular_tile(*image_cv2.shape[:2])
+                if self.ultimo_tile:
+                    imagen_mejorada = self._enhance_por_tiles(image_cv2, self.ultimo_tile)
+                else:
+                    self._punto_de_control()
+                    imagen_mejorada, _ = self.model.enhance(image_cv2)
+                return self._aplicar_outscale(imagen_mejorada, outscale)
             
+        except LoteCancelado:
+            raise
         except Exception as e:
             raise Exception(f"Error durante la mejora de imagen: {str(e)}")
+
+    def _aplicar_outscale(self, imagen_mejorada, outscale):
+        """
+        Lleva la salida 4x a la escala pedida. Es lo mismo que hace RealESRGANer con
+        `outscale`, pero sirve igual para la ruta por tiles y la de lotes (y reduce con INTER_AREA)
+        """
+        if not outscale or outscale == ESCALA_MODELO:
+            return imagen_mejorada
+        reducida = reescalar(imagen_mejorada, outscale / ESCALA_MODELO)
+        self.reserva.devolver(imagen_mejorada)
+        return reducida
+
+    def liberar(self, imagen_mejorada):
+        """
+        Devuelve a la reserva una salida de `enhance` que ya no se usa (p. ej. ya guardada),
+        para reutilizar su memoria con la próxima imagen del mismo tamaño.
+        """
+        self.reserva.devolver(imagen_mejorada)
+
+    def enhance_lote(self, imagenes, model_name='x4plus', outscale=None):
+        """
+        Mejora varias imágenes agrupando las de igual tamaño en una sola pasada de la red.
+        
+        Las imágenes que necesitan tiles, o que no son BGR de 8 bits, se procesan
+        de a una con `enhance` (sus tiles igualmente se agrupan).
+        
+        Args:
+            imagenes (list): Imágenes en formato OpenCV (BGR)
+            model_name (str): Nombre del modelo a usar
+            outscale (float): Escala final respecto de cada entrada (None = 4x)
+        
+        Returns:
+            list: Imágenes mejoradas (BGR), en el mismo orden que `imagenes`
+        """
+        try:
+            with self._lock:
+                if self.model is None or model_name != self.model_name:
+                    self.load_model(model_name)
+
+                resultados = [None] * len(imagenes)
+                completas = []
+                for i, imagen in enumerate(imagenes):
+                    if self._admite_lote(imagen) and not self.calcular_tile(*imagen.shape[:2]):
+                        completas.append(i)
+                    else:
+                        resultados[i] = self.enhance(imagen, model_name, outscale)
+
+                salidas = self._inferir_agrupado([imagenes[i] for i in completas], limitar_por_memoria=True)
+                for i, salida in zip(completas, salidas):
+                    resultados[i] = self._aplicar_outscale(salida, outscale)
+                return resultados
+
+        except LoteCancelado:
+            raise
+        except Exception as e:
+            raise Exception(f"Error durante la mejora del lote: {str(e)}")
+
+    def lote_admisible(self, alto, ancho):
+        """Cuántas imágenes completas de este tamaño pueden pasar juntas por la red sin exceder la memoria"""
+        if not self.memoria_max_mb:
+            return self.tamano_lote
+        presupuesto = self.memoria_max_mb * 1024 * 1024
+        por_imagen = alto * ancho * (3 * 4 + 3 * ESCALA_MODELO ** 2 + BYTES_POR_PIXEL_INFERENCIA)
+        return max(1, min(self.tamano_lote, presupuesto // por_imagen))
+
+    @staticmethod
+    def _admite_lote(imagen):
+        return imagen.ndim == 3 and imagen.shape[2] == 3 and imagen.dtype == np.uint8
+
+    def _inferir_lote(self, imagenes):
+        """
+        Pasa por la red un grupo de imágenes BGR uint8 de idéntica forma en un único tensor.
+        
+        Equivale a llamar a RealESRGANer.enhance con cada una (pre_pad=0 y escala 4,
+        así que no hay relleno previo), pero en una sola pasada hacia adelante.
+        """
+        if len(imagenes) == 1 or not all(self._admite_lote(i) for i in imagenes):
+            return [self.model.enhance(imagen)[0] for imagen in imagenes]
+
+        # BGR → RGB, NHWC → NCHW, [0, 255] → [0, 1]
+        lote = torch.from_numpy(np.ascontiguousarray(np.stack(imagenes)[..., ::-1]))
+        lote = lote.permute(0, 3, 1, 2).to(self.model.device).float().div_(255.0)
+        if self.model.half:
+            lote = lote.half()
+
+        with torch.no_grad():
+            salida = self.model.model(lote)
+
+        salida = salida.float().clamp_(0, 1).mul_(255.0).round_().to(torch.uint8)
+        salida = salida.permute(0, 2, 3, 1).flip(-1).cpu().numpy()
+        return list(salida)
+
+    def calcular_tile(self, alto, ancho):
+        """
+        Elige el tamaño de tile según el presupuesto de memoria y las dimensiones.
+        
+        Args:
+            alto (int): Alto de la imagen de entrada
+            ancho (int): Ancho de la imagen de entrada
         
-        
\ No newline at end of file
+        Returns:
+            int: Lado del tile en píxeles de entrada, o 0 si la imagen se procesa completa
+        """
+        if not self.memoria_max_mb:
+            return 0
+
+        presupuesto = self.memoria_max_mb * 1024 * 1024
+        disponible = presupuesto - self._memoria_fija(alto, ancho)
+
+        if alto * ancho * BYTES_POR_PIXEL_INFERENCIA <= disponible:
+            return 0
+
+        # Con lotes, `tamano_lote` tiles pasan juntos por la red
+        por_tile = max(disponible, 0) / self.tamano_lote
+        lado = int((por_tile / BYTES_POR_PIXEL_INFERENCIA) ** 0.5) - 2 * self.solapamiento_tile
+        lado = lado // 8 * 8
+        return max(lado, TILE_MINIMO)
+
+    @staticmethod
+    def _memoria_fija(alto, ancho):
+        """La entrada en float32 y la salida 4x en uint8 existen siempre, con o sin tiles"""
+        return alto * ancho * 3 * 4 + alto * ancho * 3 * ESCALA_MODELO ** 2
+
+    def memoria_inferencia(self, alto, ancho, tile=0):
+        """
+        Pico estimado (bytes) de mejorar una imagen, con el mismo modelo que usa calcular_tile.
+        
+        Args:
+            tile (int): Lado del tile; 0 = imagen completa, None = el tile más chico posible
+        """
+        if tile is None:
+            tile = TILE_MINIMO
+        if tile == 0 or (tile >= alto and tile >= ancho):
+            activaciones = alto * ancho
+        else:
+            lado = tile + 2 * self.solapamiento_tile
+            activaciones = self.tamano_lote * min(lado, alto) * min(lado, ancho)
+        return self._memoria_fija(alto, ancho) + activaciones * BYTES_POR_PIXEL_INFERENCIA
+
+    def memoria_por_franjas(self, alto, ancho, tile=None):
+        """
+        Pico estimado (bytes) de enhance_por_franjas más el sharpen y la escritura de cada franja.
+        
+        Args:
+            tile (int): Lado del tile; 0 = TILE_FRANJAS, None = el tile más chico posible
+        """
+        tile = TILE_MINIMO if tile is None else tile or TILE_FRANJAS
+        tile = min(tile, max(alto, ancho))
+        lado = tile + 2 * self.solapamiento_tile
+        banda = (tile + self.solapamiento_tile) * ESCALA_MODELO * ancho * ESCALA_MODELO * 3
+        activaciones = self.tamano_lote * min(lado, alto) * min(lado, ancho)
+        # Entrada en float32, y la banda del modelo, la ventana del sharpen, su resultado y la copia RGB
+        return alto * ancho * 3 * 4 + 4 * banda + activaciones * BYTES_POR_PIXEL_INFERENCIA
+
+    def _punto_de_control(self):
+        """Antes de cada pasada por la red: espera si el lote está en pausa y lanza LoteCancelado si se canceló"""
+        if self.control is not None:
+            self.control.punto_de_control()
+
+    def _inferir_agrupado(self, imagenes, limitar_por_memoria=False):
+        """
+        Infiere una lista de imágenes o recortes agrupando los de igual forma en lotes
+        de hasta `tamano_lote` (o de lo que admita el presupuesto de memoria, si se pide).
+        Entre lote y lote se atienden la pausa y la cancelación.
+        """
+        resultados = [None] * len(imagenes)
+        grupos = {}
+        for i, imagen in enumerate(imagenes):
+            grupos.setdefault(imagen.shape, []).append(i)
+        for forma, indices in grupos.items():
+            maximo = self.lote_admisible(*forma[:2]) if limitar_por_memoria else self.tamano_lote
+            for inicio in range(0, len(indices), maximo):
+                trozo = indices[inicio:inicio + maximo]
+                self._punto_de_control()
+                for i, salida in zip(trozo, self._inferir_lote([imagenes[i] for i in trozo])):
+                    resultados[i] = salida
+        return resultados
+
+    def _filas_de_tiles(self, imagen, tile):
+        """
+        Recorre la imagen por filas de tiles solapados y los pasa por la red.
+        
+        Cada tile incluye una franja de `solapamiento_tile` píxeles sobre sus vecinos
+        superior e izquierdo. Los tiles de igual forma de una misma fila pasan juntos por la red.
+        
+        Yields:
+            (ys, y0, y1, tiles): filas de entrada de la fila de tiles (ys incluye el
+            solapamiento) y la lista de (xs, x0, x1, salida 4x del tile recortada a [ys:y1, xs:x1])
+        """
+        alto, ancho = imagen.shape[:2]
+        solapamiento = self.solapamiento_tile
+        pad = self.model.tile_pad
+        for y0 in range(0, alto, tile):
+            y1 = min(y0 + tile, alto)
+            ys = max(y0 - solapamiento, 0)
+            fila = []
+            for x0 in range(0, ancho, tile):
+                x1 = min(x0 + tile, ancho)
+                xs = max(x0 - solapamiento, 0)
+
+                # Contexto extra alrededor del tile para evitar artefactos de borde (se recorta)
+                yp0, xp0 = max(ys - pad, 0), max(xs - pad, 0)
+                yp1, xp1 = min(y1 + pad, alto), min(x1 + pad, ancho)
+                fila.append((x0, x1, xs, yp0, xp0, imagen[yp0:yp1, xp0:xp1]))
+
+            mejorados = self._inferir_agrupado([t[-1] for t in fila])
+            yield ys, y0, y1, [
+                (xs, x0, x1, mejorado[
+                    (ys - yp0) * ESCALA_MODELO:(y1 - yp0) * ESCALA_MODELO,
+                    (xs - xp0) * ESCALA_MODELO:(x1 - xp0) * ESCALA_MODELO
+                ])
+                for (x0, x1, xs, yp0, xp0, _), mejorado in zip(fila, mejorados)
+            ]
+
+    @staticmethod
+    def _fundir(destino, mejorado, franja_y, franja_x):
+        """Escribe el tile en `destino`, mezclando con una rampa lineal las franjas ya escritas"""
+        if not franja_y and not franja_x:
+            destino[:] = mejorado
+            return
+
+        peso_y = np.ones(destino.shape[0], dtype=np.float32)
+        peso_x = np.ones(destino.shape[1], dtype=np.float32)
+        if franja_y:
+            peso_y[:franja_y] = (np.arange(franja_y, dtype=np.float32) + 0.5) / franja_y
+        if franja_x:
+            peso_x[:franja_x] = (np.arange(franja_x, dtype=np.float32) + 0.5) / franja_x
+        peso = (peso_y[:, None] * peso_x[None, :])[..., None]
+
+        mezcla = destino * (1.0 - peso) + mejorado * peso
+        destino[:] = np.clip(mezcla + 0.5, 0, 255).astype(np.uint8)
+
+    def _enhance_por_tiles(self, imagen, tile):
+        """
+        Procesa la imagen por tiles solapados y funde las costuras con una rampa lineal.
+        
+        Los tiles se recorren en orden de filas: en la franja de solapamiento con
+        sus vecinos superior e izquierdo (ya escritos) se mezcla gradualmente el
+        resultado anterior con el nuevo.
+        
+        Args:
+            imagen (numpy.ndarray): Imagen de entrada (H, W, 3)
+            tile (int): Lado del tile en píxeles de entrada
+        
+        Returns:
+            numpy.ndarray: Imagen escalada 4x
+        """
+        alto, ancho = imagen.shape[:2]
+        salida = self.reserva.obtener((alto * ESCALA_MODELO, ancho * ESCALA_MODELO, imagen.shape[2]))
+        for ys, y0, y1, tiles in self._filas_de_tiles(imagen, tile):
+            for xs, x0, x1, mejorado in tiles:
+                destino = salida[ys * ESCALA_MODELO:y1 * ESCALA_MODELO, xs * ESCALA_MODELO:x1 * ESCALA_MODELO]
+                self._fundir(destino, mejorado, (y0 - ys) * ESCALA_MODELO, (x0 - xs) * ESCALA_MODELO)
+        return salida
+
+    def tile_por_franjas(self, alto, ancho):
+        """Tile para enhance_por_franjas: el del presupuesto de memoria o, si la imagen entra completa, TILE_FRANJAS"""
+        return min(self.calcular_tile(alto, ancho) or TILE_FRANJAS, max(alto, ancho))
+
+    def enhance_por_franjas(self, imagen, model_name='x4plus'):
+        """
+        Mejora la imagen por tiles y entrega la salida 4x de a franjas horizontales,
+        sin reservar nunca la imagen 4x completa.
+        
+        Solo se conserva una banda de una fila de tiles (más el solapamiento con la
+        siguiente, que todavía se va a fundir). Cada franja entregada es una vista de
+        esa banda: hay que usarla (p. ej. escribirla a disco) antes de pedir la siguiente.
+        
+        Yields:
+            numpy.ndarray: Filas consecutivas de la imagen 4x (BGR), de arriba hacia abajo
+        """
+        with self._lock:
+            if self.model is None or model_name != self.model_name:
+                self.load_model(model_name)
+
+            alto, ancho = imagen.shape[:2]
+            tile = self.tile_por_franjas(alto, ancho)
+            self.ultimo_tile = tile
+            banda = np.empty(((tile + self.solapamiento_tile) * ESCALA_MODELO, ancho * ESCALA_MODELO, imagen.shape[2]),
+                             dtype=np.uint8)
+
+            for ys, y0, y1, tiles in self._filas_de_tiles(imagen, tile):
+                # banda[0] es la fila de salida ys*4; las filas [ys, y0) traen lo fundido en la fila anterior
+                for xs, x0, x1, mejorado in tiles:
+                    destino = banda[:(y1 - ys) * ESCALA_MODELO, xs * ESCALA_MODELO:x1 * ESCALA_MODELO]
+                    self._fundir(destino, mejorado, (y0 - ys) * ESCALA_MODELO, (x0 - xs) * ESCALA_MODELO)
+
+                if y1 == alto:
+                    yield banda[:(y1 - ys) * ESCALA_MODELO]
+                    return
+
+                # Lo que la próxima fila de tiles va a solapar todavía no es definitivo
+                siguiente = max(y1 - self.solapamiento_tile, 0)
+                yield banda[:(siguiente - ys) * ESCALA_MODELO]
+                banda[:(y1 - siguiente) * ESCALA_MODELO] = banda[(siguiente - ys) * ESCALA_MODELO:(y1 - ys) * ESCALA_MODELO]
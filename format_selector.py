@@ -6,16 +6,22 @@ import subprocess
 import tkinter as tk
 from tkinter import ttk, messagebox
 from datetime import datetime
-import cv2
 
-from processor import ZONA_HORARIA, ImageProcessor
+from pipeline import BatchPipeline, ControlLote, COLUMNAS_LOG
+from metrics_log import RegistroMetricas
 from progress_window import ProgressWindow
+from result_cache import ResultCache
+from encoder_pool import PERFILES_CODIFICACION
+from startup import ARRANQUE
 
 
 class FormatSelectorWindow:
     def __init__(self, root, archivos, carpeta_entrada, carpeta_salida,
                  nitidez, nitidez_texto, deteccion_texto, modo_debug,
-                 abrir_carpetas, borrar_origen, enhancer):
+                 abrir_carpetas, borrar_origen, enhancer, modelo='x4plus', usar_cache=True, log_jsonl=False,
+                 politica_salida=None, memoria_total_mb=0, franjas_mp=0, perfil_codificacion="equilibrado",
+                 hilos_codificacion=2, max_mb_codificando=1024, megapixeles_total=None, dimensiones=None,
+                 hilos_lectura=2):
         self.archivos = archivos
         self.carpeta_entrada = carpeta_entrada
         self.carpeta_salida = carpeta_salida
@@ -24,19 +30,35 @@ class FormatSelectorWindow:
         self.deteccion_texto = deteccion_texto
         self.modo_debug = modo_debug
         self.enhancer = enhancer
+        self.modelo = modelo
+        self.politica_salida = politica_salida
+        self.memoria_total_mb = memoria_total_mb
+        self.franjas_mp = franjas_mp
+        self.megapixeles_total = megapixeles_total
+        self.dimensiones = dimensiones
+        self.hilos_codificacion = hilos_codificacion
+        self.hilos_lectura = hilos_lectura
+        self.max_mb_codificando = max_mb_codificando
+        self.log_jsonl = log_jsonl
 
         self.var_abrir = tk.BooleanVar(value=abrir_carpetas)
         self.var_borrar = tk.BooleanVar(value=borrar_origen)
+        self.var_cache = tk.BooleanVar(value=usar_cache)
         self.formato_val = tk.StringVar(value="auto")
+        self.perfil_val = tk.StringVar(value=perfil_codificacion)
 
         self._construir_ventana(root)
 
     def _construir_ventana(self, root):
         self.ventana = tk.Toplevel(root)
         self.ventana.title("Mejorador de Imágenes Real-ESRGAN")
-        self.ventana.geometry("400x450")
+        self.ventana.geometry("400x535")
         self.ventana.resizable(False, False)
 
+        resumen = f"{len(self.archivos)} imágenes"
+        if self.megapixeles_total:
+            resumen += f" · {self.megapixeles_total:g} MP en total"
+        tk.Label(self.ventana, text=resumen, font=("Arial", 10)).pack(pady=(5, 0))
         tk.Label(self.ventana, text="Formato de salida:", font=("Arial", 12)).pack(pady=5)
 
         marco_formatos = tk.LabelFrame(self.ventana)
@@ -51,6 +73,13 @@ class FormatSelectorWindow:
         for texto, valor in opciones:
             tk.Radiobutton(marco_formatos, text=texto, variable=self.formato_val, value=valor).pack(anchor="w", padx=20)
 
+        marco_perfil = tk.Frame(self.ventana)
+        marco_perfil.pack(pady=2, padx=20, fill="x")
+        tk.Label(marco_perfil, text="Guardado:", font=("Arial", 10)).pack(side="left")
+        ttk.Combobox(marco_perfil, textvariable=self.perfil_val, state="readonly", width=14,
+                     values=PERFILES_CODIFICACION).pack(side="left", padx=5)
+        tk.Label(marco_perfil, text="(rápido → compacto)", font=("Arial", 9)).pack(side="left")
+
         marco_nitidez = tk.LabelFrame(self.ventana, text="Configuración de nitidez")
         marco_nitidez.pack(pady=5, padx=20, fill="both")
 
@@ -66,6 +95,9 @@ class FormatSelectorWindow:
         tk.Checkbutton(self.ventana, 
                       text="Borrar archivos de origen procesados correctamente",
                       variable=self.var_borrar).pack(anchor="w", padx=30)
+        tk.Checkbutton(self.ventana, 
+                      text="Omitir imágenes ya procesadas (reanudar lote)",
+                      variable=self.var_cache).pack(anchor="w", padx=30)
 
         estado = tk.Label(self.ventana, text="Esperando para comenzar...", font=("Arial", 10))
         estado.pack(pady=10)
@@ -89,82 +121,95 @@ class FormatSelectorWindow:
             return
 
         self.ventana.withdraw()
+        ARRANQUE.marcar("iniciar")
+        # La ventana se crea aquí, en el hilo de Tk; el hilo de proceso solo le envía eventos
+        progreso = ProgressWindow(self.ventana, ControlLote())
 
         # Usamos un hilo normal (no daemon) para evitar cierre prematuro
         self.proceso = threading.Thread(
             target=self._procesar_imagenes,
-            args=(self.formato_val.get(), self.var_abrir.get(), self.var_borrar.get())
+            args=(progreso, self.formato_val.get(), self.var_abrir.get(), self.var_borrar.get(),
+                  self.var_cache.get(), self.perfil_val.get())
         )
         self.proceso.start()
 
-    def _procesar_imagenes(self, formato_salida, abrir_carpetas, borrar_originales):
-        progreso = ProgressWindow(self.ventana)
-        sufijo = datetime.now().strftime("_mejorado_%Y-%m-%d_%H-%M")
+    def _procesar_imagenes(self, progreso, formato_salida, abrir_carpetas, borrar_originales, usar_cache,
+                           perfil_codificacion):
         log_path = os.path.join(self.carpeta_salida, datetime.now().strftime("Imagenes_Procesadas_%Y-%m-%d_%H-%M.log"))
 
-        log_lineas = ["Nombre_Imagen_Original;Nombre_Imagen_Procesada;Fecha;Hora_Inicio;Hora_Fin;Tiempo_Transcurrido (hh:mm:ss);Contiene_Texto;Nitidez_Aplicada"]
-
         try:
-            self.enhancer.load_model()
+            self.enhancer.load_model(self.modelo)
         except Exception as e:
-            messagebox.showerror("Error", f"No se pudo cargar el modelo: {e}")
+            progreso.finalizar(f"⛔ No se pudo cargar el modelo: {e}")
             return
 
-        try:
-            for i, nombre_archivo in enumerate(self.archivos):
-                if progreso.cancelar:
-                    break
-                while progreso.pausar:
-                    time.sleep(0.5)
-
-                progreso.actualizar_contador(i + 1, len(self.archivos))
-                progreso.actualizar_estado(f"Procesando: {nombre_archivo[:20]}...")
-                progreso.actualizar_progreso(10)
-
-                ruta_entrada = os.path.join(self.carpeta_entrada, nombre_archivo)
-                imagen = cv2.imread(ruta_entrada)
-                if imagen is None:
-                    continue
-
-                hora_inicio = datetime.now(ZONA_HORARIA)
-                contiene_texto = False
-
-                if self.deteccion_texto:
-                    progreso.actualizar_estado("Analizando texto...")
-                    progreso.actualizar_progreso(30)
-                    contiene_texto = ImageProcessor.detectar_texto(imagen, min_palabras=3, debug=self.modo_debug)
-
-                nivel_nitidez = self.nitidez_texto if contiene_texto else self.nitidez
-
-                progreso.actualizar_estado("Mejorando imagen...")
-                progreso.actualizar_progreso(60)
-                imagen_mejorada = self.enhancer.enhance(imagen)
-                imagen_mejorada = ImageProcessor.aplicar_sharpen(imagen_mejorada, nivel_nitidez, contiene_texto)
-
-                hora_fin = datetime.now(ZONA_HORARIA)
-                tiempo = hora_fin - hora_inicio
-
-                ext = os.path.splitext(nombre_archivo)[1] if formato_salida == "auto" else f".{formato_salida}"
-                nombre_salida = os.path.splitext(nombre_archivo)[0] + sufijo + ext
-                ruta_salida = os.path.join(self.carpeta_salida, nombre_salida)
-
-                try:
-                    progreso.actualizar_estado("Guardando resultado...")
-                    progreso.actualizar_progreso(90)
-                    cv2.imwrite(ruta_salida, imagen_mejorada)
-
-                    log_lineas.append(f"{nombre_archivo};{nombre_salida};{hora_inicio.strftime('%d/%m/%Y')};{hora_inicio.strftime('%H:%M:%S')};{hora_fin.strftime('%H:%M:%S')};{str(tiempo)};{'Sí' if contiene_texto else 'No'};{nivel_nitidez}")
-
-                    if borrar_originales and os.path.exists(ruta_salida):
-                        os.remove(ruta_entrada)
-                except Exception as e:
-                    log_lineas.append(f"{nombre_archivo};ERROR_AL_GUARDAR;{hora_inicio.strftime('%d/%m/%Y')};{hora_inicio.strftime('%H:%M:%S')};;;{contiene_texto};{nivel_nitidez}")
+        pipeline = BatchPipeline(
+            self.enhancer, self.carpeta_entrada, self.carpeta_salida,
+            self.nitidez, self.nitidez_texto, self.deteccion_texto,
+            min_palabras=3, modo_debug=self.modo_debug, formato_salida=formato_salida,
+            borrar_originales=borrar_originales, modelo=self.modelo, control=progreso.control,
+            cache=ResultCache(self.carpeta_salida) if usar_cache else None,
+            politica_salida=self.politica_salida, franjas_mp=self.franjas_mp,
+            perfil_codificacion=perfil_codificacion, hilos_codificacion=self.hilos_codificacion,
+            max_mb_codificando=self.max_mb_codificando, hilos_lectura=self.hilos_lectura
+        )
+        archivos = self.archivos
+        rechazadas = []
+        if self.memoria_total_mb:
+            plan = pipeline.planificar(archivos, self.memoria_total_mb, self.dimensiones)
+            archivos = plan.orden
+            rechazadas = [archivo for archivo, _ in plan.rechazadas]
+            if rechazadas:
+                detalle = "\n".join(f"• {archivo} ({mb} MB)" for archivo, mb in plan.rechazadas[:15])
+                if len(rechazadas) > 15:
+                    detalle += f"\n... y {len(rechazadas) - 15} más"
+                progreso.avisar(
+                    "Imágenes demasiado grandes",
+                    f"{len(rechazadas)} imagen(es) no entran en el límite de {self.memoria_total_mb} MB "
+                    f"ni procesándolas por tiles. Se omiten y quedan registradas en el log:\n\n{detalle}"
+                )
+        total = len(archivos)
+        # El total se conoce antes de empezar: la ETA vale desde la primera imagen terminada
+        progreso.actualizar_contador(0, total)
+        terminadas = 0
+
+        def al_avanzar(trabajo, mensaje, porcentaje):
+            progreso.actualizar_estado(f"Procesando: {trabajo.nombre_archivo[:20]}...")
+            progreso.actualizar_progreso(porcentaje)
+
+        # Cada imagen se registra en cuanto termina: un corte no pierde lo ya hecho
+        registro = RegistroMetricas(
+            log_path, COLUMNAS_LOG,
+            ruta_jsonl=os.path.splitext(log_path)[0] + ".jsonl" if self.log_jsonl else None
+        )
 
-                progreso.actualizar_progreso(100)
-                time.sleep(0.2)
+        def al_completar(trabajo):
+            # Se llama para todas: mejoradas, desde la caché y con error
+            nonlocal terminadas
+            terminadas += 1
+            progreso.actualizar_contador(terminadas, total)
+            segundos = None if trabajo.error else ARRANQUE.marcar("primera_imagen")
+            if segundos is not None:
+                # Con la precarga, desde "Iniciar" debería ser solo el tiempo de la imagen
+                print(f"Arranque: primera imagen a los {segundos:.2f} s "
+                      f"({segundos - ARRANQUE.segundos('iniciar'):.2f} s después de Iniciar)")
+            registro.escribir(trabajo.registro())
+            progreso.actualizar_progreso(100)
+            ancho, alto = trabajo.dimensiones_entrada or (0, 0)
+            progreso.imagen_completada(ancho * alto / 1e6, trabajo.tiempos)
 
-            with open(log_path, "w", encoding="utf-8") as log:
-                log.write("\n".join(log_lineas))
+        try:
+            try:
+                for indice, archivo in enumerate(rechazadas, start=len(archivos)):
+                    registro.escribir(pipeline.trabajo_rechazado(indice, archivo).registro())
+                completados = pipeline.ejecutar(archivos, al_avanzar=al_avanzar, al_completar=al_completar)
+            finally:
+                registro.cerrar()
+
+            if progreso.control.cancelar:
+                # Lo registrado queda en caché: al volver a ejecutar se retoma desde aquí
+                progreso.finalizar(f"⏹ Cancelado: {len(completados)} de {total} imágenes terminadas")
+                return
 
             if abrir_carpetas:
                 self._abrir_carpetas_robusto()
@@ -174,8 +219,9 @@ class FormatSelectorWindow:
             progreso.finalizar(f"⛔ Error: {str(e)}")
             return
         finally:
-            progreso.finalizar("✅ Proceso completado")
-            self.ventana.after(100, self.ventana.destroy)
+            # Si antes se informó un error, la ventana conserva ese mensaje
+            primera = ARRANQUE.segundos("primera_imagen")
+            progreso.finalizar("✅ Proceso completado" + (f" (1ª imagen a {primera:.1f} s)" if primera else ""))
 
     def _abrir_carpetas_robusto(self):
         """Método ultra-reforzado para apertura de carpetas"""
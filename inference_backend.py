@@ -0,0 +1,203 @@
+# inference_backend.py
+import os
+import sys
+
+import torch
+
+MODOS_BACKEND = ("eager", "torchscript", "compile")
+# Tamaño de la entrada de ejemplo para trazar la red (luego se verifica con otro tamaño)
+LADO_TRAZADO = 64
+
+
+def elegir_dispositivo():
+    """'cuda' solo si PyTorch realmente puede usarla; si no, 'cpu'"""
+    return "cuda" if torch.cuda.is_available() else "cpu"
+
+
+def soporta_bf16():
+    """
+    Indica si la CPU ejecuta bfloat16 de forma nativa (AVX512-BF16 / AMX).
+    En CPUs sin soporte, bf16 se emula y es más lento que float32.
+    """
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        pass
+    if sys.platform.startswith("linux"):
+        try:
+            with open("/proc/cpuinfo", encoding="utf-8") as f:
+                banderas = f.read()
+            return "avx512_bf16" in banderas or "amx_bf16" in banderas
+        except OSError:
+            pass
+    return False
+
+
+class ConfigBackend:
+    def __init__(self, modo="eager", hilos=0, hilos_interop=0, bf16="auto", channels_last=True):
+        """
+        Ajustes de inferencia en CPU.
+
+        Args:
+            modo (str): 'eager' (PyTorch normal), 'torchscript' (red trazada y congelada,
+                        guardada junto a los pesos) o 'compile' (torch.compile, con la caché
+                        de Inductor junto a los pesos)
+            hilos (int): Hilos intra-op de PyTorch (0 = valor por defecto de PyTorch)
+            hilos_interop (int): Hilos inter-op (0 = valor por defecto de PyTorch)
+            bf16 (str|bool): 'auto' usa autocast bfloat16 solo si la CPU lo soporta de forma nativa
+            channels_last (bool): Usar el formato de memoria NHWC en las convoluciones
+        """
+        if modo not in MODOS_BACKEND:
+            raise ValueError(f"Backend desconocido: {modo}. Opciones válidas: {list(MODOS_BACKEND)}")
+        self.modo = modo
+        self.hilos = hilos
+        self.hilos_interop = hilos_interop
+        self.bf16 = soporta_bf16() if bf16 == "auto" else bool(bf16)
+        self.channels_last = channels_last
+
+    def clave(self):
+        return (self.modo, self.bf16, self.channels_last)
+
+
+def backend_desde_config(config, **reemplazos):
+    """
+    Crea un ConfigBackend con los valores del archivo de configuración
+    (ConfigManager); `reemplazos` pisa los que no sean None (p. ej. argumentos de la CLI).
+    """
+    valores = {
+        "modo": config.get("backend"),
+        "hilos": config.get("hilos", int),
+        "hilos_interop": config.get("hilos_interop", int),
+        "bf16": config.get("bf16"),
+    }
+    valores.update({k: v for k, v in reemplazos.items() if v is not None})
+    if valores["bf16"] != "auto":
+        valores["bf16"] = str(valores["bf16"]) in ("1", "True", "true", "si", "sí")
+    return ConfigBackend(**valores)
+
+
+_hilos_configurados = False
+
+
+def aplicar_hilos(config):
+    """
+    Fija los hilos de PyTorch. Los inter-op solo se pueden fijar una vez por proceso
+    y antes de la primera operación en paralelo: tras el primer ajuste exitoso, los
+    intentos posteriores se ignoran (si falla, se reintenta en la próxima llamada).
+    """
+    global _hilos_configurados
+    if config.hilos:
+        torch.set_num_threads(config.hilos)
+    if config.hilos_interop and not _hilos_configurados:
+        try:
+            torch.set_num_interop_threads(config.hilos_interop)
+            _hilos_configurados = True
+        except RuntimeError as e:
+            print(f"Advertencia: no se pudieron fijar los hilos inter-op ({e})")
+
+
+def describir_backend(dispositivo, config, modo=None):
+    """Texto corto con el backend efectivo (`modo` si difiere del pedido), para la consola y el log"""
+    if dispositivo != "cpu":
+        return f"{dispositivo} eager"
+    partes = [f"cpu {modo or config.modo}",
+              f"hilos {torch.get_num_threads()}/{torch.get_num_interop_threads()}"]
+    if config.channels_last:
+        partes.append("channels_last")
+    partes.append("bf16" if config.bf16 else "fp32")
+    return ", ".join(partes)
+
+
+class RedCPU(torch.nn.Module):
+    def __init__(self, red, channels_last, bf16, modo="eager"):
+        """
+        Envuelve la red para que RealESRGANer (que llama a `model(tensor)`) use
+        channels_last y autocast bfloat16 sin cambiar nada más. La salida vuelve
+        siempre en float32 con el formato habitual. `modo` es el backend efectivo.
+        """
+        super().__init__()
+        self.red = red
+        self.modo = modo
+        self.channels_last = channels_last
+        self.bf16 = bf16
+
+    def forward(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format=torch.channels_last)
+        with torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.bf16):
+            salida = self.red(x)
+        return salida.float().contiguous()
+
+
+def _ruta_artefacto(ruta_pesos, config):
+    """Archivo de la red trazada, junto a los pesos y dependiente de todo lo que la afecta"""
+    version = torch.__version__.split("+")[0]
+    formato = "cl" if config.channels_last else "nchw"
+    tipo = "bf16" if config.bf16 else "fp32"
+    return f"{os.path.splitext(ruta_pesos)[0]}.torchscript-{version}-{formato}-{tipo}.pt"
+
+
+def _trazar(red, config, ruta_pesos):
+    """Carga la red trazada desde disco si ya existe y es más nueva que los pesos; si no, la traza y la guarda"""
+    ruta = _ruta_artefacto(ruta_pesos, config)
+    if os.path.exists(ruta) and os.path.getmtime(ruta) >= os.path.getmtime(ruta_pesos):
+        try:
+            return torch.jit.load(ruta, map_location="cpu")
+        except Exception as e:
+            print(f"Advertencia: artefacto TorchScript inválido ({e}); se vuelve a trazar")
+
+    ejemplo = torch.rand(1, 3, LADO_TRAZADO, LADO_TRAZADO)
+    if config.channels_last:
+        ejemplo = ejemplo.contiguous(memory_format=torch.channels_last)
+    with torch.no_grad(), torch.autocast("cpu", dtype=torch.bfloat16, enabled=config.bf16):
+        trazada = torch.jit.freeze(torch.jit.trace(red, ejemplo, check_trace=False).eval())
+
+    try:
+        torch.jit.save(trazada, ruta)
+    except Exception as e:
+        # Carpeta de pesos de solo lectura (p. ej. en el ejecutable empaquetado): se usa sin guardar
+        print(f"Advertencia: no se pudo guardar {ruta} ({e})")
+    return trazada
+
+
+def verificar_red(red, escala):
+    """Comprueba que la red (trazada o compilada) acepta otro tamaño de entrada"""
+    with torch.no_grad():
+        salida = red(torch.rand(1, 3, LADO_TRAZADO // 2, LADO_TRAZADO + 8))
+    esperado = (1, 3, LADO_TRAZADO // 2 * escala, (LADO_TRAZADO + 8) * escala)
+    if tuple(salida.shape) != esperado:
+        raise RuntimeError(f"forma de salida {tuple(salida.shape)}, se esperaba {esperado}")
+
+
+def optimizar_red(red, config, ruta_pesos, escala=4):
+    """
+    Prepara la red ya cargada (en CPU y en modo eval) según `config`.
+
+    Si el modo pedido falla (versión de PyTorch sin soporte, operador no trazable, ...)
+    se usa eager y se avisa por consola; el modo efectivo queda en el atributo `modo`
+    de la red devuelta.
+
+    Returns:
+        torch.nn.Module listo para usarse como `RealESRGANer.model`
+    """
+    red = red.eval()
+    if config.channels_last:
+        red = red.to(memory_format=torch.channels_last)
+
+    interna = red
+    try:
+        if config.modo == "torchscript":
+            interna = _trazar(red, config, ruta_pesos)
+        elif config.modo == "compile":
+            # Inductor guarda los kernels generados en disco: las corridas siguientes no recompilan
+            os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR",
+                                  os.path.join(os.path.dirname(ruta_pesos), ".torchinductor"))
+            os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+            interna = torch.compile(red, dynamic=True)
+        envuelta = RedCPU(interna, config.channels_last, config.bf16, config.modo)
+        if config.modo != "eager":
+            verificar_red(envuelta, escala)
+        return envuelta
+    except Exception as e:
+        print(f"Advertencia: backend '{config.modo}' no disponible ({e}); se usa eager")
+        return RedCPU(red, config.channels_last, config.bf16)
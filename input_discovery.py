@@ -0,0 +1,117 @@
+# input_discovery.py
+import os
+
+from PIL import Image
+
+# Formatos que cv2.imread decodifica con la compilación estándar de opencv-python
+EXTENSIONES_ENTRADA = (
+    ".png", ".jpg", ".jpeg", ".jpe", ".bmp", ".dib", ".tif", ".tiff", ".webp",
+    ".jp2", ".pbm", ".pgm", ".ppm", ".pnm", ".pxm", ".sr", ".ras", ".hdr", ".pic",
+)
+ORDENES = ("nombre", "mayor_primero", "menor_primero")
+
+
+def leer_dimensiones(ruta):
+    """
+    (ancho, alto) leídos del encabezado del archivo, sin decodificar los píxeles.
+
+    Returns:
+        tuple o None si el formato no se reconoce o el archivo está dañado
+    """
+    try:
+        with Image.open(ruta) as imagen:
+            return imagen.size
+    except Exception:
+        return None
+
+
+class ImagenEncontrada:
+    def __init__(self, relativa, bytes_archivo, dimensiones):
+        """
+        Args:
+            relativa (str): Ruta relativa a la carpeta de entrada (con subcarpetas)
+            bytes_archivo (int): Tamaño del archivo
+            dimensiones (tuple): (ancho, alto) del encabezado, o None si no se pudo leer
+        """
+        self.relativa = relativa
+        self.bytes_archivo = bytes_archivo
+        self.dimensiones = dimensiones
+
+    @property
+    def megapixeles(self):
+        if self.dimensiones is None:
+            return 0.0
+        return self.dimensiones[0] * self.dimensiones[1] / 1e6
+
+
+def dentro_de(ruta, carpeta):
+    """Si `ruta` es `carpeta` o está dentro de ella"""
+    ruta, carpeta = os.path.normcase(os.path.abspath(ruta)), os.path.normcase(os.path.abspath(carpeta))
+    return ruta == carpeta or ruta.startswith(carpeta.rstrip(os.sep) + os.sep)
+
+
+def descubrir_imagenes(carpeta, recursivo=True, excluir=(), extensiones=EXTENSIONES_ENTRADA):
+    """
+    Busca las imágenes de la carpeta (y sus subcarpetas) con os.scandir, leyendo
+    las dimensiones del encabezado de cada una.
+
+    Se omiten las carpetas ocultas y las de `excluir` (p. ej. la de salida, si está
+    dentro de la de entrada, para no volver a procesar los resultados).
+
+    Returns:
+        list de ImagenEncontrada, por ruta relativa
+    """
+    encontradas = []
+    pendientes = [carpeta]
+    while pendientes:
+        actual = pendientes.pop()
+        try:
+            with os.scandir(actual) as entradas:
+                for entrada in entradas:
+                    if entrada.name.startswith("."):
+                        continue
+                    if entrada.is_dir(follow_symlinks=False):
+                        if recursivo and not any(dentro_de(entrada.path, e) for e in excluir):
+                            pendientes.append(entrada.path)
+                    elif entrada.is_file() and entrada.name.lower().endswith(extensiones):
+                        encontradas.append(ImagenEncontrada(
+                            os.path.relpath(entrada.path, carpeta),
+                            entrada.stat().st_size,
+                            leer_dimensiones(entrada.path)
+                        ))
+        except OSError as e:
+            print(f"Advertencia: no se pudo leer la carpeta {actual} ({e})")
+    encontradas.sort(key=lambda i: i.relativa)
+    return encontradas
+
+
+def ordenar(imagenes, orden="nombre"):
+    """
+    'nombre': ruta relativa (el orden de siempre); 'mayor_primero': más megapíxeles
+    primero (reparte mejor la carga); 'menor_primero': resultados tempranos.
+    En ambos por tamaño, las de igual tamaño quedan juntas (se agrupan en lotes para
+    el modelo) y las de dimensiones desconocidas van al final.
+    """
+    if orden not in ORDENES:
+        raise ValueError(f"Orden desconocido: {orden}. Opciones válidas: {list(ORDENES)}")
+    if orden == "nombre":
+        return sorted(imagenes, key=lambda i: i.relativa)
+    mayor_primero = orden == "mayor_primero"
+
+    def clave(imagen):
+        if imagen.dimensiones is None:
+            return (1, 0, 0, imagen.relativa)
+        ancho, alto = imagen.dimensiones
+        area = ancho * alto
+        return (0, -area if mayor_primero else area, -alto if mayor_primero else alto, imagen.relativa)
+
+    return sorted(imagenes, key=clave)
+
+
+def megapixeles_totales(imagenes):
+    return round(sum(i.megapixeles for i in imagenes), 2)
+
+
+def dimensiones_por_archivo(imagenes):
+    """{ruta relativa: (ancho, alto)} de las que tienen dimensiones, para el planificador de memoria"""
+    return {i.relativa: i.dimensiones for i in imagenes if i.dimensiones is not None}
@@ -1,4 +1,6 @@
 # main.py
+# startup primero: su importación es el punto de partida de la medición del arranque
+import startup
 import sys
 import os
 from pathlib import Path
@@ -1,16 +1,12 @@
 # main_app.py
 import os
-import cv2
-import time
-import subprocess
-from datetime import datetime
 from tkinter import filedialog, messagebox
 
+# Solo módulos livianos: torch, basicsr, OpenCV y Tesseract se importan cuando hacen falta
 from config_manager import ConfigManager
-from enhancer import ImageEnhancer
-from preview_window import SharpnessPreviewWindow
-from format_selector import FormatSelectorWindow
-from processor import ZONA_HORARIA
+from model_registry import configurar_registro
+from input_discovery import descubrir_imagenes, ordenar, megapixeles_totales, dimensiones_por_archivo, dentro_de
+from startup import ARRANQUE, EnhancerDiferido
 
 
 class MainApp:
@@ -19,20 +15,41 @@ class MainApp:
         self.root.withdraw()
 
         self.config_manager = ConfigManager()
-        self.enhancer = ImageEnhancer()
+        configurar_registro(max_modelos=self.config_manager.get("modelos_en_memoria", int))
 
         self.nitidez = self.config_manager.get("nitidez", float)
         self.nitidez_texto = self.config_manager.get("nitidez_texto", float)
         self.deteccion_texto = self.config_manager.get("deteccion_texto", bool)
         self.modo_debug = self.config_manager.get("modo_debug", bool)
+        self.modelo = self.config_manager.get("modelo")
         self.abrir_carpetas = self.config_manager.get("abrir_carpetas", bool)
         self.borrar_origen = self.config_manager.get("borrar_origen", bool)
+        self.usar_cache = self.config_manager.get("usar_cache", bool)
+        self.log_jsonl = self.config_manager.get("log_jsonl", bool)
         self.entrada_previa = self.config_manager.get("entrada_reciente")
         self.salida_previa = self.config_manager.get("salida_reciente")
 
+        # El modelo se construye y carga mientras el usuario elige carpetas y ajusta la nitidez
+        self.enhancer = EnhancerDiferido(self._crear_enhancer, modelo=self.modelo, precargar=("pipeline",))
+
         self._iniciar()
 
+    def _crear_enhancer(self):
+        """Corre en el hilo de precarga: aquí se importan torch, basicsr y realesrgan"""
+        from enhancer import ImageEnhancer
+        from inference_backend import backend_desde_config
+        from quantization import cuantizacion_desde_config
+        return ImageEnhancer(
+            memoria_max_mb=self.config_manager.get("memoria_max_mb", int),
+            tamano_lote=self.config_manager.get("tamano_lote", int),
+            backend=backend_desde_config(self.config_manager),
+            cuantizacion=cuantizacion_desde_config(self.config_manager)
+        )
+
     def _iniciar(self):
+        segundos = ARRANQUE.marcar("primera_ventana")
+        if segundos is not None:
+            print(f"Arranque: primera ventana a los {segundos:.2f} s")
         carpeta_entrada = filedialog.askdirectory(
             title="Selecciona la carpeta de entrada",
             initialdir=self.entrada_previa if self.entrada_previa and os.path.exists(self.entrada_previa) else os.getcwd()
@@ -40,20 +57,29 @@ class MainApp:
         if not carpeta_entrada:
             return
 
-        archivos = [f for f in os.listdir(carpeta_entrada) if f.lower().endswith((".png", ".jpg", ".jpeg"))]
+        # Todas las subcarpetas y formatos que OpenCV decodifica; las dimensiones salen de los encabezados
+        encontradas = ordenar(
+            descubrir_imagenes(carpeta_entrada, self.config_manager.get("recursivo", bool)),
+            self.config_manager.get("orden_entrada")
+        )
+        archivos = [imagen.relativa for imagen in encontradas]
         if not archivos:
             messagebox.showerror("Error", "No hay imágenes válidas en la carpeta seleccionada.")
             return
 
         imagen_prueba = os.path.join(carpeta_entrada, archivos[0])
+        from preview_window import SharpnessPreviewWindow
 
-        def despues_de_nitidez(nit, nit_txt, det_texto, debug):
+        def despues_de_nitidez(nit, nit_txt, det_texto, debug, modelo):
             carpeta_salida = filedialog.askdirectory(
                 title="Selecciona la carpeta de salida",
                 initialdir=self.salida_previa if self.salida_previa and os.path.exists(self.salida_previa) else os.getcwd()
             )
             if not carpeta_salida:
                 return
+            # Si la salida está dentro de la entrada, sus archivos no son parte del lote
+            seleccion = [i for i in encontradas
+                         if not dentro_de(os.path.join(carpeta_entrada, i.relativa), carpeta_salida)]
 
             # Guardar configuración
             self.config_manager.save({
@@ -65,13 +91,16 @@ class MainApp:
                 "entrada_reciente": carpeta_entrada,
                 "salida_reciente": carpeta_salida,
                 "modo_debug": int(debug),
+                "modelo": modelo,
                 "minimo_palabras_texto": 3
             })
 
             # Mostrar selector de formato (nueva ventana)
+            from output_policy import politica_desde_config
+            from format_selector import FormatSelectorWindow
             FormatSelectorWindow(
                 root=self.root,
-                archivos=archivos,
+                archivos=[i.relativa for i in seleccion],
                 carpeta_entrada=carpeta_entrada,
                 carpeta_salida=carpeta_salida,
                 nitidez=nit,
@@ -80,13 +109,27 @@ class MainApp:
                 modo_debug=debug,
                 abrir_carpetas=self.abrir_carpetas,
                 borrar_origen=self.borrar_origen,
-                enhancer=self.enhancer
+                enhancer=self.enhancer,
+                modelo=modelo,
+                usar_cache=self.usar_cache,
+                log_jsonl=self.log_jsonl,
+                politica_salida=politica_desde_config(self.config_manager),
+                memoria_total_mb=self.config_manager.get("memoria_total_mb", int),
+                franjas_mp=self.config_manager.get("franjas_mp", float),
+                perfil_codificacion=self.config_manager.get("perfil_codificacion"),
+                hilos_codificacion=self.config_manager.get("hilos_codificacion", int),
+                hilos_lectura=self.config_manager.get("hilos_lectura", int),
+                max_mb_codificando=self.config_manager.get("max_mb_codificando", int),
+                megapixeles_total=megapixeles_totales(seleccion),
+                dimensiones=dimensiones_por_archivo(seleccion)
             )
 
         # Lanzar vista previa
         SharpnessPreviewWindow(
             self.root, imagen_prueba,
             self.nitidez, self.nitidez_texto, self.deteccion_texto, self.modo_debug,
-            callback=despues_de_nitidez
+            callback=despues_de_nitidez,
+            enhancer=self.enhancer,
+            modelo_inicial=self.modelo
         )
 
@@ -0,0 +1,206 @@
+# memory_scheduler.py
+import os
+
+from output_policy import PoliticaSalida
+from input_discovery import leer_dimensiones
+
+MB = 1024 * 1024
+CANALES = 3                     # cv2.IMREAD_COLOR siempre decodifica a BGR de 8 bits
+FACTOR_CODIFICACION = 0.5       # Buffer de imwrite/imencode respecto de la salida sin comprimir
+# Combinaciones (imágenes decodificadas en cola, salidas 4x en cola) de mayor a menor concurrencia
+CONCURRENCIAS = ((4, 2), (2, 2), (2, 1), (1, 1))
+
+
+class EstimacionMemoria:
+    def __init__(self, archivo, ancho, alto, bytes_archivo, decodificada, entrada_modelo, salida):
+        """
+        Memoria (en bytes) de las etapas de una imagen que no dependen del tile.
+
+        Args:
+            decodificada: Imagen BGR leída del disco
+            entrada_modelo: Entrada reducida antes del modelo (0 si no se reduce)
+            salida: Imagen final (4x o la escala pedida), que se afila en el lugar
+        """
+        self.archivo = archivo
+        self.ancho = ancho
+        self.alto = alto
+        self.bytes_archivo = bytes_archivo
+        self.decodificada = decodificada
+        self.entrada_modelo = entrada_modelo
+        self.salida = salida
+        self.modelo_minimo = 0      # Pico de la etapa del modelo con el tile más chico
+        self.modelo_completo = 0    # Pico de la etapa del modelo sin tiles
+        self.guardandose = 0        # Salidas retenidas por el codificador en segundo plano
+        self.codificandose = 0      # De esas, las que se están codificando a la vez
+        self.leyendose = 1          # Decodificadas a la vez por los hilos de lectura
+
+    @property
+    def codificacion(self):
+        return int(self.salida * FACTOR_CODIFICACION)
+
+    def resto_pipeline(self, en_cola_entrada, en_cola_salida):
+        """Memoria de todo lo que no es el modelo con la concurrencia dada (todas las imágenes de este tamaño)"""
+        return (
+            self.bytes_archivo
+            + (en_cola_entrada + 1) * self.decodificada          # en cola + la que está en el modelo
+            + self.leyendose * self.decodificada
+            + self.entrada_modelo
+            + (en_cola_salida + 1) * self.salida                 # en cola + la que se está afilando
+            + self.guardandose * self.salida
+            + self.codificandose * self.codificacion
+        )
+
+    def minimo(self):
+        """
+        Pico mínimo posible: una imagen en cada cola (el pipeline no baja de ahí: una
+        Queue de tamaño 0 no tiene límite) y el tile más chico
+        """
+        return self.minimo_con(1, 1)
+
+    def minimo_con(self, en_cola_entrada, en_cola_salida):
+        """Pico con esa concurrencia y el tile más chico"""
+        return self.resto_pipeline(en_cola_entrada, en_cola_salida) + self.modelo_minimo
+
+    def pico(self, en_cola_entrada, en_cola_salida, presupuesto_modelo):
+        """Pico con esa concurrencia y ese presupuesto: el tile nunca baja del mínimo ni pasa de la imagen completa"""
+        modelo = min(self.modelo_completo, max(presupuesto_modelo, self.modelo_minimo))
+        return self.resto_pipeline(en_cola_entrada, en_cola_salida) + modelo
+
+
+class PlanLote:
+    def __init__(self, orden, rechazadas, sin_dimensiones, max_entradas_en_cola, max_salidas_en_cola,
+                 presupuesto_modelo_mb, pico_estimado_mb):
+        """
+        Resultado de la planificación.
+
+        Args:
+            orden (list): Archivos a procesar, en el orden elegido
+            rechazadas (list): (archivo, MB mínimos necesarios) de las que no entran en el techo
+            sin_dimensiones (list): Archivos cuyo encabezado no se pudo leer (se procesan igual)
+            presupuesto_modelo_mb (int): RAM que queda para la inferencia; define el tile
+            pico_estimado_mb (float): Pico estimado del lote con esta configuración
+        """
+        self.orden = orden
+        self.rechazadas = rechazadas
+        self.sin_dimensiones = sin_dimensiones
+        self.max_entradas_en_cola = max_entradas_en_cola
+        self.max_salidas_en_cola = max_salidas_en_cola
+        self.presupuesto_modelo_mb = presupuesto_modelo_mb
+        self.pico_estimado_mb = pico_estimado_mb
+
+    def resumen(self):
+        return {
+            "imagenes": len(self.orden),
+            "rechazadas": [{"archivo": a, "mb_necesarios": mb} for a, mb in self.rechazadas],
+            "sin_dimensiones": self.sin_dimensiones,
+            "en_cola_entrada": self.max_entradas_en_cola,
+            "en_cola_salida": self.max_salidas_en_cola,
+            "presupuesto_modelo_mb": self.presupuesto_modelo_mb,
+            "pico_estimado_mb": self.pico_estimado_mb,
+        }
+
+
+class PlanificadorMemoria:
+    def __init__(self, enhancer, techo_mb, politica_salida=None, franjas_mp=0, hilos_codificacion=1,
+                 max_mb_codificando=0, hilos_lectura=1):
+        """
+        Ordena el lote y elige concurrencia y tile para no superar un techo de RAM.
+
+        Las dimensiones se leen de los encabezados (sin decodificar) y para cada
+        imagen se estima la memoria de lectura, entrada del modelo, inferencia
+        (según el tile), salida y codificación.
+
+        Args:
+            enhancer (ImageEnhancer): Se usa su modelo de memoria de inferencia
+            techo_mb (int): RAM máxima para el lote completo
+            politica_salida (PoliticaSalida): Tamaño de salida pedido (afecta entrada y salida del modelo)
+            franjas_mp (float): Umbral de salida por franjas del pipeline; esas imágenes
+                                nunca tienen la salida completa en memoria
+            hilos_codificacion (int): Guardados simultáneos del codificador del pipeline
+            max_mb_codificando (int): Límite de MB retenidos por el codificador (siempre admite una imagen)
+            hilos_lectura (int): Imágenes que el pipeline lee y analiza a la vez
+        """
+        self.enhancer = enhancer
+        self.techo = techo_mb * MB
+        self.politica_salida = politica_salida if politica_salida is not None else PoliticaSalida()
+        self.franjas_mp = franjas_mp
+        self.hilos_codificacion = max(1, hilos_codificacion)
+        self.max_bytes_codificando = max_mb_codificando * MB
+        self.hilos_lectura = max(1, hilos_lectura)
+
+    def estimar(self, carpeta, archivo, dimensiones=None):
+        ruta = os.path.join(carpeta, archivo)
+        dimensiones = dimensiones or leer_dimensiones(ruta)
+        if dimensiones is None:
+            return None
+        ancho, alto = dimensiones
+        try:
+            bytes_archivo = os.path.getsize(ruta)
+        except OSError:
+            bytes_archivo = 0
+
+        plan = self.politica_salida.planificar(alto, ancho)
+        decodificada = alto * ancho * CANALES
+        alto_modelo, ancho_modelo = round(alto * plan.escala_previa), round(ancho * plan.escala_previa)
+        entrada_modelo = alto_modelo * ancho_modelo * CANALES if plan.escala_previa != 1.0 else 0
+        salida = round(alto * plan.factor) * round(ancho * plan.factor) * CANALES
+
+        if plan.por_franjas(alto, ancho, self.franjas_mp):
+            # La salida solo existe de a bandas, que se cuentan en la etapa del modelo
+            estimacion = EstimacionMemoria(archivo, ancho, alto, bytes_archivo, decodificada, entrada_modelo, 0)
+            estimacion.leyendose = self.hilos_lectura
+            estimacion.modelo_completo = self.enhancer.memoria_por_franjas(alto_modelo, ancho_modelo, tile=0)
+            estimacion.modelo_minimo = self.enhancer.memoria_por_franjas(alto_modelo, ancho_modelo, tile=None)
+            return estimacion
+
+        estimacion = EstimacionMemoria(archivo, ancho, alto, bytes_archivo, decodificada, entrada_modelo, salida)
+        estimacion.leyendose = self.hilos_lectura
+        # Las que entran en el límite del codificador, y al menos una
+        estimacion.guardandose = max(1, self.max_bytes_codificando // max(salida, 1))
+        estimacion.codificandose = min(estimacion.guardandose, self.hilos_codificacion)
+        if plan.usa_modelo:
+            estimacion.modelo_completo = self.enhancer.memoria_inferencia(alto_modelo, ancho_modelo, tile=0)
+            estimacion.modelo_minimo = self.enhancer.memoria_inferencia(alto_modelo, ancho_modelo, tile=None)
+        return estimacion
+
+    def planificar(self, carpeta, archivos, dimensiones=None):
+        """
+        Args:
+            archivos (list): Rutas relativas a `carpeta`, ya en el orden deseado (se respeta)
+            dimensiones (dict): {archivo: (ancho, alto)} ya leídas (p. ej. por input_discovery);
+                                las que falten se leen del encabezado
+
+        Returns:
+            PlanLote
+        """
+        dimensiones = dimensiones or {}
+        estimaciones, sin_dimensiones, rechazadas, orden = [], [], [], []
+        for archivo in archivos:
+            estimacion = self.estimar(carpeta, archivo, dimensiones.get(archivo))
+            if estimacion is None:
+                sin_dimensiones.append(archivo)
+            elif estimacion.minimo() > self.techo:
+                rechazadas.append((archivo, round(estimacion.minimo() / MB)))
+                continue
+            else:
+                estimaciones.append(estimacion)
+            orden.append(archivo)
+
+        if not estimaciones:
+            return PlanLote(orden, rechazadas, sin_dimensiones, 1, 1, int(self.techo / MB), 0.0)
+
+        # La mayor concurrencia en la que todas las imágenes entran con el tile más chico.
+        # Con (1, 1) siempre entran: es lo que se exigió al admitirlas
+        tamano_lote = getattr(self.enhancer, "tamano_lote", 1)
+        candidatas = [(max(en_entrada, tamano_lote), en_salida) for en_entrada, en_salida in CONCURRENCIAS]
+        for en_entrada, en_salida in candidatas + [(1, 1)]:
+            if all(e.minimo_con(en_entrada, en_salida) <= self.techo for e in estimaciones):
+                break
+
+        # El presupuesto lo fija la imagen que más ocupa fuera del modelo; como esa entra con
+        # el tile mínimo, nunca queda por debajo de su modelo_minimo (las demás lo superan o
+        # usan su propio tile mínimo, que también entra)
+        presupuesto = min(self.techo - e.resto_pipeline(en_entrada, en_salida) for e in estimaciones)
+        pico = max(e.pico(en_entrada, en_salida, presupuesto) for e in estimaciones)
+        return PlanLote(orden, rechazadas, sin_dimensiones, en_entrada, en_salida,
+                        int(presupuesto / MB), round(pico / MB, 1))
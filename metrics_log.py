@@ -0,0 +1,100 @@
+# metrics_log.py
+import os
+import sys
+import json
+import threading
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def pico_memoria_mb():
+    """
+    Pico de memoria residente (RSS) del proceso en MB, o None si no se puede medir.
+    En Linux/macOS usa getrusage; en Windows, psutil si está instalado.
+    """
+    if resource is not None:
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss está en KB en Linux y en bytes en macOS
+        return round(pico / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+    if psutil is not None:
+        try:
+            info = psutil.Process().memory_info()
+            return round(getattr(info, "peak_wset", info.rss) / (1024 * 1024), 1)
+        except Exception:
+            pass
+    return None
+
+
+def memoria_actual_mb():
+    """RSS actual del proceso en MB, o None si no se puede medir"""
+    if psutil is not None:
+        try:
+            return round(psutil.Process().memory_info().rss / (1024 * 1024), 1)
+        except Exception:
+            pass
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as f:
+            paginas = int(f.read().split()[1])
+        return round(paginas * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024), 1)
+    except Exception:
+        return None
+
+
+def formatear_csv(valor):
+    """Representación de un valor en el log separado por ';'"""
+    if valor is None:
+        return ""
+    if isinstance(valor, bool):
+        return "Sí" if valor else "No"
+    return str(valor)
+
+
+class RegistroMetricas:
+    def __init__(self, ruta_csv, columnas, ruta_jsonl=None):
+        """
+        Log por imagen que se escribe (y se vuelca a disco) a medida que termina cada una.
+
+        Args:
+            ruta_csv (str): Archivo separado por ';' (el log habitual de la aplicación)
+            columnas (list): Pares (encabezado CSV, clave JSON) en orden
+            ruta_jsonl (str): Si se indica, cada registro también se escribe como una línea JSON
+        """
+        self.columnas = columnas
+        self.ruta_csv = ruta_csv
+        self.ruta_jsonl = ruta_jsonl
+        self._lock = threading.Lock()
+
+        self._csv = open(ruta_csv, "a", encoding="utf-8")
+        if self._csv.tell() == 0:
+            self._csv.write(";".join(encabezado for encabezado, _ in columnas))
+            self._csv.flush()
+        self._jsonl = open(ruta_jsonl, "a", encoding="utf-8") if ruta_jsonl else None
+
+    def escribir(self, registro):
+        """
+        Agrega un registro y lo vuelca a disco.
+
+        Args:
+            registro (dict): Valores indexados por clave JSON
+        """
+        with self._lock:
+            self._csv.write("\n" + ";".join(formatear_csv(registro.get(clave)) for _, clave in self.columnas))
+            self._csv.flush()
+            os.fsync(self._csv.fileno())
+            if self._jsonl:
+                self._jsonl.write(json.dumps(registro, ensure_ascii=False) + "\n")
+                self._jsonl.flush()
+
+    def cerrar(self):
+        with self._lock:
+            self._csv.close()
+            if self._jsonl:
+                self._jsonl.close()
@@ -0,0 +1,140 @@
+# model_registry.py
+import gc
+import threading
+from collections import OrderedDict
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+# Rutas relativas de los pesos; se resuelven recién al cargar cada modelo.
+# Están aquí (y no en enhancer.py) para conocer los modelos sin importar torch.
+MODELOS_DISPONIBLES = {
+    'x4plus': 'weights/RealESRGAN_x4plus.pth',
+    'x4plus_2': 'weights/RealESRGAN_x4plus_2.pth',
+    'general_x4v3': 'weights/realesr-general-x4v3.pth'
+}
+# Las variantes int8 (solo CPU) se llaman como el modelo fp32 del que derivan más este sufijo
+SUFIJO_INT8 = "_int8"
+
+
+def modelos_disponibles(weight_path=None):
+    """
+    {nombre: ruta de pesos} de todos los modelos, incluidas las variantes int8
+    (que usan los pesos del modelo fp32 del que derivan).
+
+    Args:
+        weight_path (str): Pesos de 'x4plus' si no son los de siempre
+    """
+    modelos = dict(MODELOS_DISPONIBLES)
+    if weight_path:
+        modelos['x4plus'] = weight_path
+    modelos.update({nombre + SUFIJO_INT8: ruta for nombre, ruta in list(modelos.items())})
+    return modelos
+
+
+def memoria_disponible_mb():
+    """
+    Devuelve la RAM disponible del sistema en MB, o None si no se puede determinar.
+    Usa psutil si está instalado y, en Linux, /proc/meminfo como alternativa.
+    """
+    if psutil is not None:
+        try:
+            return psutil.virtual_memory().available / (1024 * 1024)
+        except Exception:
+            pass
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for linea in f:
+                if linea.startswith("MemAvailable:"):
+                    return int(linea.split()[1]) / 1024
+    except Exception:
+        pass
+    return None
+
+
+class ModelRegistry:
+    def __init__(self, max_modelos=2, memoria_min_libre_mb=1024):
+        """
+        Registro de modelos compartido por todo el proceso.
+
+        Cada modelo se construye una sola vez, la primera vez que se pide, y queda
+        en memoria entre lotes. Se conservan como máximo `max_modelos` (LRU) y,
+        si la RAM libre cae por debajo de `memoria_min_libre_mb`, se desaloja el
+        menos usado recientemente aunque no se haya alcanzado el máximo.
+
+        Args:
+            max_modelos (int): Cantidad máxima de modelos cargados a la vez
+            memoria_min_libre_mb (int): RAM libre mínima antes de desalojar modelos
+        """
+        self.max_modelos = max_modelos
+        self.memoria_min_libre_mb = memoria_min_libre_mb
+        self._modelos = OrderedDict()
+        self._lock = threading.RLock()
+
+    def obtener(self, clave, fabrica):
+        """
+        Devuelve el modelo asociado a `clave`, construyéndolo con `fabrica()` si no está.
+
+        Args:
+            clave: Identificador hashable del modelo (p. ej. (nombre, dispositivo))
+            fabrica (callable): Función sin argumentos que construye el modelo
+
+        Returns:
+            El modelo cargado
+        """
+        with self._lock:
+            if clave in self._modelos:
+                self._modelos.move_to_end(clave)
+                return self._modelos[clave]
+
+            # Liberar espacio antes de construir el nuevo modelo
+            self._desalojar(reservar=1)
+            modelo = fabrica()
+            self._modelos[clave] = modelo
+            return modelo
+
+    def _desalojar(self, reservar=0):
+        desalojados = False
+        while self._modelos and len(self._modelos) + reservar > self.max_modelos:
+            self._modelos.popitem(last=False)
+            desalojados = True
+
+        while self._modelos and self._memoria_baja():
+            self._modelos.popitem(last=False)
+            desalojados = True
+            gc.collect()
+
+        if desalojados:
+            gc.collect()
+
+    def _memoria_baja(self):
+        libre = memoria_disponible_mb()
+        return libre is not None and libre < self.memoria_min_libre_mb
+
+    def descartar(self, clave=None):
+        """Quita un modelo del registro (o todos si clave es None)"""
+        with self._lock:
+            if clave is None:
+                self._modelos.clear()
+            else:
+                self._modelos.pop(clave, None)
+            gc.collect()
+
+    def cargados(self):
+        """Claves de los modelos en memoria, del menos al más usado recientemente"""
+        with self._lock:
+            return list(self._modelos.keys())
+
+
+# Registro único del proceso: todas las instancias de ImageEnhancer lo comparten
+REGISTRO_MODELOS = ModelRegistry()
+
+
+def configurar_registro(max_modelos=None, memoria_min_libre_mb=None):
+    """Ajusta los límites del registro global de modelos"""
+    if max_modelos is not None:
+        REGISTRO_MODELOS.max_modelos = max(1, int(max_modelos))
+    if memoria_min_libre_mb is not None:
+        REGISTRO_MODELOS.memoria_min_libre_mb = int(memoria_min_libre_mb)
@@ -0,0 +1,389 @@
+# node_coordinator.py
+"""
+Reparto de una carpeta de entrada entre varios equipos (o procesos) que la comparten.
+
+Cada nodo reclama una imagen creando de forma atómica (O_CREAT | O_EXCL) un archivo
+de reclamo oculto junto a ella, `.nombre.ext.reclamo`, que mantiene vivo tocándolo
+cada `latido` segundos. Al terminar la imagen el reclamo se renombra a
+`.nombre.ext.hecho` y ningún nodo la vuelve a tomar. Si un nodo se cae, su reclamo
+deja de cambiar y, pasados `expira` segundos sin cambios (medidos con el reloj de
+quien observa, así no importa la hora de cada equipo), otro nodo lo toma.
+
+Cada reclamo lleva la identidad de su dueño: un nodo solo renueva, completa o suelta
+los reclamos que siguen siendo suyos. Si uno que estuvo detenido descubre que otro
+retomó su imagen, la abandona (`vigente` devuelve False) sin tocar el reclamo ajeno.
+
+Cada nodo escribe su propio fragmento del log en la carpeta de salida
+(Nodo_<nombre>_<fecha>.log); este módulo los une en el Imagenes_Procesadas_*.log habitual.
+
+Ejemplos:
+    python batch_cli.py entrada/ salida/ --nodo equipo1          (en cada equipo)
+    python node_coordinator.py unir salida/                      (al terminar todos)
+    python node_coordinator.py limpiar entrada/                  (para volver a procesar todo)
+"""
+import os
+import sys
+import glob
+import json
+import time
+import socket
+import uuid
+import argparse
+import threading
+from datetime import datetime
+
+SUFIJO_RECLAMO = ".reclamo"
+SUFIJO_HECHO = ".hecho"
+PREFIJO_FRAGMENTO = "Nodo_"
+LATIDO_S = 10.0
+EXPIRA_S = 60.0
+
+
+def nombre_nodo_por_defecto():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+def _marca(ruta, sufijo):
+    """Archivo oculto junto a la imagen (la búsqueda de entradas omite los ocultos)"""
+    carpeta, nombre = os.path.split(ruta)
+    return os.path.join(carpeta, f".{nombre}{sufijo}")
+
+
+def ruta_fragmento(carpeta_salida, nodo):
+    """Fragmento .log del nodo; el .jsonl, si se pide, va al lado con el mismo nombre"""
+    nombre = datetime.now().strftime(f"{PREFIJO_FRAGMENTO}{nodo}_%Y-%m-%d_%H-%M")
+    return os.path.join(carpeta_salida, nombre + ".log")
+
+
+class CoordinadorNodos:
+    def __init__(self, carpeta_entrada, nodo=None, latido=LATIDO_S, expira=EXPIRA_S):
+        """
+        Args:
+            carpeta_entrada (str): Carpeta compartida con las imágenes
+            nodo (str): Nombre de este nodo (por defecto, equipo-pid)
+            latido (float): Cada cuántos segundos se renuevan los reclamos propios
+            expira (float): Segundos sin renovarse tras los cuales un reclamo ajeno se da por abandonado
+        """
+        self.carpeta_entrada = carpeta_entrada
+        self.nodo = nodo or nombre_nodo_por_defecto()
+        self.latido = latido
+        self.expira = expira
+        self.identidad = uuid.uuid4().hex   # Distingue a este proceso aunque se repita el nombre
+        self._propios = set()            # Rutas relativas reclamadas y aún no terminadas
+        self._observados = {}            # reclamo ajeno -> (mtime, momento local en que se vio)
+        self._lock = threading.Lock()
+        self._detenido = threading.Event()
+        self._hilo_latido = threading.Thread(target=self._latir, name="latido-nodo", daemon=True)
+        self._hilo_latido.start()
+
+    def _ruta(self, archivo):
+        return os.path.join(self.carpeta_entrada, archivo)
+
+    def reclamar(self, archivo):
+        """
+        Intenta reclamar la imagen (sin esperar).
+
+        Returns:
+            bool: True si ahora es de este nodo
+        """
+        ruta = self._ruta(archivo)
+        if os.path.exists(_marca(ruta, SUFIJO_HECHO)):
+            return False
+        reclamo = _marca(ruta, SUFIJO_RECLAMO)
+        if not self._crear_reclamo(reclamo):
+            if not (self._abandonado(reclamo) and self._quitar_abandonado(reclamo)
+                    and self._crear_reclamo(reclamo)):
+                return False
+            print(f"Nodo {self.nodo}: se retoma {archivo} (reclamo vencido)")
+        if os.path.exists(_marca(ruta, SUFIJO_HECHO)):
+            # Su dueño la terminó entre la primera comprobación y el reclamo
+            os.remove(reclamo)
+            return False
+        with self._lock:
+            self._propios.add(archivo)
+        return True
+
+    def _crear_reclamo(self, reclamo):
+        try:
+            fd = os.open(reclamo, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            return False
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump({"nodo": self.nodo, "id": self.identidad,
+                       "desde": datetime.now().isoformat(timespec="seconds")}, f)
+        self._observados.pop(reclamo, None)
+        return True
+
+    def _es_propio(self, reclamo):
+        """Si el archivo de reclamo es de este nodo (uno a medio escribir todavía es ajeno)"""
+        try:
+            with open(reclamo, encoding="utf-8") as f:
+                return json.load(f).get("id") == self.identidad
+        except (OSError, ValueError):
+            return False
+
+    def _perdido(self, archivo):
+        with self._lock:
+            if archivo not in self._propios:
+                return
+            self._propios.discard(archivo)
+        print(f"Advertencia: nodo {self.nodo} perdió el reclamo de {archivo} (otro nodo lo retomó); se abandona")
+
+    def vigente(self, archivo):
+        """
+        Si la imagen sigue siendo de este nodo. False si otro la retomó (p. ej. tras una
+        pausa larga de este proceso): quien la procesa debe abandonarla sin guardarla.
+        """
+        with self._lock:
+            if archivo not in self._propios:
+                return False
+        if self._es_propio(_marca(self._ruta(archivo), SUFIJO_RECLAMO)):
+            return True
+        self._perdido(archivo)
+        return False
+
+    def _apartar_propio(self, archivo):
+        """
+        Aparta el reclamo propio con un rename (atómico frente a un nodo que lo retome).
+        Devuelve la ruta apartada, o None si ya no era de este nodo (entonces no se toca).
+        """
+        reclamo = _marca(self._ruta(archivo), SUFIJO_RECLAMO)
+        apartado = f"{reclamo}.cerrando-{self.identidad}"
+        try:
+            os.rename(reclamo, apartado)
+        except OSError:
+            return None
+        if self._es_propio(apartado):
+            return apartado
+        # Era de otro: vuelve a su lugar (salvo que entre tanto se haya creado otro)
+        try:
+            if os.path.exists(reclamo):
+                os.remove(apartado)
+            else:
+                os.rename(apartado, reclamo)
+        except OSError:
+            pass
+        return None
+
+    def _abandonado(self, reclamo):
+        """Si el reclamo ajeno lleva `expira` segundos (de este reloj) sin renovarse"""
+        try:
+            mtime = os.stat(reclamo).st_mtime
+        except FileNotFoundError:
+            return False        # Se terminó o se liberó: se vuelve a ver en la próxima pasada
+        ahora = time.monotonic()
+        previo = self._observados.get(reclamo)
+        if previo is None or previo[0] != mtime:
+            self._observados[reclamo] = (mtime, ahora)
+            return False
+        return ahora - previo[1] >= self.expira
+
+    def _quitar_abandonado(self, reclamo):
+        """
+        Aparta el reclamo vencido con un rename (atómico: de varios nodos, gana uno). Si
+        entre tanto su dueño lo renovó, se devuelve a su lugar.
+        """
+        apartado = f"{reclamo}.vencido-{self.nodo}"
+        visto = self._observados.get(reclamo, (None,))[0]
+        try:
+            os.rename(reclamo, apartado)
+        except OSError:
+            return False        # Otro nodo lo apartó primero, o su dueño lo terminó
+        try:
+            if os.stat(apartado).st_mtime != visto and not os.path.exists(reclamo):
+                os.rename(apartado, reclamo)
+                return False
+            os.remove(apartado)
+        except OSError:
+            return False
+        return True
+
+    def completar(self, archivo):
+        """
+        Marca la imagen como terminada (bien o con error, igual que un lote normal: queda en el log).
+
+        La marca .hecho se crea antes de quitar el reclamo, así ningún nodo ve la imagen
+        libre entre medio.
+
+        Returns:
+            bool: False si el reclamo ya no era de este nodo (la imagen es de otro y no se
+                  marca) o si otro nodo que la retomó ya la completó
+        """
+        ruta = self._ruta(archivo)
+        with self._lock:
+            if archivo not in self._propios:
+                return False
+            self._propios.discard(archivo)
+        if not self._es_propio(_marca(ruta, SUFIJO_RECLAMO)):
+            print(f"Advertencia: nodo {self.nodo} perdió el reclamo de {archivo} antes de completarla")
+            return False
+        try:
+            fd = os.open(_marca(ruta, SUFIJO_HECHO), os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump({"nodo": self.nodo, "id": self.identidad}, f)
+            completada = True
+        except FileExistsError:
+            completada = False
+        apartado = self._apartar_propio(archivo)
+        if apartado is not None:
+            os.remove(apartado)
+        return completada
+
+    def liberar(self, archivo):
+        """Suelta un reclamo propio sin terminar la imagen, para que la tome otro nodo"""
+        with self._lock:
+            if archivo not in self._propios:
+                return
+            self._propios.discard(archivo)
+        apartado = self._apartar_propio(archivo)
+        if apartado is not None:
+            os.remove(apartado)
+
+    def cerrar(self):
+        """Detiene el latido y suelta los reclamos que no llegaron a terminarse"""
+        self._detenido.set()
+        self._hilo_latido.join()
+        with self._lock:
+            pendientes = list(self._propios)
+        for archivo in pendientes:
+            self.liberar(archivo)
+
+    def _latir(self):
+        while not self._detenido.wait(self.latido):
+            with self._lock:
+                propios = list(self._propios)
+            for archivo in propios:
+                reclamo = _marca(self._ruta(archivo), SUFIJO_RECLAMO)
+                # Solo el propio: renovar uno ajeno lo mantendría vivo a nombre de este nodo
+                if not self._es_propio(reclamo):
+                    self._perdido(archivo)
+                    continue
+                try:
+                    os.utime(reclamo)
+                except FileNotFoundError:
+                    self._perdido(archivo)
+                except OSError as e:
+                    print(f"Advertencia: no se pudo renovar el reclamo de {archivo} ({e})")
+
+    def archivos_reclamados(self, archivos, debe_detener=lambda: False):
+        """
+        Generador que entrega, en orden, las imágenes que este nodo logra reclamar.
+
+        Las reclamadas por otros nodos se revisan de nuevo cada `latido` segundos hasta
+        que terminan (se omiten) o su reclamo vence (se retoman). Termina cuando todas
+        están hechas o `debe_detener()` devuelve True.
+
+        Args:
+            archivos (list): Rutas relativas a la carpeta de entrada
+            debe_detener (callable): Función sin argumentos consultada entre imágenes
+        """
+        pendientes = list(archivos)
+        while pendientes and not debe_detener():
+            ajenas = []
+            for archivo in pendientes:
+                if debe_detener():
+                    return
+                if self.reclamar(archivo):
+                    yield archivo
+                elif not os.path.exists(_marca(self._ruta(archivo), SUFIJO_HECHO)):
+                    ajenas.append(archivo)
+            pendientes = ajenas
+            if pendientes:
+                self._detenido.wait(self.latido)
+
+
+def _momento(fecha, hora):
+    """Clave de orden de un registro del log (fecha dd/mm/aaaa, hora hh:mm:ss); los ilegibles van al final"""
+    try:
+        return (0, datetime.strptime(f"{fecha} {hora}", "%d/%m/%Y %H:%M:%S"))
+    except (TypeError, ValueError):
+        return (1, datetime.min)
+
+
+def unir_fragmentos(carpeta_salida, borrar=False):
+    """
+    Une los fragmentos de log de los nodos (Nodo_*.log y, si hay, Nodo_*.jsonl) en un
+    Imagenes_Procesadas_*.log (y .jsonl), ordenado por fecha y hora de inicio.
+
+    Returns:
+        str: Ruta del log unido, o None si no había fragmentos
+    """
+    fragmentos = sorted(glob.glob(os.path.join(carpeta_salida, f"{PREFIJO_FRAGMENTO}*.log")))
+    if not fragmentos:
+        return None
+
+    encabezado, filas = None, []
+    for fragmento in fragmentos:
+        with open(fragmento, encoding="utf-8") as f:
+            lineas = f.read().splitlines()
+        if not lineas:
+            continue
+        encabezado = encabezado or lineas[0]
+        filas.extend(linea for linea in lineas[1:] if linea.strip())
+
+    if encabezado is None:
+        return None
+    columnas = encabezado.split(";")
+    fecha, hora = columnas.index("Fecha"), columnas.index("Hora_Inicio")
+
+    def clave(fila):
+        valores = fila.split(";")
+        return _momento(valores[fecha] if len(valores) > fecha else None,
+                        valores[hora] if len(valores) > hora else None)
+
+    filas.sort(key=clave)
+    ruta_log = os.path.join(carpeta_salida, datetime.now().strftime("Imagenes_Procesadas_%Y-%m-%d_%H-%M.log"))
+    with open(ruta_log, "w", encoding="utf-8") as f:
+        f.write("\n".join([encabezado] + filas))
+
+    fragmentos_jsonl = sorted(glob.glob(os.path.join(carpeta_salida, f"{PREFIJO_FRAGMENTO}*.jsonl")))
+    if fragmentos_jsonl:
+        registros = []
+        for fragmento in fragmentos_jsonl:
+            with open(fragmento, encoding="utf-8") as f:
+                registros.extend(json.loads(linea) for linea in f if linea.strip())
+        registros.sort(key=lambda r: _momento(r.get("fecha"), r.get("hora_inicio")))
+        with open(os.path.splitext(ruta_log)[0] + ".jsonl", "w", encoding="utf-8") as f:
+            for registro in registros:
+                f.write(json.dumps(registro, ensure_ascii=False) + "\n")
+
+    if borrar:
+        for fragmento in fragmentos + fragmentos_jsonl:
+            os.remove(fragmento)
+    return ruta_log
+
+
+def limpiar_marcas(carpeta_entrada):
+    """Borra reclamos y marcas de terminado (p. ej. para volver a procesar la carpeta). Devuelve cuántas"""
+    borradas = 0
+    for raiz, _, nombres in os.walk(carpeta_entrada):
+        for nombre in nombres:
+            if nombre.startswith(".") and (nombre.endswith(SUFIJO_RECLAMO) or nombre.endswith(SUFIJO_HECHO)):
+                os.remove(os.path.join(raiz, nombre))
+                borradas += 1
+    return borradas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Utilidades del modo multinodo de batch_cli.py (--nodo).")
+    sub = parser.add_subparsers(dest="comando", required=True)
+    unir = sub.add_parser("unir", help="Une los logs de los nodos en un Imagenes_Procesadas_*.log")
+    unir.add_argument("salida", help="Carpeta de salida compartida")
+    unir.add_argument("--borrar", action="store_true", help="Borra los fragmentos después de unirlos")
+    limpiar = sub.add_parser("limpiar", help="Borra los reclamos y marcas de terminado de la carpeta de entrada")
+    limpiar.add_argument("entrada", help="Carpeta de entrada compartida")
+    args = parser.parse_args(argv)
+
+    if args.comando == "unir":
+        ruta = unir_fragmentos(args.salida, borrar=args.borrar)
+        if ruta is None:
+            print(f"No hay fragmentos {PREFIJO_FRAGMENTO}*.log en {args.salida}", file=sys.stderr)
+            return 1
+        print(ruta)
+    else:
+        print(f"{limpiar_marcas(args.entrada)} marcas borradas")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,166 @@
+# ocr_pool.py
+import os
+import atexit
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytesseract
+from pytesseract import Output
+
+try:
+    # Enlace directo a la API de Tesseract: los datos de idioma se cargan una
+    # sola vez por worker y las imágenes se pasan en memoria (sin subprocesos
+    # ni archivos temporales)
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+
+class ConfigOCR:
+    def __init__(self, psm, lang, whitelist=None):
+        """
+        Configuración de una pasada de Tesseract.
+
+        Args:
+            psm (int): Page segmentation mode
+            lang (str): Idiomas ('spa', 'spa+eng', ...)
+            whitelist (str): Caracteres permitidos, o None para todos
+        """
+        self.psm = psm
+        self.lang = lang
+        self.whitelist = whitelist
+
+    @property
+    def nombre(self):
+        return f"psm {self.psm}"
+
+    def como_argumentos(self):
+        """Parámetros equivalentes para la línea de comandos de tesseract"""
+        argumentos = f"--psm {self.psm} --oem 3"
+        if self.whitelist:
+            argumentos += f' -c tessedit_char_whitelist="{self.whitelist}"'
+        return argumentos
+
+    def clave(self):
+        return (self.psm, self.lang, self.whitelist)
+
+
+class OCRPool:
+    def __init__(self, hilos_por_config=1):
+        """
+        Pool de workers de OCR de larga vida.
+
+        Cada configuración tiene sus propios workers (`hilos_por_config`), de modo
+        que las pasadas de varias imágenes, con la misma o distinta configuración,
+        corren en paralelo (Tesseract libera el GIL) y cada worker carga sus datos
+        de idioma una única vez.
+
+        tesserocr (en requirements.txt) es el camino normal: la imagen se
+        entrega en memoria. Si no está instalado se recurre a pytesseract, un
+        modo degradado con un proceso de tesseract por llamada.
+        """
+        self.usa_tesserocr = tesserocr is not None
+        self.hilos_por_config = max(1, hilos_por_config)
+        self._tessdata = os.environ.get('TESSDATA_PREFIX')
+        self._ejecutores = {}
+        self._apis = {}
+        self._lock = threading.Lock()
+
+    def ampliar(self, hilos_por_config):
+        """
+        Sube los workers por configuración (nunca los baja). Los ejecutores actuales
+        terminan lo que ya tienen encolado y los nuevos se crean al primer uso.
+        """
+        with self._lock:
+            if hilos_por_config <= self.hilos_por_config:
+                return
+            self.hilos_por_config = hilos_por_config
+            viejos = list(self._ejecutores.values())
+            self._ejecutores.clear()
+        for ejecutor in viejos:
+            ejecutor.shutdown(wait=False)
+
+    def enviar(self, imagen, config):
+        """
+        Encola el reconocimiento de `imagen` con `config`.
+
+        Returns:
+            concurrent.futures.Future con un dict {'text': [...], 'conf': [...]}
+            (mismo formato que pytesseract.image_to_data con Output.DICT)
+        """
+        return self._ejecutor(config).submit(self._reconocer, imagen, config)
+
+    def _ejecutor(self, config):
+        with self._lock:
+            ejecutor = self._ejecutores.get(config.clave())
+            if ejecutor is None:
+                ejecutor = ThreadPoolExecutor(max_workers=self.hilos_por_config,
+                                              thread_name_prefix=f"ocr-psm{config.psm}")
+                self._ejecutores[config.clave()] = ejecutor
+            return ejecutor
+
+    def _reconocer(self, imagen, config):
+        if self.usa_tesserocr:
+            return self._reconocer_tesserocr(imagen, config)
+        return pytesseract.image_to_data(
+            imagen, config=config.como_argumentos(),
+            lang=config.lang, output_type=Output.DICT
+        )
+
+    def _api(self, config):
+        # Una instancia por configuración y por worker: nadie más la usa, no hace falta bloquearla
+        clave = (config.clave(), threading.get_ident())
+        api = self._apis.get(clave)
+        if api is None:
+            parametros = {"lang": config.lang, "psm": config.psm, "oem": tesserocr.OEM.DEFAULT}
+            if self._tessdata:
+                parametros["path"] = self._tessdata
+            api = tesserocr.PyTessBaseAPI(**parametros)
+            if config.whitelist:
+                api.SetVariable("tessedit_char_whitelist", config.whitelist)
+            self._apis[clave] = api
+        return api
+
+    def _reconocer_tesserocr(self, imagen, config):
+        api = self._api(config)
+        imagen = np.ascontiguousarray(imagen)
+        alto, ancho = imagen.shape[:2]
+        canales = 1 if imagen.ndim == 2 else imagen.shape[2]
+        try:
+            api.SetImageBytes(imagen.tobytes(), ancho, alto, canales, ancho * canales)
+            palabras = api.MapWordConfidences()
+        finally:
+            api.Clear()
+        return {"text": [p for p, _ in palabras], "conf": [c for _, c in palabras]}
+
+    def cerrar(self):
+        with self._lock:
+            for ejecutor in self._ejecutores.values():
+                ejecutor.shutdown(wait=False, cancel_futures=True)
+            self._ejecutores.clear()
+        for api in self._apis.values():
+            try:
+                api.End()
+            except Exception:
+                pass
+        self._apis.clear()
+
+
+_pool_global = None
+_lock_global = threading.Lock()
+
+
+def obtener_pool_ocr(hilos_por_config=1):
+    """
+    Devuelve el pool de OCR compartido por todo el proceso (se crea al primer uso),
+    con al menos `hilos_por_config` workers por configuración
+    """
+    global _pool_global
+    with _lock_global:
+        if _pool_global is None:
+            _pool_global = OCRPool(hilos_por_config)
+            atexit.register(_pool_global.cerrar)
+        else:
+            _pool_global.ampliar(hilos_por_config)
+        return _pool_global
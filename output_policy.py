@@ -0,0 +1,112 @@
+# output_policy.py
+import cv2
+
+ESCALA_MODELO = 4                       # Escala nativa de todos los modelos Real-ESRGAN usados
+MODOS_POLITICA = ("escala", "lado_max", "mp_max")
+
+# Rutas posibles para llegar al tamaño pedido
+RUTA_MODELO = "modelo"                  # 4x completo
+RUTA_OUTSCALE = "modelo+outscale"       # modelo sobre la entrada completa y salida reducida
+RUTA_REDUCIR = "reducir+modelo"         # entrada reducida antes del modelo
+RUTA_SIN_MODELO = "sin modelo"          # la entrada ya alcanza el tamaño pedido
+
+# Por debajo de este factor final el modelo no aprovecha el detalle de la entrada completa:
+# conviene reducirla antes (el costo del modelo crece con los píxeles de entrada)
+FACTOR_MIN_ENTRADA_COMPLETA = 2.0
+
+
+class PlanSalida:
+    def __init__(self, ruta, factor, escala_previa=1.0, outscale=None):
+        """
+        Cómo se obtiene la salida de una imagen.
+
+        Args:
+            ruta (str): Una de las constantes RUTA_*
+            factor (float): Escala final respecto de la entrada original
+            escala_previa (float): Reducción aplicada a la entrada antes del modelo (o sola, sin modelo)
+            outscale (float): Escala final del modelo respecto de su entrada, o None para 4x
+        """
+        self.ruta = ruta
+        self.factor = factor
+        self.escala_previa = escala_previa
+        self.outscale = outscale
+
+    @property
+    def usa_modelo(self):
+        return self.ruta != RUTA_SIN_MODELO
+
+    def por_franjas(self, alto, ancho, franjas_mp):
+        """Si la salida se genera y guarda de a franjas: 4x sin reducción posterior y de al menos `franjas_mp` MP"""
+        if not franjas_mp or not self.usa_modelo or self.outscale is not None:
+            return False
+        lado = self.escala_previa * ESCALA_MODELO
+        return alto * lado * ancho * lado / 1e6 >= franjas_mp
+
+    def descripcion(self):
+        if self.ruta == RUTA_REDUCIR:
+            return f"{self.ruta} (entrada x{self.escala_previa:.3g})"
+        if self.ruta == RUTA_OUTSCALE:
+            return f"{self.ruta} (x{self.outscale:.3g})"
+        if self.ruta == RUTA_SIN_MODELO:
+            return f"{self.ruta} (x{self.factor:.3g})"
+        return self.ruta
+
+
+class PoliticaSalida:
+    def __init__(self, modo="escala", valor=ESCALA_MODELO):
+        """
+        Tamaño de salida pedido.
+
+        Args:
+            modo (str): 'escala' (factor fijo), 'lado_max' (píxeles del lado mayor)
+                        o 'mp_max' (megapíxeles)
+            valor (float): Valor según el modo. La salida nunca supera 4x la entrada
+        """
+        if modo not in MODOS_POLITICA:
+            raise ValueError(f"Política de salida desconocida: {modo}. Opciones válidas: {list(MODOS_POLITICA)}")
+        if valor <= 0:
+            raise ValueError("El valor de la política de salida debe ser positivo")
+        self.modo = modo
+        self.valor = float(valor)
+
+    def clave(self):
+        return f"{self.modo}={self.valor:g}"
+
+    def factor(self, alto, ancho):
+        """Escala final respecto de la entrada, limitada a la del modelo"""
+        if self.modo == "escala":
+            factor = self.valor
+        elif self.modo == "lado_max":
+            factor = self.valor / max(alto, ancho)
+        else:
+            factor = (self.valor * 1e6 / (alto * ancho)) ** 0.5
+        return min(factor, ESCALA_MODELO)
+
+    def planificar(self, alto, ancho):
+        """Elige la ruta más barata que produce el tamaño pedido"""
+        factor = self.factor(alto, ancho)
+        if factor >= ESCALA_MODELO:
+            return PlanSalida(RUTA_MODELO, ESCALA_MODELO)
+        if factor <= 1.0:
+            return PlanSalida(RUTA_SIN_MODELO, factor, escala_previa=factor)
+        if factor < FACTOR_MIN_ENTRADA_COMPLETA:
+            return PlanSalida(RUTA_REDUCIR, factor, escala_previa=factor / ESCALA_MODELO)
+        return PlanSalida(RUTA_OUTSCALE, factor, outscale=factor)
+
+
+def reescalar(imagen, factor):
+    """Redimensiona por `factor` (INTER_AREA al reducir, LANCZOS4 al ampliar); factor 1 no copia"""
+    if abs(factor - 1.0) < 1e-6:
+        return imagen
+    alto, ancho = imagen.shape[:2]
+    tamano = (max(1, round(ancho * factor)), max(1, round(alto * factor)))
+    interpolacion = cv2.INTER_AREA if factor < 1 else cv2.INTER_LANCZOS4
+    return cv2.resize(imagen, tamano, interpolation=interpolacion)
+
+
+def politica_desde_config(config, modo=None, valor=None):
+    """Crea la política con los valores del archivo de configuración; `modo`/`valor` los pisan si no son None"""
+    return PoliticaSalida(
+        modo if modo is not None else config.get("salida_modo"),
+        valor if valor is not None else config.get("salida_valor", float)
+    )
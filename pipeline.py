@@ -0,0 +1,697 @@
+# pipeline.py
+import os
+import time
+import queue
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from processor import ZONA_HORARIA, LADO_MAX_OCR, CONFIGS_OCR, ImageProcessor
+from ocr_pool import obtener_pool_ocr
+from result_cache import hash_contenido, clave_cache
+from output_policy import ESCALA_MODELO, PoliticaSalida, reescalar
+from memory_scheduler import PlanificadorMemoria
+from tiled_writer import EscritorTiffFranjas
+from encoder_pool import CodificadorAsincrono
+from metrics_log import formatear_csv, pico_memoria_mb
+from control_lote import ControlLote, LoteCancelado
+
+# Columnas del log por imagen: (encabezado del CSV, clave en el JSONL)
+COLUMNAS_LOG = [
+    ("Nombre_Imagen_Original", "imagen_original"),
+    ("Nombre_Imagen_Procesada", "imagen_procesada"),
+    ("Fecha", "fecha"),
+    ("Hora_Inicio", "hora_inicio"),
+    ("Hora_Fin", "hora_fin"),
+    ("Tiempo_Transcurrido (hh:mm:ss)", "tiempo_transcurrido"),
+    ("Contiene_Texto", "contiene_texto"),
+    ("Nitidez_Aplicada", "nitidez_aplicada"),
+    ("Tile", "tile"),
+    ("Ruta_Mejora", "ruta_mejora"),
+    ("Etapa_Deteccion", "etapa_deteccion"),
+    ("Desde_Cache", "desde_cache"),
+    ("Modelo", "modelo"),
+    ("Backend", "backend"),
+    ("Seg_Lectura", "seg_lectura"),
+    ("Seg_Deteccion", "seg_deteccion"),
+    ("Seg_Mejora", "seg_mejora"),
+    ("Seg_Sharpen", "seg_sharpen"),
+    ("Seg_Guardado", "seg_guardado"),
+    ("Perfil_Guardado", "perfil_guardado"),
+    ("Ancho_Entrada", "ancho_entrada"),
+    ("Alto_Entrada", "alto_entrada"),
+    ("Ancho_Salida", "ancho_salida"),
+    ("Alto_Salida", "alto_salida"),
+    ("Bytes_Leidos", "bytes_leidos"),
+    ("Bytes_Escritos", "bytes_escritos"),
+    ("Pico_RSS_MB", "pico_rss_mb"),
+]
+ENCABEZADO_LOG = ";".join(encabezado for encabezado, _ in COLUMNAS_LOG)
+
+# Extensiones que se conservan con formato_salida="auto"; el resto se guarda como PNG
+EXTENSIONES_SALIDA_DIRECTA = (".png", ".jpg", ".jpeg", ".jpe", ".bmp", ".tif", ".tiff", ".webp", ".jp2")
+
+# Código del log para las imágenes que no entran en el techo de RAM ni con el tile mínimo
+ERROR_NO_CABE = "NO_CABE_EN_MEMORIA"
+# Imagen que dejó de ser de este proceso (otro nodo retomó su reclamo): no se guarda ni se registra
+ERROR_ABANDONADA = "RECLAMO_PERDIDO"
+
+# Marca de fin de flujo entre etapas
+_FIN = object()
+
+
+class TrabajoImagen:
+    """Estado de una imagen a lo largo de las etapas del pipeline"""
+
+    def __init__(self, indice, nombre_archivo, ruta_entrada):
+        self.indice = indice
+        self.nombre_archivo = nombre_archivo
+        self.ruta_entrada = ruta_entrada
+        self.imagen = None
+        self.imagen_mejorada = None
+        self.contiene_texto = False
+        self.etapa_texto = "desactivada"
+        self.nivel_nitidez = None
+        self.tile = 0
+        self.hora_inicio = None
+        self.hora_fin = None
+        self.nombre_salida = None
+        self.ruta_salida = None
+        self.hash_entrada = None
+        self.clave_cache = None
+        self.desde_cache = False
+        self.error = None          # Código para el log (p. ej. ERROR_AL_GUARDAR)
+        self.mensaje_error = None
+        self.modelo = None
+        self.backend = None
+        self.ruta_mejora = None     # Cómo se llegó al tamaño de salida (ver output_policy)
+        self.por_franjas = False    # Mejorada, afilada y guardada de a franjas (TIFF) sin la salida completa en RAM
+        self.tiempos = {}          # Segundos por etapa: lectura, deteccion, mejora, sharpen, guardado
+        self.dimensiones_entrada = None
+        self.dimensiones_salida = None
+        self.bytes_leidos = None
+        self.bytes_escritos = None
+        self.perfil_guardado = None  # Perfil de codificación (ver encoder_pool); None si no lo guardó el codificador
+        self.pico_rss_mb = None
+
+    def registro(self):
+        """Valores del log de esta imagen, indexados por la clave JSON de COLUMNAS_LOG"""
+        terminado = not self.error
+        ancho_entrada, alto_entrada = self.dimensiones_entrada or (None, None)
+        ancho_salida, alto_salida = self.dimensiones_salida or (None, None)
+        return {
+            "imagen_original": self.nombre_archivo,
+            "imagen_procesada": self.nombre_salida if terminado else self.error,
+            "fecha": self.hora_inicio.strftime('%d/%m/%Y'),
+            "hora_inicio": self.hora_inicio.strftime('%H:%M:%S'),
+            "hora_fin": self.hora_fin.strftime('%H:%M:%S') if terminado else None,
+            "tiempo_transcurrido": str(self.hora_fin - self.hora_inicio) if terminado else None,
+            "contiene_texto": self.contiene_texto,
+            "nitidez_aplicada": self.nivel_nitidez,
+            "tile": self.tile,
+            "ruta_mejora": self.ruta_mejora,
+            "etapa_deteccion": self.etapa_texto,
+            "desde_cache": self.desde_cache,
+            "modelo": self.modelo,
+            "backend": self.backend,
+            "seg_lectura": self.tiempos.get("lectura"),
+            "seg_deteccion": self.tiempos.get("deteccion"),
+            "seg_mejora": self.tiempos.get("mejora"),
+            "seg_sharpen": self.tiempos.get("sharpen"),
+            "seg_guardado": self.tiempos.get("guardado"),
+            "perfil_guardado": self.perfil_guardado,
+            "ancho_entrada": ancho_entrada,
+            "alto_entrada": alto_entrada,
+            "ancho_salida": ancho_salida,
+            "alto_salida": alto_salida,
+            "bytes_leidos": self.bytes_leidos,
+            "bytes_escritos": self.bytes_escritos,
+            "pico_rss_mb": self.pico_rss_mb,
+        }
+
+    def linea_log(self):
+        registro = self.registro()
+        return ";".join(formatear_csv(registro[clave]) for _, clave in COLUMNAS_LOG)
+
+    def medir(self, etapa, inicio):
+        """Acumula en `tiempos[etapa]` los segundos transcurridos desde `inicio` (perf_counter)"""
+        self.tiempos[etapa] = round(self.tiempos.get(etapa, 0.0) + time.perf_counter() - inicio, 4)
+
+
+class BatchPipeline:
+    def __init__(self, enhancer, carpeta_entrada, carpeta_salida, nitidez, nitidez_texto,
+                 deteccion_texto, min_palabras=3, modo_debug=False, formato_salida="auto",
+                 borrar_originales=False, modelo='x4plus', control=None,
+                 max_entradas_en_cola=2, max_salidas_en_cola=1, cache=None, politica_salida=None,
+                 franjas_mp=0, perfil_codificacion="equilibrado", hilos_codificacion=2, max_mb_codificando=1024,
+                 hilos_lectura=2, abandonar=None):
+        """
+        Procesa un lote en etapas concurrentes unidas por colas acotadas:
+
+            lectura + detección de texto  →  mejora (Real-ESRGAN)  →  sharpen + guardado
+
+        Mientras el modelo mejora la imagen N, la etapa de lectura ya decodifica y
+        analiza la N+1 y la de escritura guarda la N-1.
+
+        Args:
+            enhancer (ImageEnhancer): Mejorador con el modelo ya cargado (o a cargar)
+            control (ControlLote): Pausa y cancelación (las maneja la ventana de progreso o la CLI)
+            max_entradas_en_cola (int): Imágenes decodificadas esperando al modelo
+            max_salidas_en_cola (int): Imágenes 4x esperando el sharpen. En memoria hay a
+                                      lo sumo esta cantidad + 2 salidas 4x (la que se afila
+                                      y la que produce el modelo), más las que se están
+                                      guardando (hasta `max_mb_codificando`)
+            cache (ResultCache): Si se indica, se omiten las imágenes ya procesadas con
+                                 los mismos parámetros y se reutilizan los veredictos de texto
+            politica_salida (PoliticaSalida): Tamaño de salida pedido (None = 4x siempre)
+            franjas_mp (float): Salidas 4x de al menos estos megapíxeles se mejoran, afilan
+                                y guardan de a franjas en un TIFF, sin tener nunca la imagen
+                                completa en memoria (0 = nunca)
+            perfil_codificacion (str): 'rapido', 'equilibrado' o 'compacto' (ver encoder_pool)
+            hilos_codificacion (int): Imágenes que se codifican y guardan a la vez en segundo plano
+            max_mb_codificando (int): MB de imágenes afiladas esperando a terminar de guardarse
+            hilos_lectura (int): Imágenes que se leen y analizan a la vez; así las pasadas de
+                                 OCR de varias imágenes se solapan en el pool de OCR
+                                 (1 en modo depuración, que muestra ventanas de OpenCV)
+            abandonar (callable): abandonar(nombre_archivo) devuelve True si la imagen ya no
+                                  es de este proceso (p. ej. otro nodo retomó su reclamo); se
+                                  consulta entre etapas y la imagen termina con ERROR_ABANDONADA
+                                  sin salida propia
+        """
+        self.enhancer = enhancer
+        self.carpeta_entrada = carpeta_entrada
+        self.carpeta_salida = carpeta_salida
+        self.nitidez = nitidez
+        self.nitidez_texto = nitidez_texto
+        self.deteccion_texto = deteccion_texto
+        self.min_palabras = min_palabras
+        self.modo_debug = modo_debug
+        self.formato_salida = formato_salida
+        self.borrar_originales = borrar_originales
+        self.modelo = modelo
+        self.control = control if control is not None else ControlLote()
+        # La cola de entrada tiene que poder juntar un lote completo para el modelo
+        self.max_entradas_en_cola = max(max_entradas_en_cola, getattr(enhancer, "tamano_lote", 1))
+        self.max_salidas_en_cola = max_salidas_en_cola
+        self.cache = cache
+        self.politica_salida = politica_salida if politica_salida is not None else PoliticaSalida()
+        self.franjas_mp = franjas_mp
+        self.perfil_codificacion = perfil_codificacion
+        self.hilos_codificacion = hilos_codificacion
+        self.max_mb_codificando = max_mb_codificando
+        self.hilos_lectura = 1 if modo_debug else max(1, hilos_lectura)
+        self.abandonar = abandonar
+        # Presupuesto del modelo elegido por planificar(); se aplica solo mientras dura ejecutar()
+        self.presupuesto_modelo_mb = None
+        self.sufijo = datetime.now().strftime("_mejorado_%Y-%m-%d_%H-%M")
+
+    def planificar(self, archivos, memoria_total_mb, dimensiones=None):
+        """
+        Ajusta colas y presupuesto del modelo (y con él el tile) para que el lote
+        completo no supere `memoria_total_mb`, a partir de las dimensiones leídas de
+        los encabezados (o de `dimensiones`, {archivo: (ancho, alto)}). Después se
+        llama a `ejecutar(plan.orden)`, que respeta el orden de `archivos`.
+
+        Returns:
+            PlanLote: `rechazadas` lista las imágenes que no entran ni con el tile mínimo;
+                      `trabajo_rechazado` las convierte en entradas para el log
+        """
+        plan = PlanificadorMemoria(self.enhancer, memoria_total_mb, self.politica_salida, self.franjas_mp,
+                                   self.hilos_codificacion, self.max_mb_codificando,
+                                   self.hilos_lectura).planificar(
+            self.carpeta_entrada, archivos, dimensiones)
+        self.max_entradas_en_cola = plan.max_entradas_en_cola
+        self.max_salidas_en_cola = plan.max_salidas_en_cola
+        # 0 significaría "sin límite" para el enhancer
+        self.presupuesto_modelo_mb = max(plan.presupuesto_modelo_mb, 1)
+        return plan
+
+    def trabajo_rechazado(self, indice, nombre_archivo):
+        """TrabajoImagen terminado con ERROR_NO_CABE, para registrar una imagen rechazada por el plan"""
+        trabajo = TrabajoImagen(indice, nombre_archivo, os.path.join(self.carpeta_entrada, nombre_archivo))
+        trabajo.hora_inicio = datetime.now(ZONA_HORARIA)
+        trabajo.hora_fin = trabajo.hora_inicio
+        trabajo.modelo = self.modelo
+        trabajo.error = ERROR_NO_CABE
+        return trabajo
+
+    def ejecutar(self, archivos, al_avanzar=None, al_completar=None):
+        """
+        Procesa la lista de archivos.
+
+        Los callbacks se invocan siempre desde el hilo que llama a `ejecutar`,
+        y `al_completar` en el mismo orden que `archivos`.
+
+        Args:
+            archivos (list): Nombres de archivo relativos a la carpeta de entrada
+            al_avanzar (callable): al_avanzar(trabajo, mensaje, porcentaje) al empezar cada mejora
+            al_completar (callable): al_completar(trabajo) cuando la imagen terminó (bien o con error)
+
+        Returns:
+            list: Los TrabajoImagen completados, en orden
+        """
+        cola_entrada = queue.Queue(maxsize=self.max_entradas_en_cola)
+        cola_salida = queue.Queue(maxsize=self.max_salidas_en_cola)
+        completados = queue.Queue()
+        resultados = []
+        self._detenido = threading.Event()
+        # La pausa y la cancelación llegan también al enhancer, entre tiles
+        self.enhancer.control = self.control
+        # El enhancer es compartido (p. ej. con la vista previa): su presupuesto se restaura al terminar
+        memoria_previa = self.enhancer.memoria_max_mb
+        if self.presupuesto_modelo_mb is not None:
+            self.enhancer.memoria_max_mb = self.presupuesto_modelo_mb
+
+        lector = threading.Thread(target=self._etapa_lectura, args=(archivos, cola_entrada), daemon=True)
+        escritor = threading.Thread(target=self._etapa_escritura, args=(cola_salida, completados), daemon=True)
+        lector.start()
+        escritor.start()
+
+        def despachar():
+            while True:
+                try:
+                    trabajo = completados.get_nowait()
+                except queue.Empty:
+                    return
+                resultados.append(trabajo)
+                if al_completar:
+                    al_completar(trabajo)
+
+        # Con lotes, imágenes consecutivas del mismo tamaño pasan juntas por el modelo
+        tamano_lote = getattr(self.enhancer, "tamano_lote", 1)
+        pendiente = None
+        try:
+            while True:
+                if pendiente is not None:
+                    trabajo, pendiente = pendiente, None
+                else:
+                    try:
+                        trabajo = cola_entrada.get(timeout=0.2)
+                    except queue.Empty:
+                        if self.control.cancelar:
+                            break
+                        despachar()
+                        continue
+
+                if trabajo is _FIN or self._esperar_pausa():
+                    break
+
+                lote = [trabajo]
+                if tamano_lote > 1 and self._necesita_mejora(trabajo):
+                    # Solo imágenes ya disponibles y consecutivas: el orden de salida no cambia
+                    while len(lote) < tamano_lote:
+                        try:
+                            siguiente = cola_entrada.get_nowait()
+                        except queue.Empty:
+                            break
+                        if (siguiente is not _FIN and self._necesita_mejora(siguiente)
+                                and siguiente.imagen.shape == trabajo.imagen.shape):
+                            lote.append(siguiente)
+                        else:
+                            pendiente = siguiente
+                            break
+
+                for trabajo in lote:
+                    self._abandonada(trabajo)
+                try:
+                    self._mejorar(lote, al_avanzar)
+                except LoteCancelado:
+                    # Las imágenes a medio mejorar no se registran: quedan para la próxima ejecución
+                    break
+                for trabajo in lote:
+                    trabajo.imagen = None
+                    cola_salida.put(trabajo)
+                    despachar()
+        finally:
+            self.enhancer.control = None
+            self.enhancer.memoria_max_mb = memoria_previa
+            self._detenido.set()
+            # El escritor siempre termina lo que ya recibió: no se pierde trabajo hecho
+            cola_salida.put(_FIN)
+            escritor.join()
+            lector.join()
+            despachar()
+            if self.cache is not None:
+                self.cache.guardar()
+
+        return resultados
+
+    def _esperar_pausa(self):
+        """Bloquea mientras esté en pausa. Devuelve True si se canceló el lote"""
+        return self.control.esperar_reanudacion()
+
+    def _poner(self, cola, item):
+        """put() que se rinde si el lote se cancela mientras la cola está llena"""
+        while True:
+            try:
+                cola.put(item, timeout=0.2)
+                return True
+            except queue.Full:
+                if self.control.cancelar or self._detenido.is_set():
+                    return False
+
+    def _etapa_lectura(self, archivos, cola_entrada):
+        """
+        Lee y analiza hasta `hilos_lectura` imágenes a la vez; `_encolar_leidas` las pasa
+        a la cola de entrada en el orden de `archivos`. Recorre `archivos` desde un solo
+        hilo, así un generador que espera (vigilancia, nodos) no frena lo ya leído.
+        """
+        en_orden = queue.Queue()
+        cupos = threading.Semaphore(self.hilos_lectura)
+        encolador = threading.Thread(target=self._encolar_leidas, args=(en_orden, cupos, cola_entrada), daemon=True)
+        encolador.start()
+        try:
+            with ThreadPoolExecutor(max_workers=self.hilos_lectura, thread_name_prefix="lectura") as ejecutor:
+                for i, nombre_archivo in enumerate(archivos):
+                    if self._esperar_pausa() or self._detenido.is_set():
+                        return
+                    while not cupos.acquire(timeout=0.2):
+                        if self.control.cancelar or self._detenido.is_set():
+                            return
+                    en_orden.put(ejecutor.submit(self._leer, i, nombre_archivo))
+        finally:
+            en_orden.put(None)
+            encolador.join()
+            # Si se canceló, el coordinador ya no espera el fin y _poner() se rinde
+            self._poner(cola_entrada, _FIN)
+
+    def _encolar_leidas(self, en_orden, cupos, cola_entrada):
+        encolar = True
+        while True:
+            futuro = en_orden.get()
+            if futuro is None:
+                return
+            trabajo = futuro.result()
+            # Tras una cancelación se siguen recogiendo (para liberar los cupos) sin encolar
+            encolar = encolar and self._poner(cola_entrada, trabajo)
+            cupos.release()
+
+    def _leer(self, indice, nombre_archivo):
+        """Lectura, decodificación y detección de texto de una imagen (en un hilo de lectura)"""
+        trabajo = TrabajoImagen(indice, nombre_archivo, os.path.join(self.carpeta_entrada, nombre_archivo))
+        trabajo.modelo = self.modelo
+        trabajo.backend = getattr(self.enhancer, "descripcion_backend", None)
+        try:
+            inicio = time.perf_counter()
+            with open(trabajo.ruta_entrada, "rb") as f:
+                datos = f.read()
+            trabajo.hora_inicio = datetime.now(ZONA_HORARIA)
+            trabajo.bytes_leidos = len(datos)
+
+            if self.cache is not None and self._buscar_en_cache(trabajo, hash_contenido(datos)):
+                return trabajo
+
+            trabajo.imagen = cv2.imdecode(np.frombuffer(datos, dtype=np.uint8), cv2.IMREAD_COLOR)
+            del datos
+            trabajo.medir("lectura", inicio)
+            if trabajo.imagen is None:
+                trabajo.error = "ERROR_AL_LEER"
+                trabajo.mensaje_error = "No se pudo leer la imagen"
+            else:
+                trabajo.dimensiones_entrada = (trabajo.imagen.shape[1], trabajo.imagen.shape[0])
+                if self.deteccion_texto:
+                    inicio = time.perf_counter()
+                    self._detectar_texto(trabajo)
+                    trabajo.medir("deteccion", inicio)
+        except Exception as e:
+            trabajo.hora_inicio = trabajo.hora_inicio or datetime.now(ZONA_HORARIA)
+            trabajo.error = "ERROR_AL_PROCESAR"
+            trabajo.mensaje_error = str(e)
+
+        trabajo.nivel_nitidez = self.nitidez_texto if trabajo.contiene_texto else self.nitidez
+        self._abandonada(trabajo)
+        return trabajo
+
+    def _abandonada(self, trabajo):
+        """Si la imagen dejó de ser de este proceso (ver `abandonar`), la descarta. Devuelve True en ese caso"""
+        if self.abandonar is None or trabajo.error or not self.abandonar(trabajo.nombre_archivo):
+            return False
+        trabajo.error = ERROR_ABANDONADA
+        trabajo.mensaje_error = "Otro proceso retomó la imagen"
+        trabajo.imagen = None
+        trabajo.imagen_mejorada = None
+        return True
+
+    def _ajustes_deteccion(self):
+        return (self.min_palabras, LADO_MAX_OCR, ",".join(c.nombre for c in CONFIGS_OCR))
+
+    def _buscar_en_cache(self, trabajo, hash_entrada):
+        """
+        Prepara las claves de caché del trabajo. Devuelve True si ya estaba hecho.
+        El veredicto de texto solo depende del contenido (ver _detectar_texto)
+        """
+        ext = self._extension_salida(trabajo.nombre_archivo)
+        trabajo.hash_entrada = hash_entrada
+        trabajo.clave_cache = clave_cache(
+            # Cada archivo tiene su propia salida (replicada en su subcarpeta): dos copias
+            # idénticas en carpetas distintas no comparten resultado. La salida lleva la
+            # fecha del lote, así que cuenta su ruta relativa sin el sufijo
+            hash_entrada, os.path.splitext(trabajo.nombre_archivo)[0].replace(os.sep, "/"), self.modelo, self.nitidez, self.nitidez_texto,
+            self.deteccion_texto, *self._ajustes_deteccion(), ext, self.politica_salida.clave(),
+            # Solo si está activo: no invalida las cachés de lotes sin salida por franjas
+            *([f"franjas={self.franjas_mp:g}"] if self.franjas_mp else []),
+            self.perfil_codificacion
+        )
+
+        previo = self.cache.buscar_resultado(trabajo.clave_cache)
+        if previo is None:
+            return False
+
+        trabajo.desde_cache = True
+        trabajo.nombre_salida = previo["salida"]
+        trabajo.ruta_salida = os.path.join(self.carpeta_salida, previo["salida"])
+        trabajo.contiene_texto = previo["contiene_texto"]
+        trabajo.etapa_texto = previo["etapa_texto"]
+        trabajo.nivel_nitidez = previo["nivel_nitidez"]
+        trabajo.tile = previo["tile"]
+        trabajo.hora_fin = trabajo.hora_inicio
+        return True
+
+    def _detectar_texto(self, trabajo):
+        clave_texto = None
+        if self.cache is not None:
+            clave_texto = clave_cache(trabajo.hash_entrada, *self._ajustes_deteccion())
+            previo = self.cache.buscar_texto(clave_texto)
+            if previo is not None:
+                trabajo.contiene_texto, trabajo.etapa_texto = previo
+                return
+
+        trabajo.contiene_texto, trabajo.etapa_texto = ImageProcessor.detectar_texto_con_etapa(
+            trabajo.imagen, min_palabras=self.min_palabras, debug=self.modo_debug,
+            pool_ocr=obtener_pool_ocr(self.hilos_lectura)
+        )
+        if clave_texto is not None and trabajo.etapa_texto != "error":
+            self.cache.registrar_texto(clave_texto, trabajo.contiene_texto, trabajo.etapa_texto)
+
+    @staticmethod
+    def _necesita_mejora(trabajo):
+        return not trabajo.error and not trabajo.desde_cache
+
+    def _mejorar(self, lote, al_avanzar):
+        """Mejora los trabajos del lote (de igual tamaño) en una sola pasada del modelo si son varios"""
+        por_mejorar = [t for t in lote if self._necesita_mejora(t)]
+        if not por_mejorar:
+            return
+        if al_avanzar:
+            mensaje = "Mejorando imagen..." if len(por_mejorar) == 1 else f"Mejorando {len(por_mejorar)} imágenes..."
+            al_avanzar(por_mejorar[0], mensaje, 60)
+
+        # Todas las imágenes del lote tienen el mismo tamaño, así que comparten el plan
+        plan = self.politica_salida.planificar(*por_mejorar[0].imagen.shape[:2])
+        for trabajo in por_mejorar:
+            trabajo.ruta_mejora = plan.descripcion()
+
+        if not plan.usa_modelo:
+            # La entrada ya alcanza el tamaño pedido: solo se reduce
+            for trabajo in por_mejorar:
+                inicio = time.perf_counter()
+                trabajo.imagen_mejorada = reescalar(trabajo.imagen, plan.factor)
+                trabajo.medir("mejora", inicio)
+                trabajo.tile = 0
+            return
+
+        if plan.por_franjas(*por_mejorar[0].imagen.shape[:2], self.franjas_mp):
+            for trabajo in por_mejorar:
+                self._mejorar_por_franjas(trabajo, plan)
+            return
+
+        if len(por_mejorar) > 1:
+            try:
+                inicio = time.perf_counter()
+                entradas = [reescalar(t.imagen, plan.escala_previa) for t in por_mejorar]
+                salidas = self.enhancer.enhance_lote(entradas, self.modelo, plan.outscale)
+                # El tiempo del lote se reparte en partes iguales entre sus imágenes
+                segundos = round((time.perf_counter() - inicio) / len(por_mejorar), 4)
+                for trabajo, entrada, salida in zip(por_mejorar, entradas, salidas):
+                    trabajo.imagen_mejorada = salida
+                    trabajo.tiempos["mejora"] = segundos
+                    trabajo.tile = self.enhancer.calcular_tile(*entrada.shape[:2])
+                return
+            except LoteCancelado:
+                raise
+            except Exception:
+                pass  # Se reintenta de a una para que el error quede solo en la imagen que falla
+
+        for trabajo in por_mejorar:
+            try:
+                inicio = time.perf_counter()
+                entrada = reescalar(trabajo.imagen, plan.escala_previa)
+                trabajo.imagen_mejorada = self.enhancer.enhance(entrada, self.modelo, plan.outscale)
+                trabajo.medir("mejora", inicio)
+                trabajo.tile = self.enhancer.ultimo_tile
+            except LoteCancelado:
+                raise
+            except Exception as e:
+                trabajo.error = "ERROR_AL_PROCESAR"
+                trabajo.mensaje_error = str(e)
+
+    def _mejorar_por_franjas(self, trabajo, plan):
+        """
+        Mejora, afila y guarda la imagen en un solo recorrido por franjas: la salida
+        4x nunca está completa en memoria. El resultado es siempre un TIFF por strips
+        (BigTIFF si supera 4 GB), y la etapa de escritura ya no tiene nada que guardar.
+        """
+        trabajo.por_franjas = True
+        escritor = None
+        guardado = 0.0
+        inicio = time.perf_counter()
+        try:
+            self._preparar_salida(trabajo, ".tif")
+            entrada = reescalar(trabajo.imagen, plan.escala_previa)
+            alto, ancho = entrada.shape[0] * ESCALA_MODELO, entrada.shape[1] * ESCALA_MODELO
+            escritor = EscritorTiffFranjas(trabajo.ruta_salida, alto, ancho)
+            franjas = ImageProcessor.aplicar_sharpen_por_franjas(
+                self.enhancer.enhance_por_franjas(entrada, self.modelo),
+                trabajo.nivel_nitidez, trabajo.contiene_texto
+            )
+            for franja in franjas:
+                inicio_escritura = time.perf_counter()
+                escritor.escribir(franja)
+                guardado += time.perf_counter() - inicio_escritura
+            inicio_escritura = time.perf_counter()
+            escritor.cerrar()
+            guardado += time.perf_counter() - inicio_escritura
+
+            # Mejora y sharpen se intercalan por franja: ambos quedan en "mejora"
+            trabajo.tiempos["mejora"] = round(time.perf_counter() - inicio - guardado, 4)
+            trabajo.tiempos["guardado"] = round(guardado, 4)
+            trabajo.tile = self.enhancer.ultimo_tile
+            trabajo.dimensiones_salida = (ancho, alto)
+            trabajo.hora_fin = datetime.now(ZONA_HORARIA)
+        except Exception as e:
+            # El TIFF se escribe en un archivo temporal: descartarlo no toca una salida anterior
+            if escritor is not None:
+                escritor.descartar()
+            if isinstance(e, LoteCancelado):
+                raise
+            trabajo.error = "ERROR_AL_GUARDAR" if isinstance(e, OSError) else "ERROR_AL_PROCESAR"
+            trabajo.mensaje_error = str(e)
+
+    def _extension_salida(self, nombre_archivo):
+        if self.formato_salida != "auto":
+            return f".{self.formato_salida}"
+        ext = os.path.splitext(nombre_archivo)[1]
+        # Formatos de entrada sin salida en color de 8 bits (pbm/pgm, hdr, ...) se guardan como PNG
+        return ext if ext.lower() in EXTENSIONES_SALIDA_DIRECTA else ".png"
+
+    def _preparar_salida(self, trabajo, ext):
+        """Nombre y ruta de salida; las subcarpetas de la entrada se replican en la salida"""
+        trabajo.nombre_salida = os.path.splitext(trabajo.nombre_archivo)[0] + self.sufijo + ext
+        trabajo.ruta_salida = os.path.join(self.carpeta_salida, trabajo.nombre_salida)
+        os.makedirs(os.path.dirname(trabajo.ruta_salida), exist_ok=True)
+
+    def _etapa_escritura(self, cola_salida, completados):
+        """
+        Aplica el sharpen y pasa cada imagen al codificador, que la guarda en segundo
+        plano. Las imágenes se entregan como completadas en el orden de llegada.
+        """
+        codificador = CodificadorAsincrono(self.hilos_codificacion, self.max_mb_codificando, self.perfil_codificacion)
+        try:
+            while True:
+                try:
+                    # Con guardados pendientes se revisa seguido si ya terminaron
+                    trabajo = cola_salida.get(timeout=0.1 if codificador.pendientes else None)
+                except queue.Empty:
+                    self._terminar_guardados(codificador.listos(), completados)
+                    continue
+                if trabajo is _FIN:
+                    break
+
+                if trabajo.desde_cache or trabajo.error or trabajo.por_franjas:
+                    self._terminar_guardados(codificador.encolar_sin_guardado((trabajo, None)), completados)
+                    continue
+
+                imagen = None
+                try:
+                    inicio = time.perf_counter()
+                    # En el lugar: la salida del modelo no se vuelve a usar
+                    imagen = ImageProcessor.aplicar_sharpen(
+                        trabajo.imagen_mejorada, trabajo.nivel_nitidez, trabajo.contiene_texto,
+                        destino=trabajo.imagen_mejorada
+                    )
+                    trabajo.medir("sharpen", inicio)
+                    trabajo.dimensiones_salida = (imagen.shape[1], imagen.shape[0])
+                    trabajo.hora_fin = datetime.now(ZONA_HORARIA)
+                except Exception as e:
+                    trabajo.error = "ERROR_AL_PROCESAR"
+                    trabajo.mensaje_error = str(e)
+                trabajo.imagen_mejorada = None
+
+                self._abandonada(trabajo)
+                if not trabajo.error:
+                    try:
+                        self._preparar_salida(trabajo, self._extension_salida(trabajo.nombre_archivo))
+                    except OSError as e:
+                        trabajo.error = "ERROR_AL_GUARDAR"
+                        trabajo.mensaje_error = str(e)
+                if trabajo.error:
+                    terminados = codificador.encolar_sin_guardado((trabajo, imagen))
+                else:
+                    terminados = codificador.enviar((trabajo, imagen), trabajo.ruta_salida, imagen)
+                self._terminar_guardados(terminados, completados)
+
+            self._terminar_guardados(codificador.vaciar(), completados)
+        finally:
+            codificador.cerrar()
+
+    def _terminar_guardados(self, terminados, completados):
+        """Registra en la caché, borra los originales y entrega los trabajos ya guardados"""
+        for (trabajo, imagen), resultado in terminados:
+            if trabajo.desde_cache:
+                if self.borrar_originales and os.path.exists(trabajo.ruta_salida):
+                    os.remove(trabajo.ruta_entrada)
+            elif self._abandonada(trabajo):
+                # Ya guardada, pero la imagen es de otro: no queda una salida duplicada
+                try:
+                    if trabajo.ruta_salida:
+                        os.remove(trabajo.ruta_salida)
+                except OSError:
+                    pass
+            elif not trabajo.error:
+                try:
+                    if resultado.error is not None:
+                        raise resultado.error
+                    if imagen is not None:
+                        trabajo.tiempos["guardado"] = resultado.segundos
+                        trabajo.perfil_guardado = self.perfil_codificacion
+                    trabajo.bytes_escritos = os.path.getsize(trabajo.ruta_salida)
+
+                    if self.cache is not None:
+                        self.cache.registrar_resultado(
+                            trabajo.clave_cache, trabajo.nombre_archivo, trabajo.nombre_salida,
+                            trabajo.contiene_texto, trabajo.etapa_texto, trabajo.nivel_nitidez, trabajo.tile
+                        )
+
+                    if self.borrar_originales and os.path.exists(trabajo.ruta_salida):
+                        os.remove(trabajo.ruta_entrada)
+                except Exception as e:
+                    trabajo.error = "ERROR_AL_GUARDAR"
+                    trabajo.mensaje_error = str(e)
+
+            # El buffer ya guardado se recicla para la próxima imagen del mismo tamaño
+            self.enhancer.liberar(imagen)
+            trabajo.pico_rss_mb = pico_memoria_mb()
+            completados.put(trabajo)
@@ -1,4 +1,6 @@
 # preview_window.py
+import queue
+import threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
@@ -6,10 +8,21 @@ import cv2
 import numpy as np
 from processor import ImageProcessor
 
+LADO_PREVIEW = 500          # Lado máximo del proxy mostrado en la ventana
+DEMORA_PREVIEW_MS = 60      # Eventos de slider más cercanos que esto se agrupan en un solo redibujado
+LADO_INSPECCION = 300       # Lado del recorte 1:1 a resolución completa
+MARGEN_KERNEL = 1           # Medio lado del kernel 3x3 de aplicar_sharpen
+LADO_ROI = 128              # Lado (en la entrada) de la región que se pasa por el modelo
+MARGEN_ROI = 10             # Contexto extra alrededor de la región (igual al tile_pad del enhancer)
+ESCALA_ROI = 4
+MAX_ROI_EN_CACHE = 6
+_CERRAR_ROI = object()      # Señal de fin para el hilo de inferencia de la región
+
 
 class SharpnessPreviewWindow:
     def __init__(self, root, imagen_path, nitidez_inicial, nitidez_texto_inicial,
-                 deteccion_texto_inicial, modo_debug_inicial, callback):
+                 deteccion_texto_inicial, modo_debug_inicial, callback,
+                 enhancer=None, modelo_inicial='x4plus'):
 
         self.callback = callback
         self.imagen_path = imagen_path
@@ -18,6 +31,25 @@ class SharpnessPreviewWindow:
         self.detectar_texto_val = tk.BooleanVar(value=deteccion_texto_inicial)
         self.modo_debug_val = tk.BooleanVar(value=modo_debug_inicial)
         self.texto_detectado_var = tk.StringVar()
+        self._preview_pendiente = None
+        self._ventana_inspeccion = None
+        self._centro_inspeccion = None
+
+        # Vista previa del modelo sobre una región: un único hilo atiende siempre la
+        # solicitud más reciente y el contador de generación descarta resultados viejos
+        self.enhancer = enhancer
+        self.modelo_val = tk.StringVar(value=modelo_inicial)
+        self.estado_roi_var = tk.StringVar()
+        self._ventana_roi = None
+        self._cache_roi = {}
+        self._generacion_roi = 0
+        self._solicitud_roi = None
+        self._lock_roi = threading.Lock()
+        self._evento_roi = threading.Event()
+        self._resultados_roi = queue.Queue()
+        self._hilo_roi = None
+        self._revisando_roi = False
+        self._roi_esperada = None   # Generación cuyo resultado falta recibir
 
         self.ventana = tk.Toplevel(root)
         self.ventana.title("Configuración de nitidez")
@@ -28,6 +60,8 @@ class SharpnessPreviewWindow:
 
     def _cerrar_ventana(self):
         """Maneja el cierre seguro de la ventana"""
+        self._cancelar_preview_pendiente()
+        self._detener_hilo_roi()
         if hasattr(self, 'imagen_cv'):
             cv2.destroyAllWindows()
         self.ventana.destroy()
@@ -61,6 +95,7 @@ class SharpnessPreviewWindow:
                 raise ValueError("No se pudo leer la imagen")
                 
             self.imagen_original = cv2.cvtColor(self.imagen_cv, cv2.COLOR_BGR2RGB)
+            self.proxy, self.escala_proxy = self._crear_proxy(self.imagen_original)
             self.tiene_texto = ImageProcessor.detectar_texto(self.imagen_cv, debug=False)
             self.texto_detectado_var.set(f"{'✓ Texto detectado' if self.tiene_texto else '✗ No se detectó texto'}")
         except Exception as e:
@@ -70,8 +105,11 @@ class SharpnessPreviewWindow:
 
         frame_img = tk.Frame(inner_frame)
         frame_img.pack(pady=10)
-        self.label_img = tk.Label(frame_img)
+        self.label_img = tk.Label(frame_img, cursor="crosshair")
         self.label_img.pack()
+        self.label_img.bind("<Button-1>", self._inspeccionar_en)
+        tk.Label(frame_img, text="Clic en la imagen para elegir la región a inspeccionar (1:1 y con el modelo)",
+                 font=('Arial', 8)).pack()
 
         frame_controles = tk.LabelFrame(inner_frame, text="Configuración de nitidez")
         frame_controles.pack(pady=5, padx=20, fill=tk.X)
@@ -93,8 +131,21 @@ class SharpnessPreviewWindow:
         tk.Checkbutton(frame_controles, text="Modo debug",
                        variable=self.modo_debug_val).pack(anchor=tk.W, pady=2)
 
-        self.nitidez_val.trace_add('write', lambda *_: self._actualizar_preview())
-        self.nitidez_texto_val.trace_add('write', lambda *_: self._actualizar_preview())
+        if self.enhancer is not None:
+            frame_modelo = tk.LabelFrame(inner_frame, text="Modelo (se usa también para el lote)")
+            frame_modelo.pack(pady=5, padx=20, fill=tk.X)
+
+            combo = ttk.Combobox(frame_modelo, textvariable=self.modelo_val, state="readonly",
+                                 values=list(self.enhancer.available_models))
+            combo.pack(side=tk.LEFT, padx=5, pady=5)
+            combo.bind("<<ComboboxSelected>>", lambda e: self._region_o_modelo_cambiado())
+
+            tk.Button(frame_modelo, text="Mejorar región",
+                      command=self._abrir_roi).pack(side=tk.LEFT, padx=5, pady=5)
+            tk.Label(frame_modelo, textvariable=self.estado_roi_var).pack(side=tk.LEFT, padx=5)
+
+        self.nitidez_val.trace_add('write', lambda *_: self._programar_preview())
+        self.nitidez_texto_val.trace_add('write', lambda *_: self._programar_preview())
 
         frame_botones = tk.Frame(inner_frame)
         frame_botones.pack(pady=10)
@@ -102,6 +153,9 @@ class SharpnessPreviewWindow:
         tk.Button(frame_botones, text="Probar detección de texto",
                   command=self._probar_deteccion).pack(side=tk.LEFT, padx=5)
 
+        tk.Button(frame_botones, text="Inspeccionar 1:1",
+                  command=self._abrir_inspeccion).pack(side=tk.LEFT, padx=5)
+
         tk.Button(frame_botones, text="Confirmar configuración",
                   command=self._confirmar).pack(side=tk.LEFT, padx=5)
 
@@ -109,15 +163,230 @@ class SharpnessPreviewWindow:
         inner_frame.update_idletasks()
         canvas.config(scrollregion=canvas.bbox("all"))
 
+    @staticmethod
+    def _crear_proxy(imagen):
+        """
+        Reduce la imagen una sola vez al tamaño de la vista previa.
+
+        Returns:
+            (proxy, escala) donde escala = lado del proxy / lado original (<= 1)
+        """
+        alto, ancho = imagen.shape[:2]
+        escala = min(1.0, LADO_PREVIEW / max(alto, ancho))
+        if escala >= 1.0:
+            return imagen, 1.0
+        tamano = (max(1, round(ancho * escala)), max(1, round(alto * escala)))
+        return cv2.resize(imagen, tamano, interpolation=cv2.INTER_AREA), escala
+
+    def _nivel_actual(self):
+        return self.nitidez_texto_val.get() if self.tiene_texto else self.nitidez_val.get()
+
+    def _programar_preview(self):
+        """Agrupa los eventos seguidos de los sliders: solo se redibuja tras una pausa breve"""
+        self._cancelar_preview_pendiente()
+        self._preview_pendiente = self.ventana.after(DEMORA_PREVIEW_MS, self._actualizar_preview)
+
+    def _cancelar_preview_pendiente(self):
+        if self._preview_pendiente is not None:
+            self.ventana.after_cancel(self._preview_pendiente)
+            self._preview_pendiente = None
+
     def _actualizar_preview(self):
-        nivel_nitidez = self.nitidez_texto_val.get() if self.tiene_texto else self.nitidez_val.get()
-        sharpened = ImageProcessor.aplicar_sharpen(self.imagen_original, nivel_nitidez, self.tiene_texto)
+        self._preview_pendiente = None
+        # El filtro se aplica solo sobre el proxy: el costo no depende del tamaño de la imagen
+        sharpened = ImageProcessor.aplicar_sharpen(self.proxy, self._nivel_actual(), self.tiene_texto)
+        if self._ventana_roi is not None and self._ventana_roi.winfo_exists():
+            x0, y0, x1, y1 = self._region_roi()
+            e = self.escala_proxy
+            cv2.rectangle(sharpened, (int(x0 * e), int(y0 * e)), (int(x1 * e), int(y1 * e)), (255, 64, 64), 1)
 
-        img_pil = Image.fromarray(sharpened)
-        img_pil.thumbnail((500, 500))
-        img_tk = ImageTk.PhotoImage(img_pil)
+        img_tk = ImageTk.PhotoImage(Image.fromarray(sharpened))
         self.label_img.configure(image=img_tk)
         self.label_img.image = img_tk
+        self._actualizar_inspeccion()
+        self._actualizar_roi()
+
+    def _inspeccionar_en(self, event):
+        """Centra el inspector 1:1 en el punto de la imagen original bajo el clic"""
+        alto, ancho = self.imagen_original.shape[:2]
+        self._centro_inspeccion = (
+            min(ancho - 1, int(event.x / self.escala_proxy)),
+            min(alto - 1, int(event.y / self.escala_proxy))
+        )
+        self._abrir_inspeccion()
+        self._region_o_modelo_cambiado()
+        self._actualizar_preview()
+
+    def _abrir_inspeccion(self):
+        if self._centro_inspeccion is None:
+            alto, ancho = self.imagen_original.shape[:2]
+            self._centro_inspeccion = (ancho // 2, alto // 2)
+
+        if self._ventana_inspeccion is None or not self._ventana_inspeccion.winfo_exists():
+            self._ventana_inspeccion = tk.Toplevel(self.ventana)
+            self._ventana_inspeccion.title("Inspección 1:1")
+            self._label_inspeccion = tk.Label(self._ventana_inspeccion)
+            self._label_inspeccion.pack(padx=5, pady=5)
+        self._actualizar_inspeccion()
+
+    def _actualizar_inspeccion(self):
+        """Aplica el filtro a resolución completa, pero solo sobre el recorte inspeccionado"""
+        if self._ventana_inspeccion is None or not self._ventana_inspeccion.winfo_exists():
+            return
+
+        alto, ancho = self.imagen_original.shape[:2]
+        cx, cy = self._centro_inspeccion
+        x0 = max(0, min(cx - LADO_INSPECCION // 2, ancho - LADO_INSPECCION))
+        y0 = max(0, min(cy - LADO_INSPECCION // 2, alto - LADO_INSPECCION))
+        x1, y1 = min(ancho, x0 + LADO_INSPECCION), min(alto, y0 + LADO_INSPECCION)
+
+        # Margen del kernel para que los bordes del recorte coincidan con el filtrado completo
+        mx0, my0 = max(0, x0 - MARGEN_KERNEL), max(0, y0 - MARGEN_KERNEL)
+        mx1, my1 = min(ancho, x1 + MARGEN_KERNEL), min(alto, y1 + MARGEN_KERNEL)
+        recorte = ImageProcessor.aplicar_sharpen(
+            self.imagen_original[my0:my1, mx0:mx1], self._nivel_actual(), self.tiene_texto
+        )[y0 - my0:y1 - my0, x0 - mx0:x1 - mx0]
+
+        img_tk = ImageTk.PhotoImage(Image.fromarray(np.ascontiguousarray(recorte)))
+        self._label_inspeccion.configure(image=img_tk)
+        self._label_inspeccion.image = img_tk
+        self._ventana_inspeccion.title(f"Inspección 1:1 ({x0}, {y0}) - ({x1}, {y1})")
+
+    # ---- Vista previa del modelo sobre una región ----
+
+    def _region_roi(self):
+        """Región (x0, y0, x1, y1) de la imagen original centrada en el punto elegido"""
+        alto, ancho = self.imagen_original.shape[:2]
+        if self._centro_inspeccion is None:
+            self._centro_inspeccion = (ancho // 2, alto // 2)
+        cx, cy = self._centro_inspeccion
+        x0 = max(0, min(cx - LADO_ROI // 2, ancho - LADO_ROI))
+        y0 = max(0, min(cy - LADO_ROI // 2, alto - LADO_ROI))
+        return x0, y0, min(ancho, x0 + LADO_ROI), min(alto, y0 + LADO_ROI)
+
+    def _abrir_roi(self):
+        if self._ventana_roi is None or not self._ventana_roi.winfo_exists():
+            self._ventana_roi = tk.Toplevel(self.ventana)
+            self._ventana_roi.title("Vista previa del modelo")
+            self._label_roi = tk.Label(self._ventana_roi)
+            self._label_roi.pack(padx=5, pady=5)
+        self._solicitar_roi()
+        self._actualizar_preview()
+
+    def _region_o_modelo_cambiado(self):
+        """Al cambiar de modelo o de región se abandona la inferencia en curso y se pide la nueva"""
+        if self._ventana_roi is not None and self._ventana_roi.winfo_exists():
+            self._solicitar_roi()
+
+    def _solicitar_roi(self):
+        modelo = self.modelo_val.get()
+        region = self._region_roi()
+        clave = (modelo,) + region
+
+        self._generacion_roi += 1
+        if clave in self._cache_roi:
+            with self._lock_roi:
+                self._solicitud_roi = None
+            self._roi_esperada = None
+            self.estado_roi_var.set("")
+            self._actualizar_roi()
+            return
+
+        # Región con contexto alrededor, para que los bordes coincidan con la imagen completa
+        alto, ancho = self.imagen_cv.shape[:2]
+        x0, y0, x1, y1 = region
+        mx0, my0 = max(0, x0 - MARGEN_ROI), max(0, y0 - MARGEN_ROI)
+        mx1, my1 = min(ancho, x1 + MARGEN_ROI), min(alto, y1 + MARGEN_ROI)
+        recorte = self.imagen_cv[my0:my1, mx0:mx1].copy()
+        interior = (x0 - mx0, y0 - my0, x1 - mx0, y1 - my0)
+
+        with self._lock_roi:
+            self._solicitud_roi = (self._generacion_roi, modelo, clave, recorte, interior)
+        self._roi_esperada = self._generacion_roi
+        self._evento_roi.set()
+        if self._hilo_roi is None:
+            self._hilo_roi = threading.Thread(target=self._procesar_roi, daemon=True)
+            self._hilo_roi.start()
+
+        self.estado_roi_var.set(f"Procesando región con {modelo}...")
+        if not self._revisando_roi:
+            self._revisando_roi = True
+            self.ventana.after(100, self._revisar_roi)
+
+    def _procesar_roi(self):
+        """Hilo de inferencia: atiende siempre la última solicitud y descarta las intermedias"""
+        while True:
+            self._evento_roi.wait()
+            with self._lock_roi:
+                solicitud, self._solicitud_roi = self._solicitud_roi, None
+                self._evento_roi.clear()
+            if solicitud is _CERRAR_ROI:
+                return
+            if solicitud is None:
+                continue
+
+            generacion, modelo, clave, recorte, interior = solicitud
+            if generacion != self._generacion_roi:
+                continue
+            try:
+                mejorado = self.enhancer.enhance(recorte, modelo)
+                self._resultados_roi.put((generacion, clave, mejorado, interior, None))
+            except Exception as e:
+                self._resultados_roi.put((generacion, clave, None, interior, str(e)))
+
+    def _revisar_roi(self):
+        """Recoge en el hilo de Tk los resultados del hilo de inferencia"""
+        if not self.ventana.winfo_exists():
+            return
+        self._revisando_roi = False
+        while True:
+            try:
+                generacion, clave, mejorado, interior, error = self._resultados_roi.get_nowait()
+            except queue.Empty:
+                break
+            vigente = generacion == self._roi_esperada
+            if error:
+                if vigente:
+                    self._roi_esperada = None
+                    self.estado_roi_var.set(f"Error: {error}")
+                continue
+            # Se guarda aunque sea de una generación anterior: si se vuelve a esa región ya está lista
+            self._cache_roi[clave] = (cv2.cvtColor(mejorado, cv2.COLOR_BGR2RGB), interior)
+            while len(self._cache_roi) > MAX_ROI_EN_CACHE:
+                self._cache_roi.pop(next(iter(self._cache_roi)))
+            if vigente:
+                self._roi_esperada = None
+                self.estado_roi_var.set("")
+                self._actualizar_roi()
+        if self._roi_esperada is not None:
+            self._revisando_roi = True
+            self.ventana.after(100, self._revisar_roi)
+
+    def _actualizar_roi(self):
+        """Aplica la nitidez actual al recorte 4x en caché (sin volver a ejecutar el modelo)"""
+        if self._ventana_roi is None or not self._ventana_roi.winfo_exists():
+            return
+        entrada = self._cache_roi.get((self.modelo_val.get(),) + self._region_roi())
+        if entrada is None:
+            return
+
+        mejorado, (ix0, iy0, ix1, iy1) = entrada
+        resultado = ImageProcessor.aplicar_sharpen(mejorado, self._nivel_actual(), self.tiene_texto)[
+            iy0 * ESCALA_ROI:iy1 * ESCALA_ROI, ix0 * ESCALA_ROI:ix1 * ESCALA_ROI
+        ]
+        img_tk = ImageTk.PhotoImage(Image.fromarray(np.ascontiguousarray(resultado)))
+        self._label_roi.configure(image=img_tk)
+        self._label_roi.image = img_tk
+        self._ventana_roi.title(f"Vista previa del modelo - {self.modelo_val.get()}")
+
+    def _detener_hilo_roi(self):
+        self._generacion_roi += 1
+        self._roi_esperada = None
+        if self._hilo_roi is not None:
+            with self._lock_roi:
+                self._solicitud_roi = _CERRAR_ROI
+            self._evento_roi.set()
+            self._hilo_roi = None
 
     def _probar_deteccion(self):
         self.tiene_texto = ImageProcessor.detectar_texto(self.imagen_cv, debug=self.modo_debug_val.get())
@@ -125,12 +394,15 @@ class SharpnessPreviewWindow:
         self._actualizar_preview()
 
     def _confirmar(self):
+        self._cancelar_preview_pendiente()
+        self._detener_hilo_roi()
         self.ventana.destroy()
         self.callback(
             self.nitidez_val.get(),
             self.nitidez_texto_val.get(),
             self.detectar_texto_val.get(),
-            self.modo_debug_val.get()
+            self.modo_debug_val.get(),
+            self.modelo_val.get()
         )
 
         
\ No newline at end of file
@@ -2,15 +2,32 @@
 import cv2
 import numpy as np
 import pytesseract
-from pytesseract import Output
 import re
 import pytz
 import os
 import sys
 from pathlib import Path
 
+from ocr_pool import ConfigOCR, obtener_pool_ocr
+
 ZONA_HORARIA = pytz.timezone('America/Argentina/Buenos_Aires')
 
+# Lado mayor máximo de la copia sobre la que se hace el OCR
+LADO_MAX_OCR = 2000
+# Alto (en píxeles de la copia para OCR) de un componente para considerarlo carácter
+ALTO_MIN_CARACTER = 8
+ALTO_MAX_CARACTER = 120
+
+# Pasadas de Tesseract, en orden de costo creciente
+CONFIGS_OCR = [
+    ConfigOCR(6, 'spa', "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyzÁÉÍÓÚáéíóú0123456789-.,:()/°"),
+    ConfigOCR(11, 'spa'),
+    ConfigOCR(4, 'spa+eng')
+]
+
+# Tabla de corrección gamma (1.5) usada antes de binarizar
+TABLA_GAMMA = np.array([((i / 255.0) ** (1.0 / 1.5)) * 255 for i in np.arange(0, 256)]).astype("uint8")
+
 def get_tesseract_cmd():
     """Gestión inteligente de rutas para Tesseract para funcionar en desarrollo y en .exe"""
     try:
@@ -63,7 +80,7 @@ except Exception as e:
 
 class ImageProcessor:
     @staticmethod
-    def aplicar_sharpen(imagen_cv2, nitidez=1.0, tiene_texto=False):
+    def aplicar_sharpen(imagen_cv2, nitidez=1.0, tiene_texto=False, destino=None):
         """
         Aplica filtro de sharpening adaptativo según si la imagen contiene texto
         
@@ -71,6 +88,8 @@ class ImageProcessor:
             imagen_cv2: Imagen en formato OpenCV (BGR)
             nitidez: Nivel de nitidez (0.0 a 3.0)
             tiene_texto: Booleano que indica si la imagen contiene texto
+            destino: Array donde escribir el resultado (puede ser la misma imagen
+                     de entrada para filtrar en el lugar); None crea uno nuevo
             
         Returns:
             Imagen procesada con filtro de sharpening
@@ -87,7 +106,71 @@ class ImageProcessor:
                 [-0.2, 1 + 0.8 * nitidez, -0.2],
                 [0, -0.2, 0]
             ])
-        return cv2.filter2D(imagen_cv2, -1, kernel, borderType=cv2.BORDER_REFLECT)
+        return cv2.filter2D(imagen_cv2, -1, kernel, dst=destino, borderType=cv2.BORDER_REFLECT)
+
+    @staticmethod
+    def aplicar_sharpen_por_franjas(franjas, nitidez=1.0, tiene_texto=False):
+        """
+        Sharpening de una imagen que llega de a franjas horizontales consecutivas.
+        
+        El kernel es 3x3: cada franja se filtra junto con la última fila de la anterior
+        (contexto superior) y se retiene su última fila hasta recibir la siguiente
+        (contexto inferior). El resultado es idéntico a aplicar_sharpen sobre la imagen completa.
+        
+        Args:
+            franjas: Iterable de arrays BGR con el mismo ancho (pueden ser vistas reutilizadas)
+            
+        Yields:
+            Franjas afiladas, en orden; juntas cubren todas las filas de la entrada
+        """
+        arriba = None       # Última fila ya entregada (sin afilar): contexto de la siguiente
+        retenida = None     # Última fila recibida: falta su vecina inferior
+        for franja in franjas:
+            if not len(franja):
+                continue
+            partes = [p for p in (arriba, retenida) if p is not None]
+            ventana = np.concatenate(partes + [franja]) if partes else franja
+            if len(ventana) - (arriba is not None) < 2:
+                retenida = ventana[-1:].copy()
+                continue
+            afilada = ImageProcessor.aplicar_sharpen(ventana, nitidez, tiene_texto)
+            yield afilada[(1 if arriba is not None else 0):-1]
+            arriba, retenida = ventana[-2:-1].copy(), ventana[-1:].copy()
+
+        if retenida is not None:
+            ventana = np.concatenate([arriba, retenida]) if arriba is not None else retenida
+            yield ImageProcessor.aplicar_sharpen(ventana, nitidez, tiene_texto)[-1:]
+
+    @staticmethod
+    def puntaje_texto(binaria):
+        """
+        Estimación rápida (solo OpenCV) de cuánto "parece texto" una imagen binarizada
+        
+        Cuenta los componentes conexos con geometría de carácter: alto acotado,
+        proporción razonable y relleno parcial del rectángulo que los contiene.
+        
+        Args:
+            binaria: Imagen binaria con el trazo en blanco (THRESH_BINARY_INV)
+            
+        Returns:
+            Cantidad de componentes candidatos a carácter
+        """
+        n, _, stats, _ = cv2.connectedComponentsWithStats(binaria, connectivity=8)
+        if n <= 1:
+            return 0
+
+        ancho = stats[1:, cv2.CC_STAT_WIDTH]
+        alto = stats[1:, cv2.CC_STAT_HEIGHT]
+        area = stats[1:, cv2.CC_STAT_AREA]
+        relleno = area / np.maximum(ancho * alto, 1)
+        proporcion = ancho / np.maximum(alto, 1)
+
+        candidatos = (
+            (alto >= ALTO_MIN_CARACTER) & (alto <= ALTO_MAX_CARACTER) &
+            (proporcion >= 0.1) & (proporcion <= 4.0) &
+            (relleno >= 0.1) & (relleno <= 0.9)
+        )
+        return int(np.count_nonzero(candidatos))
 
     @staticmethod
     def detectar_texto(imagen, min_palabras=2, debug=False):
@@ -102,15 +185,42 @@ class ImageProcessor:
         Returns:
             Booleano indicando si se detectó texto suficiente
         """
+        return ImageProcessor.detectar_texto_con_etapa(imagen, min_palabras, debug)[0]
+
+    @staticmethod
+    def detectar_texto_con_etapa(imagen, min_palabras=2, debug=False, lado_max=LADO_MAX_OCR, pool_ocr=None):
+        """
+        Detección de texto en cascada, de la etapa más barata a la más cara
+        
+        1. Prefiltro OpenCV: si no hay suficientes formas de carácter, no hay texto.
+        2. Configuraciones de Tesseract, de a una en el pool de OCR y en orden de
+           costo; la siguiente se lanza solo si la anterior no alcanzó `min_palabras`
+           palabras válidas, así una imagen resuelta no paga las pasadas más caras.
+        El OCR trabaja sobre una copia reducida a `lado_max` píxeles de lado mayor.
+        
+        Args:
+            imagen: Imagen en formato OpenCV (BGR)
+            min_palabras: Mínimo de palabras válidas para considerar que hay texto
+            debug: Modo depuración para mostrar información detallada
+            lado_max: Lado mayor máximo de la copia usada para el OCR (0 = sin límite)
+            pool_ocr: OCRPool a utilizar (por defecto, el compartido del proceso)
+            
+        Returns:
+            Tupla (contiene_texto, etapa) donde etapa indica qué paso tomó la decisión
+            ('prefiltro', 'psm 6', 'psm 11', 'psm 4', 'tesseract' o 'error')
+        """
         try:
+            # Copia de resolución acotada para el análisis
+            alto, ancho = imagen.shape[:2]
+            if lado_max and max(alto, ancho) > lado_max:
+                factor = lado_max / max(alto, ancho)
+                imagen = cv2.resize(imagen, (round(ancho * factor), round(alto * factor)), interpolation=cv2.INTER_AREA)
+
             # Preprocesamiento de imagen
             gris = cv2.cvtColor(imagen, cv2.COLOR_BGR2GRAY)
             
             # Ajuste de gamma para mejorar contraste
-            gamma = 1.5
-            inv_gamma = 1.0 / gamma
-            table = np.array([((i / 255.0) ** inv_gamma) * 255 for i in np.arange(0, 256)]).astype("uint8")
-            gris = cv2.LUT(gris, table)
+            gris = cv2.LUT(gris, TABLA_GAMMA)
 
             # Binarización adaptativa
             binaria = cv2.adaptiveThreshold(
@@ -118,52 +228,61 @@ class ImageProcessor:
                 cv2.THRESH_BINARY_INV, 41, 10
             )
 
-            # Configuraciones múltiples para mejorar detección
-            configs = [
-                ('--psm 6 --oem 3 -c tessedit_char_whitelist="ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyzÁÉÍÓÚáéíóú0123456789-.,:()/°"', 'spa'),
-                ('--psm 11 --oem 3', 'spa'),
-                ('--psm 4 --oem 3', 'spa+eng')
-            ]
+            # Etapa 1: prefiltro sin OCR (cada palabra válida tiene al menos 3 caracteres)
+            candidatos = ImageProcessor.puntaje_texto(binaria)
+            if debug:
+                print(f"Prefiltro: {candidatos} componentes con forma de carácter")
+            if candidatos < min_palabras * 3:
+                return False, "prefiltro"
 
-            palabras_validas = []
-            for config, lang in configs:
+            # Etapa 2: configuraciones en orden de costo creciente. Cada pasada se
+            # envía recién cuando la anterior no alcanzó el mínimo de palabras
+            pool = pool_ocr or obtener_pool_ocr()
+            palabras_validas = set()
+            etapa = "tesseract"
+            for config in CONFIGS_OCR:
                 try:
-                    data = pytesseract.image_to_data(
-                        binaria, config=config, 
-                        lang=lang, output_type=Output.DICT
-                    )
-                    
-                    for i, word in enumerate(data['text']):
-                        word = word.strip()
-                        try:
-                            conf = int(data['conf'][i])
-                        except (ValueError, TypeError):
-                            conf = 0
-
-                        # Validación de palabra detectada
-                        if (len(word) >= 3 and conf > 70 and 
-                            any(c.isalpha() for c in word) and
-                            not re.fullmatch(r'^\W+$', word)):
-                            palabras_validas.append(word)
+                    data = pool.enviar(binaria, config).result()
+                    palabras_validas.update(ImageProcessor._palabras_validas(data))
                 except Exception as e:
                     if debug:
-                        print(f"Error con configuración {config}: {e}")
+                        print(f"Error con configuración {config.como_argumentos()}: {e}")
+
+                if len(palabras_validas) >= min_palabras:
+                    etapa = config.nombre
+                    break
 
             # Verificación de resultados
             if debug:
                 print("=== DEBUG DETALLADO ===")
-                print(f"Configuraciones probadas: {len(configs)}")
-                print(f"Palabras únicas detectadas: {list(set(palabras_validas))}")
+                print(f"Etapa de decisión: {etapa}")
+                print(f"Palabras únicas detectadas: {list(palabras_validas)}")
                 cv2.imshow("Imagen preprocesada", binaria)
                 cv2.waitKey(0)
                 cv2.destroyAllWindows()
 
-            return len(set(palabras_validas)) >= min_palabras
+            return len(palabras_validas) >= min_palabras, etapa
 
         except Exception as e:
             print(f"Error en detección de texto: {e}")
             if debug:
                 raise  # Relanza la excepción en modo debug
-            return False
-        
-        
\ No newline at end of file
+            return False, "error"
+
+    @staticmethod
+    def _palabras_validas(data):
+        """Extrae las palabras confiables de una salida image_to_data (Output.DICT)"""
+        palabras = []
+        for i, word in enumerate(data['text']):
+            word = word.strip()
+            try:
+                conf = int(float(data['conf'][i]))
+            except (ValueError, TypeError):
+                conf = 0
+
+            # Validación de palabra detectada
+            if (len(word) >= 3 and conf > 70 and 
+                any(c.isalpha() for c in word) and
+                not re.fullmatch(r'^\W+$', word)):
+                palabras.append(word)
+        return palabras
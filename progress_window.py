@@ -1,19 +1,91 @@
 # progress_window.py
+import time
+import queue
 import tkinter as tk
-from tkinter import ttk
-import os
+from tkinter import ttk, messagebox
+
+# Cada cuánto el hilo de Tk aplica los eventos acumulados: la ventana se redibuja a
+# lo sumo a este ritmo, sin importar cuántas imágenes terminen entre medio
+INTERVALO_MS = 250
+ETAPAS = (("lectura", "Lectura"), ("deteccion", "Texto"), ("mejora", "Mejora"),
+          ("sharpen", "Nitidez"), ("guardado", "Guardado"))
+
+
+def formatear_duracion(segundos):
+    segundos = int(round(segundos))
+    horas, resto = divmod(segundos, 3600)
+    minutos, segundos = divmod(resto, 60)
+    return f"{horas}:{minutos:02d}:{segundos:02d}" if horas else f"{minutos}:{segundos:02d}"
+
+
+class EstadisticasLote:
+    """Promedios acumulados de las imágenes terminadas, para ritmo y ETA"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.completadas = 0
+        self.megapixeles = 0.0
+        self.segundos_por_etapa = {}
+        self.fin = None
+
+    def agregar(self, megapixeles, tiempos):
+        self.completadas += 1
+        self.megapixeles += megapixeles
+        for etapa, segundos in tiempos.items():
+            self.segundos_por_etapa[etapa] = self.segundos_por_etapa.get(etapa, 0.0) + segundos
+
+    def detener(self):
+        """Congela el reloj al terminar el lote"""
+        self.fin = time.perf_counter()
+
+    def transcurrido(self):
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    def imagenes_por_segundo(self):
+        return self.completadas / max(self.transcurrido(), 1e-6)
+
+    def megapixeles_por_segundo(self):
+        return self.megapixeles / max(self.transcurrido(), 1e-6)
+
+    def eta(self, total):
+        """Segundos restantes al ritmo medido hasta ahora; None sin imágenes terminadas"""
+        if not self.completadas:
+            return None
+        return max(total - self.completadas, 0) / self.imagenes_por_segundo()
+
+    def desglose(self):
+        """Segundos medios por imagen en cada etapa (las etapas se solapan entre imágenes)"""
+        return [(nombre, self.segundos_por_etapa[etapa] / self.completadas)
+                for etapa, nombre in ETAPAS if self.segundos_por_etapa.get(etapa)]
+
 
 class ProgressWindow:
-    def __init__(self, master):
+    def __init__(self, master, control):
+        """
+        Ventana de progreso del lote. Se crea desde el hilo de Tk.
+
+        Los métodos `actualizar_*`, `imagen_completada`, `avisar` y `finalizar` se
+        pueden llamar desde cualquier hilo: solo encolan un evento. El hilo de Tk
+        los aplica cada INTERVALO_MS, quedándose con el último valor de cada tipo.
+
+        Args:
+            master: Ventana padre
+            control (ControlLote): Pausa/cancelación que manejan los botones
+        """
         self.master = master
+        self.control = control
+        self.eventos = queue.Queue()
+        self.estadisticas = EstadisticasLote()
+        self.total = 0
+        self.terminado = False
+        self.salir_al_terminar = False
+
         self.window = tk.Toplevel(master)
         self.window.title("Procesando imágenes...")
-        self.window.geometry("450x210")
-
-        self.cancelar = False
-        self.pausar = False
+        self.window.geometry("450x290")
 
         self._crear_widgets()
+        self.window.after(INTERVALO_MS, self._drenar)
 
     def _crear_widgets(self):
         self.frame = tk.Frame(self.window)
@@ -23,12 +95,17 @@ class ProgressWindow:
         self.progress_archivo = ttk.Progressbar(self.frame, orient=tk.HORIZONTAL, length=400, mode='determinate')
         self.progress_archivo.pack(pady=5)
 
-        self.lbl_contador = tk.Label(self.frame, text="Archivo 0 de 0", font=('Arial', 9))
+        self.lbl_contador = tk.Label(self.frame, text="0 de 0 imágenes terminadas", font=('Arial', 9))
         self.lbl_contador.pack(pady=5)
 
         self.lbl_estado = tk.Label(self.frame, text="Preparando...", font=('Arial', 10))
         self.lbl_estado.pack(pady=5)
 
+        self.lbl_ritmo = tk.Label(self.frame, text="", font=('Arial', 9))
+        self.lbl_ritmo.pack()
+        self.lbl_etapas = tk.Label(self.frame, text="", font=('Arial', 8), fg="gray30")
+        self.lbl_etapas.pack()
+
         frame_botones = tk.Frame(self.frame)
         frame_botones.pack(pady=10)
 
@@ -41,32 +118,105 @@ class ProgressWindow:
         self.window.protocol("WM_DELETE_WINDOW", self._cerrar)
 
     def _toggle_pausa(self):
-        self.pausar = not self.pausar
-        self.btn_pausar.config(text="Continuar" if self.pausar else "Pausar")
+        self.control.pausar = not self.control.pausar
+        self.btn_pausar.config(text="Continuar" if self.control.pausar else "Pausar")
 
     def _cerrar(self):
-        self.cancelar = True
+        """
+        Con el lote en curso, lo cancela: la imagen actual se corta entre tiles, lo ya
+        mejorado se termina de guardar y el log queda completo. La aplicación se cierra
+        cuando el proceso avisa que terminó.
+        """
+        if self.terminado:
+            self._salir()
+            return
+        self.control.cancelar = True
+        self.salir_al_terminar = True
+        self.lbl_estado.config(text="Cancelando: guardando lo ya procesado...")
+        self.btn_pausar.config(state="disabled")
+        self.btn_finalizar.config(state="disabled")
+
+    def _salir(self):
+        """Termina el mainloop; el proceso sale normalmente (sin escrituras a medias)"""
+        self.window.quit()
         try:
             self.window.destroy()
-        except:
+        except tk.TclError:
             pass
-        os._exit(0)
+
+    # --- Desde cualquier hilo ---
 
     def actualizar_estado(self, mensaje):
-        self.lbl_estado.config(text=mensaje)
-        self.window.update()
+        self.eventos.put(("estado", mensaje))
 
     def actualizar_contador(self, actual, total):
-        self.lbl_contador.config(text=f"Archivo {actual} de {total}")
-        self.window.update()
+        """Imágenes terminadas (bien, desde la caché o con error) sobre el total del lote"""
+        self.eventos.put(("contador", (actual, total)))
 
     def actualizar_progreso(self, valor):
-        self.progress_archivo["value"] = valor
-        self.window.update()
+        self.eventos.put(("progreso", valor))
 
-    def finalizar(self, mensaje_final):
-        self.actualizar_estado(mensaje_final)
-        self.btn_pausar.config(state="disabled")
-        self.btn_finalizar.config(text="Cerrar", command=self._cerrar)
-        self.window.wait_window()
+    def imagen_completada(self, megapixeles, tiempos):
+        """Suma una imagen terminada a las estadísticas (tiempos: segundos por etapa)"""
+        self.eventos.put(("imagen", (megapixeles, dict(tiempos))))
+
+    def avisar(self, titulo, mensaje):
+        """Muestra un aviso sin bloquear a quien llama"""
+        self.eventos.put(("aviso", (titulo, mensaje)))
 
+    def finalizar(self, mensaje_final):
+        self.eventos.put(("fin", mensaje_final))
+
+    # --- Hilo de Tk ---
+
+    def _drenar(self):
+        ultimos, avisos = {}, []
+        while True:
+            try:
+                tipo, datos = self.eventos.get_nowait()
+            except queue.Empty:
+                break
+            if tipo == "imagen":
+                self.estadisticas.agregar(*datos)
+            elif tipo == "aviso":
+                avisos.append(datos)
+            elif tipo == "fin":
+                ultimos.setdefault("fin", datos)     # Cuenta el primero (p. ej. un error)
+            else:
+                ultimos[tipo] = datos
+
+        if "contador" in ultimos:
+            actual, self.total = ultimos["contador"]
+            self.lbl_contador.config(text=f"{actual} de {self.total} imágenes terminadas")
+        if "estado" in ultimos and not self.terminado:
+            self.lbl_estado.config(text=ultimos["estado"])
+        if "progreso" in ultimos:
+            self.progress_archivo["value"] = ultimos["progreso"]
+        if "fin" in ultimos and not self.terminado:
+            self.terminado = True
+            self.estadisticas.detener()
+            self.lbl_estado.config(text=ultimos["fin"])
+            self.btn_pausar.config(state="disabled")
+            self.btn_finalizar.config(text="Cerrar", state="normal")
+            if self.salir_al_terminar:
+                self._salir()
+                return
+        self._mostrar_ritmo()
+        for titulo, mensaje in avisos:
+            messagebox.showwarning(titulo, mensaje, parent=self.window)
+
+        self.window.after(INTERVALO_MS, self._drenar)
+
+    def _mostrar_ritmo(self):
+        estadisticas = self.estadisticas
+        if not estadisticas.completadas:
+            return
+        texto = (f"{estadisticas.imagenes_por_segundo():.2f} img/s · "
+                 f"{estadisticas.megapixeles_por_segundo():.2f} MP/s")
+        eta = estadisticas.eta(self.total)
+        if eta is not None and not self.terminado:
+            texto += f" · Restan ~{formatear_duracion(eta)}"
+        elif self.terminado:
+            texto += f" · Total {formatear_duracion(estadisticas.transcurrido())}"
+        self.lbl_ritmo.config(text=texto)
+        self.lbl_etapas.config(text=" · ".join(f"{nombre} {segundos:.2f}s" for nombre, segundos in estadisticas.desglose()))
@@ -0,0 +1,238 @@
+# quantization.py
+import os
+import copy
+import json
+import glob
+
+import cv2
+import numpy as np
+import torch
+
+from model_registry import SUFIJO_INT8
+from result_cache import clave_cache
+from synthetic_inputs import generar_entradas
+
+LADO_PARCHE = 96            # Lado de los parches de calibración/evaluación (en la entrada)
+PARCHES_CALIBRACION = 8
+PARCHES_EVALUACION = 8
+SEMILLA_PARCHES = 1234
+EXTENSIONES_CALIBRACION = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff", ".webp")
+
+
+def es_variante_int8(nombre_modelo):
+    return nombre_modelo.endswith(SUFIJO_INT8)
+
+
+def modelo_base(nombre_modelo):
+    """'x4plus_int8' → 'x4plus'"""
+    return nombre_modelo[:-len(SUFIJO_INT8)] if es_variante_int8(nombre_modelo) else nombre_modelo
+
+
+class ConfigCuantizacion:
+    def __init__(self, psnr_min=30.0, ssim_min=0.95, carpeta_calibracion=None):
+        """
+        Umbrales de calidad para aceptar una variante int8 frente a su modelo fp32.
+
+        Args:
+            psnr_min (float): PSNR medio mínimo (dB) entre la salida int8 y la fp32
+            ssim_min (float): SSIM medio mínimo entre la salida int8 y la fp32
+            carpeta_calibracion (str): Imágenes representativas para calibrar y evaluar.
+                                       Si no hay, se usan imágenes sintéticas reproducibles
+        """
+        self.psnr_min = psnr_min
+        self.ssim_min = ssim_min
+        self.carpeta_calibracion = carpeta_calibracion or None
+
+
+def cuantizacion_desde_config(config):
+    """Crea un ConfigCuantizacion con los valores del archivo de configuración (ConfigManager)"""
+    return ConfigCuantizacion(
+        psnr_min=config.get("int8_psnr_min", float),
+        ssim_min=config.get("int8_ssim_min", float),
+        carpeta_calibracion=config.get("carpeta_calibracion")
+    )
+
+
+class VarianteRechazada(Exception):
+    """La variante int8 no alcanza los umbrales de calidad configurados"""
+
+
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float("inf") if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def ssim(a, b):
+    """SSIM medio (ventana gaussiana 11x11, sigma 1.5) sobre la luminancia de dos imágenes BGR uint8"""
+    x = cv2.cvtColor(a, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    y = cv2.cvtColor(b, cv2.COLOR_BGR2GRAY).astype(np.float64)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+
+    def filtro(img):
+        return cv2.GaussianBlur(img, (11, 11), 1.5)
+
+    mx, my = filtro(x), filtro(y)
+    vx = filtro(x * x) - mx * mx
+    vy = filtro(y * y) - my * my
+    cxy = filtro(x * y) - mx * my
+    mapa = ((2 * mx * my + c1) * (2 * cxy + c2)) / ((mx * mx + my * my + c1) * (vx + vy + c2))
+    return float(mapa.mean())
+
+
+def _archivos_calibracion(carpeta):
+    if not carpeta or not os.path.isdir(carpeta):
+        return []
+    return [ruta for ruta in sorted(glob.glob(os.path.join(carpeta, "*")))
+            if ruta.lower().endswith(EXTENSIONES_CALIBRACION)]
+
+
+def firma_calibracion(carpeta):
+    """
+    Identifica las imágenes de calibración (nombre, tamaño y fecha de cada archivo, o las
+    sintéticas): cambiar la carpeta o su contenido genera una variante int8 nueva
+    """
+    archivos = _archivos_calibracion(carpeta)
+    if not archivos:
+        return clave_cache("sintética", SEMILLA_PARCHES)[:12]
+    partes = []
+    for ruta in archivos:
+        estado = os.stat(ruta)
+        partes.extend((os.path.abspath(ruta), estado.st_size, estado.st_mtime_ns))
+    return clave_cache(*partes)[:12]
+
+
+def _imagenes_calibracion(carpeta):
+    """Imágenes BGR de la carpeta de calibración o, si no hay, las sintéticas"""
+    imagenes = []
+    for ruta in _archivos_calibracion(carpeta):
+        imagen = cv2.imread(ruta, cv2.IMREAD_COLOR)
+        if imagen is not None:
+            imagenes.append(imagen)
+    if not imagenes:
+        imagenes = [imagen for _, imagen in generar_entradas(["320x240", "640x480"], SEMILLA_PARCHES)]
+    return imagenes
+
+
+def _parches(imagenes, cantidad, rng):
+    """Recortes aleatorios (reproducibles) de LADO_PARCHE píxeles"""
+    parches = []
+    for i in range(cantidad):
+        imagen = imagenes[i % len(imagenes)]
+        alto, ancho = imagen.shape[:2]
+        if alto < LADO_PARCHE or ancho < LADO_PARCHE:
+            imagen = cv2.resize(imagen, (max(ancho, LADO_PARCHE), max(alto, LADO_PARCHE)))
+            alto, ancho = imagen.shape[:2]
+        y = int(rng.integers(0, alto - LADO_PARCHE + 1))
+        x = int(rng.integers(0, ancho - LADO_PARCHE + 1))
+        parches.append(imagen[y:y + LADO_PARCHE, x:x + LADO_PARCHE])
+    return parches
+
+
+def _a_tensor(parche):
+    """BGR uint8 (H, W, 3) → tensor RGB float (1, 3, H, W) en [0, 1], como RealESRGANer"""
+    return torch.from_numpy(np.ascontiguousarray(parche[..., ::-1])).permute(2, 0, 1)[None].float().div_(255.0)
+
+
+def _a_imagen(tensor):
+    salida = tensor.detach().float().clamp_(0, 1).mul_(255.0).round_().to(torch.uint8)
+    return np.ascontiguousarray(salida[0].permute(1, 2, 0).numpy()[..., ::-1])
+
+
+def _elegir_motor():
+    """Motor de operadores cuantizados de CPU (hay que fijarlo antes de cuantizar y de cargar)"""
+    motores = torch.backends.quantized.supported_engines
+    torch.backends.quantized.engine = "x86" if "x86" in motores else "fbgemm"
+
+
+def cuantizar(red_fp32, muestras):
+    """
+    Cuantización estática int8 (FX graph mode, backend x86/fbgemm) calibrada con `muestras`.
+
+    Returns:
+        Módulo TorchScript con la red cuantizada (acepta y devuelve float32)
+    """
+    from torch.ao.quantization import get_default_qconfig_mapping
+    from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+
+    _elegir_motor()
+    red = copy.deepcopy(red_fp32).cpu().eval()
+    mapeo = get_default_qconfig_mapping(torch.backends.quantized.engine)
+    preparada = prepare_fx(red, mapeo, (muestras[0],))
+    with torch.no_grad():
+        for muestra in muestras:
+            preparada(muestra)
+        cuantizada = convert_fx(preparada)
+        return torch.jit.freeze(torch.jit.trace(cuantizada, muestras[0], check_trace=False).eval())
+
+
+def evaluar(red_fp32, red_int8, parches):
+    """PSNR y SSIM medios de la salida int8 frente a la fp32 sobre los parches de evaluación"""
+    valores_psnr, valores_ssim = [], []
+    with torch.no_grad():
+        for parche in parches:
+            entrada = _a_tensor(parche)
+            referencia = _a_imagen(red_fp32(entrada))
+            candidata = _a_imagen(red_int8(entrada))
+            valores_psnr.append(min(psnr(referencia, candidata), 100.0))
+            valores_ssim.append(ssim(referencia, candidata))
+    return round(float(np.mean(valores_psnr)), 2), round(float(np.mean(valores_ssim)), 4)
+
+
+def _rutas_variante(ruta_pesos, firma):
+    version = torch.__version__.split("+")[0]
+    base = f"{os.path.splitext(ruta_pesos)[0]}.int8-{version}-{firma}"
+    return base + ".pt", base + ".json"
+
+
+def obtener_variante_int8(nombre_modelo, red_fp32, ruta_pesos, config):
+    """
+    Devuelve la red int8 del modelo, creándola y guardándola junto a los pesos la primera vez.
+
+    Las métricas de calidad se guardan con el artefacto, así que cambiar los umbrales
+    no obliga a recalibrar: solo se vuelve a comparar. El artefacto y sus métricas
+    dependen de la versión de torch y de las imágenes de calibración (firma_calibracion).
+
+    Raises:
+        VarianteRechazada: Si PSNR o SSIM quedan por debajo de los umbrales
+    """
+    _elegir_motor()
+    firma = firma_calibracion(config.carpeta_calibracion)
+    ruta_modelo, ruta_metricas = _rutas_variante(ruta_pesos, firma)
+    red_int8, metricas = None, None
+
+    if (os.path.exists(ruta_modelo) and os.path.exists(ruta_metricas)
+            and os.path.getmtime(ruta_modelo) >= os.path.getmtime(ruta_pesos)):
+        try:
+            red_int8 = torch.jit.load(ruta_modelo, map_location="cpu")
+            with open(ruta_metricas, encoding="utf-8") as f:
+                metricas = json.load(f)
+        except Exception as e:
+            print(f"Advertencia: variante int8 en caché inválida ({e}); se vuelve a generar")
+            red_int8 = None
+
+    if red_int8 is None:
+        print(f"Generando variante int8 de {nombre_modelo} (solo la primera vez)...")
+        rng = np.random.default_rng(SEMILLA_PARCHES)
+        imagenes = _imagenes_calibracion(config.carpeta_calibracion)
+        calibracion = [_a_tensor(p) for p in _parches(imagenes, PARCHES_CALIBRACION, rng)]
+        evaluacion = _parches(imagenes, PARCHES_EVALUACION, rng)
+
+        red_int8 = cuantizar(red_fp32, calibracion)
+        valor_psnr, valor_ssim = evaluar(red_fp32, red_int8, evaluacion)
+        metricas = {"modelo": nombre_modelo, "torch": torch.__version__, "psnr": valor_psnr, "ssim": valor_ssim,
+                    "calibracion": config.carpeta_calibracion or "sintética", "firma_calibracion": firma}
+        try:
+            torch.jit.save(red_int8, ruta_modelo)
+            with open(ruta_metricas, "w", encoding="utf-8") as f:
+                json.dump(metricas, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"Advertencia: no se pudo guardar la variante int8 ({e})")
+
+    if metricas["psnr"] < config.psnr_min or metricas["ssim"] < config.ssim_min:
+        raise VarianteRechazada(
+            f"La variante int8 de {nombre_modelo} no alcanza la calidad mínima: "
+            f"PSNR {metricas['psnr']} dB (mín. {config.psnr_min}), "
+            f"SSIM {metricas['ssim']} (mín. {config.ssim_min})"
+        )
+    print(f"Variante int8 de {nombre_modelo}: PSNR {metricas['psnr']} dB, SSIM {metricas['ssim']}")
+    return red_int8
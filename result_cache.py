@@ -0,0 +1,147 @@
+# result_cache.py
+import os
+import json
+import hashlib
+import threading
+from datetime import datetime
+
+NOMBRE_MANIFIESTO = ".mejora_cache.json"
+NOMBRE_DIARIO = ".mejora_cache.diario.jsonl"
+VERSION_MANIFIESTO = 1
+# Entradas del diario a partir de las cuales se compacta en el manifiesto
+MAX_DIARIO = 500
+
+
+def hash_contenido(datos):
+    """SHA-256 de los bytes de un archivo de entrada"""
+    return hashlib.sha256(datos).hexdigest()
+
+
+def clave_cache(*partes):
+    """Clave de caché a partir del hash del contenido y los parámetros que afectan al resultado"""
+    return hashlib.sha256("|".join(str(p) for p in partes).encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    def __init__(self, carpeta_salida):
+        """
+        Manifiesto de resultados direccionado por contenido, guardado en la carpeta de salida.
+
+        Registra dos tipos de entradas:
+            - resultados: imagen ya mejorada y guardada, por hash de entrada + parámetros
+            - texto: veredicto de detección de texto, por hash de entrada + ajustes de detección
+              (así un cambio solo de nitidez no vuelve a ejecutar Tesseract)
+
+        Cada registro se agrega como una línea al diario (.jsonl) en el momento, de modo
+        que un lote interrumpido se retoma donde quedó sin reescribir todo el manifiesto
+        por imagen. `guardar()` vuelca el diario en el manifiesto de forma atómica: se
+        llama al terminar el lote y cada MAX_DIARIO registros.
+
+        Args:
+            carpeta_salida (str): Carpeta donde viven las salidas y el manifiesto
+        """
+        self.carpeta_salida = carpeta_salida
+        self.ruta = os.path.join(carpeta_salida, NOMBRE_MANIFIESTO)
+        self.ruta_diario = os.path.join(carpeta_salida, NOMBRE_DIARIO)
+        self._lock = threading.Lock()
+        self._datos = {"version": VERSION_MANIFIESTO, "resultados": {}, "texto": {}}
+        self._diario = None
+        self._en_diario = 0
+        self._cargar()
+
+    def _cargar(self):
+        if os.path.exists(self.ruta):
+            try:
+                with open(self.ruta, encoding="utf-8") as f:
+                    datos = json.load(f)
+                if datos.get("version") == VERSION_MANIFIESTO:
+                    self._datos["resultados"].update(datos.get("resultados", {}))
+                    self._datos["texto"].update(datos.get("texto", {}))
+            except Exception as e:
+                print(f"Advertencia: no se pudo leer el manifiesto de caché ({e}); se empieza de cero")
+
+        # Registros posteriores al último volcado (p. ej. de un lote interrumpido)
+        if not os.path.exists(self.ruta_diario):
+            return
+        try:
+            with open(self.ruta_diario, encoding="utf-8") as f:
+                for linea in f:
+                    try:
+                        registro = json.loads(linea)
+                    except ValueError:
+                        continue  # Última línea a medio escribir
+                    self._datos[registro["tipo"]][registro["clave"]] = registro["entrada"]
+                    self._en_diario += 1
+        except Exception as e:
+            print(f"Advertencia: no se pudo leer el diario de caché ({e})")
+
+    def guardar(self):
+        """Vuelca todo al manifiesto (archivo temporal + reemplazo atómico) y vacía el diario"""
+        with self._lock:
+            temporal = self.ruta + ".tmp"
+            try:
+                with open(temporal, "w", encoding="utf-8") as f:
+                    json.dump(self._datos, f, ensure_ascii=False)
+                os.replace(temporal, self.ruta)
+                # Recién con el manifiesto reemplazado: si se corta acá, el diario se vuelve a aplicar sin efecto
+                if self._diario is not None:
+                    self._diario.close()
+                    self._diario = None
+                if os.path.exists(self.ruta_diario):
+                    os.remove(self.ruta_diario)
+                self._en_diario = 0
+            except Exception as e:
+                print(f"Error al guardar el manifiesto de caché: {e}")
+
+    def _registrar(self, tipo, clave, entrada):
+        """Anota la entrada en memoria y en el diario; compacta si el diario creció demasiado"""
+        with self._lock:
+            self._datos[tipo][clave] = entrada
+            try:
+                if self._diario is None:
+                    self._diario = open(self.ruta_diario, "a", encoding="utf-8")
+                self._diario.write(json.dumps({"tipo": tipo, "clave": clave, "entrada": entrada},
+                                              ensure_ascii=False) + "\n")
+                self._diario.flush()
+                self._en_diario += 1
+            except Exception as e:
+                print(f"Error al escribir el diario de caché: {e}")
+            compactar = self._en_diario >= MAX_DIARIO
+        if compactar:
+            self.guardar()
+
+    def buscar_resultado(self, clave):
+        """
+        Devuelve la entrada registrada para `clave` si su archivo de salida todavía existe.
+
+        Returns:
+            dict con 'salida', 'contiene_texto', 'etapa_texto', 'nivel_nitidez', 'tile', o None
+        """
+        with self._lock:
+            entrada = self._datos["resultados"].get(clave)
+        if entrada and os.path.exists(os.path.join(self.carpeta_salida, entrada["salida"])):
+            return entrada
+        return None
+
+    def registrar_resultado(self, clave, nombre_entrada, nombre_salida, contiene_texto,
+                            etapa_texto, nivel_nitidez, tile):
+        self._registrar("resultados", clave, {
+            "entrada": nombre_entrada,
+            "salida": nombre_salida,
+            "contiene_texto": contiene_texto,
+            "etapa_texto": etapa_texto,
+            "nivel_nitidez": nivel_nitidez,
+            "tile": tile,
+            "completado": datetime.now().isoformat(timespec="seconds")
+        })
+
+    def buscar_texto(self, clave):
+        """Devuelve (contiene_texto, etapa) si el veredicto ya fue calculado, o None"""
+        with self._lock:
+            entrada = self._datos["texto"].get(clave)
+        if entrada is None:
+            return None
+        return entrada["contiene_texto"], entrada["etapa"]
+
+    def registrar_texto(self, clave, contiene_texto, etapa):
+        self._registrar("texto", clave, {"contiene_texto": contiene_texto, "etapa": etapa})
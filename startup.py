@@ -0,0 +1,109 @@
+# startup.py
+import time
+import threading
+import importlib
+
+from model_registry import modelos_disponibles
+
+# Referencia para medir el arranque: se toma al importar este módulo, lo primero que hace main.py
+INICIO = time.perf_counter()
+
+
+class MedicionArranque:
+    """Segundos desde INICIO hasta cada hito del arranque (se registra solo la primera vez)"""
+
+    def __init__(self):
+        self._hitos = {}
+        self._lock = threading.Lock()
+
+    def marcar(self, hito):
+        """Registra el hito si es la primera vez. Devuelve sus segundos, o None si ya estaba"""
+        with self._lock:
+            if hito in self._hitos:
+                return None
+            self._hitos[hito] = round(time.perf_counter() - INICIO, 3)
+            return self._hitos[hito]
+
+    def segundos(self, hito):
+        return self._hitos.get(hito)
+
+    def resumen(self):
+        with self._lock:
+            return dict(self._hitos)
+
+
+ARRANQUE = MedicionArranque()
+
+
+class EnhancerDiferido:
+    def __init__(self, crear, modelo=None, precargar=()):
+        """
+        Construye el ImageEnhancer en un hilo de fondo mientras el usuario recorre los
+        diálogos: importar torch/basicsr y cargar los pesos no demora la primera ventana.
+
+        Se usa como el ImageEnhancer: cualquier atributo espera (fuera del hilo de Tk,
+        idealmente) a que esté listo. `available_models` responde enseguida.
+
+        Args:
+            crear (callable): Devuelve el ImageEnhancer; los imports pesados van adentro
+            modelo (str): Modelo a cargar de antemano (el último usado)
+            precargar (tuple): Módulos a importar después, también en segundo plano (p. ej. 'pipeline')
+        """
+        self._crear = crear
+        self._modelo = modelo
+        self._precargar = precargar
+        self._enhancer = None
+        self._error = None
+        self._listo = threading.Event()
+        threading.Thread(target=self._construir, name="precarga-modelo", daemon=True).start()
+
+    def _construir(self):
+        try:
+            self._enhancer = self._crear()
+        except Exception as e:
+            self._error = e
+            self._listo.set()
+            return
+        ARRANQUE.marcar("enhancer_creado")
+        if self._modelo:
+            try:
+                # Antes de publicarlo: nadie más lo usa todavía (la vista previa espera en obtener())
+                self._enhancer.load_model(self._modelo)
+                ARRANQUE.marcar("modelo_cargado")
+            except Exception as e:
+                # Se vuelve a intentar (y se informa) al cargar el modelo para el lote
+                print(f"Advertencia: no se pudo precargar el modelo {self._modelo} ({e})")
+        self._listo.set()
+        for modulo in self._precargar:
+            try:
+                importlib.import_module(modulo)
+            except Exception as e:
+                print(f"Advertencia: no se pudo precargar {modulo} ({e})")
+
+    @property
+    def listo(self):
+        return self._listo.is_set()
+
+    def obtener(self):
+        """El ImageEnhancer, esperando a que termine de construirse"""
+        self._listo.wait()
+        if self._error is not None:
+            raise RuntimeError(f"No se pudo iniciar el mejorador: {self._error}") from self._error
+        return self._enhancer
+
+    @property
+    def available_models(self):
+        return self._enhancer.available_models if self._enhancer is not None else modelos_disponibles()
+
+    def __getattr__(self, nombre):
+        # Solo se llama para lo que no define esta clase: se delega en el ImageEnhancer
+        if nombre.startswith("_"):
+            raise AttributeError(nombre)
+        return getattr(self.obtener(), nombre)
+
+    def __setattr__(self, nombre, valor):
+        # p. ej. BatchPipeline ajusta memoria_max_mb y control en el ImageEnhancer
+        if nombre.startswith("_"):
+            object.__setattr__(self, nombre, valor)
+        else:
+            setattr(self.obtener(), nombre, valor)
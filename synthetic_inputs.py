@@ -0,0 +1,47 @@
+# synthetic_inputs.py
+"""
+Entradas sintéticas reproducibles (fotos con ruido, páginas con texto renderizado).
+
+Las usan el benchmark y, cuando no hay carpeta de calibración, la cuantización int8.
+"""
+import cv2
+import numpy as np
+
+
+def generar_foto(ancho, alto, rng):
+    """Imagen tipo fotografía: gradientes suaves más ruido de distintas escalas"""
+    y, x = np.mgrid[0:alto, 0:ancho].astype(np.float32)
+    base = np.stack([
+        127 + 100 * np.sin(x / max(ancho, 1) * np.pi * 2 + fase) * np.cos(y / max(alto, 1) * np.pi + fase)
+        for fase in rng.uniform(0, np.pi, 3)
+    ], axis=-1)
+    ruido_grueso = cv2.resize(rng.normal(0, 40, (max(alto // 16, 1), max(ancho // 16, 1), 3)).astype(np.float32),
+                              (ancho, alto), interpolation=cv2.INTER_CUBIC)
+    ruido_fino = rng.normal(0, 12, (alto, ancho, 3)).astype(np.float32)
+    return np.clip(base + ruido_grueso + ruido_fino, 0, 255).astype(np.uint8)
+
+
+def generar_pagina_texto(ancho, alto, rng):
+    """Página clara con líneas de texto renderizado"""
+    imagen = np.full((alto, ancho, 3), 235, dtype=np.uint8)
+    palabras = ["Informe", "procesamiento", "imagen", "resolución", "documento",
+                "archivo", "página", "texto", "muestra", "calidad", "escaneo"]
+    escala = max(ancho / 1000, 0.4)
+    paso = int(40 * escala) + 4
+    for y in range(paso, alto - 10, paso):
+        linea = " ".join(rng.choice(palabras, size=6))
+        cv2.putText(imagen, linea, (int(20 * escala), y), cv2.FONT_HERSHEY_SIMPLEX,
+                    escala, (20, 20, 20), max(int(2 * escala), 1), cv2.LINE_AA)
+    ruido = rng.normal(0, 6, imagen.shape)
+    return np.clip(imagen + ruido, 0, 255).astype(np.uint8)
+
+
+def generar_entradas(resoluciones, semilla):
+    """Devuelve una lista de (nombre, imagen) reproducible para la semilla dada"""
+    rng = np.random.default_rng(semilla)
+    entradas = []
+    for resolucion in resoluciones:
+        ancho, alto = (int(v) for v in resolucion.lower().split("x"))
+        entradas.append((f"foto_{ancho}x{alto}", generar_foto(ancho, alto, rng)))
+        entradas.append((f"texto_{ancho}x{alto}", generar_pagina_texto(ancho, alto, rng)))
+    return entradas
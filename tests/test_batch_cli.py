@@ -0,0 +1,20 @@
+# test_batch_cli.py
+import sys
+
+import pytest
+
+import batch_cli
+
+
+@pytest.mark.parametrize("modo", ["escala", "lado_max", "mp_max"])
+def test_salida_modo_sin_valor_es_un_error(tmp_path, monkeypatch, capsys, modo):
+    monkeypatch.chdir(tmp_path)                     # Sin el .ini del repositorio
+    monkeypatch.setattr(sys, "stdout", sys.stdout)  # main() redirige stdout a stderr
+    (tmp_path / "entrada").mkdir()
+
+    with pytest.raises(SystemExit) as salida:
+        batch_cli.main([str(tmp_path / "entrada"), str(tmp_path / "salida"), "--salida-modo", modo])
+
+    assert salida.value.code == 2
+    assert "--salida-valor" in capsys.readouterr().err
+    assert not (tmp_path / "salida").exists()
@@ -0,0 +1,142 @@
+# test_node_coordinator.py
+"""
+Varios procesos reparten una misma carpeta con node_coordinator: cada imagen se
+completa una sola vez, el reclamo de un nodo caído se retoma al vencer y uno que
+estuvo detenido abandona la imagen retomada sin tocar el reclamo del nuevo dueño.
+"""
+import os
+import sys
+import json
+import time
+import signal
+import subprocess
+from collections import Counter
+
+import pytest
+
+from node_coordinator import SUFIJO_HECHO, SUFIJO_RECLAMO, _marca
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+IMAGENES = [f"img_{i:02d}.png" for i in range(12)]
+NODOS = 3
+LATIDO_S = 0.1
+EXPIRA_S = 1.0
+
+# Cada nodo anota en su propio archivo las imágenes que procesó. Con "cae", el nodo
+# reclama la primera imagen y termina sin soltarla ni renovarla (como un equipo que se
+# apaga). Con "atascado", la reclama y la "procesa" consultando vigente() hasta que el
+# test lo detiene y lo reanuda. La primera imagen demora DEMORA_PRIMERA segundos
+NODO = """
+import os, sys, time, json
+from node_coordinator import CoordinadorNodos
+carpeta, nodo, latido, expira, modo, registro = sys.argv[1:]
+archivos = json.loads(os.environ["IMAGENES"])
+demora_primera = float(os.environ.get("DEMORA_PRIMERA", "0.05"))
+coordinador = CoordinadorNodos(carpeta, nodo, latido=float(latido), expira=float(expira))
+with open(registro, "w", encoding="utf-8") as f:
+    for archivo in coordinador.archivos_reclamados(archivos):
+        if modo == "cae":
+            print(archivo, flush=True)
+            os._exit(1)
+        if modo == "atascado":
+            print(archivo, flush=True)
+            fin = time.monotonic() + 30
+            while coordinador.vigente(archivo) and time.monotonic() < fin:
+                time.sleep(0.05)
+            print("abandonada" if not coordinador.vigente(archivo) else "sin retomar", flush=True)
+            break
+        time.sleep(demora_primera if archivo == archivos[0] else 0.05)
+        if coordinador.vigente(archivo):
+            f.write(archivo + "\\n")
+            f.flush()
+            coordinador.completar(archivo)
+coordinador.cerrar()
+"""
+
+
+def _lanzar(carpeta, nodo, modo, registro, **entorno_extra):
+    entorno = dict(os.environ, IMAGENES=json.dumps(IMAGENES), **entorno_extra)
+    return subprocess.Popen(
+        [sys.executable, "-c", NODO, carpeta, nodo, str(LATIDO_S), str(EXPIRA_S), modo, registro],
+        cwd=RAIZ, env=entorno, stdout=subprocess.PIPE, text=True)
+
+
+def _preparar(tmp_path):
+    entrada = tmp_path / "entrada"
+    entrada.mkdir()
+    for nombre in IMAGENES:
+        (entrada / nombre).write_bytes(b"")
+    return entrada
+
+
+def _procesadas(tmp_path):
+    procesadas = Counter()
+    for i in range(NODOS):
+        procesadas.update((tmp_path / f"nodo{i}.txt").read_text(encoding="utf-8").split())
+    return procesadas
+
+
+def _dueno(reclamo):
+    try:
+        with open(reclamo, encoding="utf-8") as f:
+            return json.load(f)["nodo"]
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def _comprobar_terminadas(entrada):
+    for nombre in IMAGENES:
+        assert os.path.exists(_marca(str(entrada / nombre), SUFIJO_HECHO))
+        assert not os.path.exists(_marca(str(entrada / nombre), SUFIJO_RECLAMO))
+    assert not [n for n in os.listdir(entrada) if ".vencido-" in n or ".cerrando-" in n]
+
+
+def test_cada_imagen_una_vez_y_reclamo_vencido_retomado(tmp_path):
+    entrada = _preparar(tmp_path)
+
+    caido = _lanzar(str(entrada), "caido", "cae", str(tmp_path / "caido.txt"))
+    abandonada = caido.communicate(timeout=30)[0].strip()
+    assert abandonada == IMAGENES[0]
+    assert os.path.exists(_marca(str(entrada / abandonada), SUFIJO_RECLAMO))
+
+    procesos = [_lanzar(str(entrada), f"nodo{i}", "normal", str(tmp_path / f"nodo{i}.txt"))
+                for i in range(NODOS)]
+    for proceso in procesos:
+        proceso.communicate(timeout=60)
+        assert proceso.returncode == 0
+
+    assert _procesadas(tmp_path) == Counter(IMAGENES)      # Todas, y cada una exactamente una vez
+    _comprobar_terminadas(entrada)
+
+
+@pytest.mark.skipif(not hasattr(signal, "SIGSTOP"), reason="requiere SIGSTOP/SIGCONT")
+def test_nodo_detenido_abandona_la_imagen_retomada(tmp_path):
+    entrada = _preparar(tmp_path)
+    reclamo = _marca(str(entrada / IMAGENES[0]), SUFIJO_RECLAMO)
+
+    atascado = _lanzar(str(entrada), "atascado", "atascado", str(tmp_path / "atascado.txt"))
+    assert atascado.stdout.readline().strip() == IMAGENES[0]
+    os.kill(atascado.pid, signal.SIGSTOP)       # Vivo pero sin latir, como un equipo suspendido
+
+    # Quien retome la primera imagen la tiene varios segundos: el detenido vuelve mientras tanto
+    procesos = [_lanzar(str(entrada), f"nodo{i}", "normal", str(tmp_path / f"nodo{i}.txt"), DEMORA_PRIMERA="3")
+                for i in range(NODOS)]
+    limite = time.monotonic() + 20
+    while _dueno(reclamo) in (None, "atascado"):
+        assert time.monotonic() < limite, "nadie retomó el reclamo vencido"
+        time.sleep(0.02)
+    nuevo_dueno = _dueno(reclamo)
+
+    os.kill(atascado.pid, signal.SIGCONT)
+    salida = atascado.communicate(timeout=30)[0]
+    assert "abandonada" in salida
+    # Al cerrar no soltó ni renovó el reclamo ajeno: sigue siendo del nuevo dueño
+    assert _dueno(reclamo) == nuevo_dueno
+
+    for proceso in procesos:
+        proceso.communicate(timeout=60)
+        assert proceso.returncode == 0
+
+    assert (tmp_path / "atascado.txt").read_text(encoding="utf-8") == ""
+    assert _procesadas(tmp_path) == Counter(IMAGENES)
+    _comprobar_terminadas(entrada)
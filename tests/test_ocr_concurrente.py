@@ -0,0 +1,78 @@
+# test_ocr_concurrente.py
+"""
+Con varios hilos de lectura, las pasadas de OCR de distintas imágenes se solapan
+en el pool de OCR (cada imagen sigue recorriendo sus pasadas de a una).
+"""
+import queue
+import threading
+import time
+
+import cv2
+import pytest
+
+pytest.importorskip("pytesseract")
+
+import ocr_pool
+from ocr_pool import OCRPool
+from pipeline import BatchPipeline, _FIN
+from synthetic_inputs import generar_entradas
+
+DEMORA_S = 0.15
+
+
+class Simultaneas:
+    """Cuenta cuántas pasadas de OCR corren a la vez"""
+
+    def __init__(self):
+        self.actuales = 0
+        self.maximo = 0
+        self.pasadas = 0
+        self._lock = threading.Lock()
+
+    def reconocer(self, imagen, config):
+        with self._lock:
+            self.actuales += 1
+            self.pasadas += 1
+            self.maximo = max(self.maximo, self.actuales)
+        time.sleep(DEMORA_S)
+        with self._lock:
+            self.actuales -= 1
+        return {"text": [], "conf": []}      # Sin palabras: la imagen recorre todas las pasadas
+
+
+def _leer_todo(tmp_path, monkeypatch, hilos_lectura):
+    simultaneas = Simultaneas()
+    monkeypatch.setattr(OCRPool, "_reconocer", lambda pool, imagen, config: simultaneas.reconocer(imagen, config))
+    monkeypatch.setattr(ocr_pool, "_pool_global", None)
+
+    paginas = [imagen for nombre, imagen in generar_entradas(["800x600"] * 2, 7) if nombre.startswith("texto")]
+    archivos = []
+    for i, imagen in enumerate(paginas * 2):
+        nombre = f"pagina_{i}.png"
+        cv2.imwrite(str(tmp_path / nombre), imagen)
+        archivos.append(nombre)
+
+    pipeline = BatchPipeline(None, str(tmp_path), str(tmp_path), 1.0, 1.5, True, hilos_lectura=hilos_lectura)
+    pipeline._detenido = threading.Event()
+    cola = queue.Queue()
+    pipeline._etapa_lectura(archivos, cola)
+
+    leidos = []
+    while (trabajo := cola.get_nowait()) is not _FIN:
+        leidos.append(trabajo)
+    ocr_pool._pool_global.cerrar()
+    return simultaneas, archivos, leidos
+
+
+def test_pasadas_de_varias_imagenes_se_solapan(tmp_path, monkeypatch):
+    simultaneas, archivos, leidos = _leer_todo(tmp_path, monkeypatch, hilos_lectura=2)
+
+    assert [t.nombre_archivo for t in leidos] == archivos       # Se encolan en orden
+    assert all(t.etapa_texto == "tesseract" and not t.error for t in leidos)
+    assert simultaneas.pasadas == len(archivos) * 3
+    assert simultaneas.maximo >= 2
+
+
+def test_un_hilo_de_lectura_no_solapa(tmp_path, monkeypatch):
+    simultaneas, _, _ = _leer_todo(tmp_path, monkeypatch, hilos_lectura=1)
+    assert simultaneas.maximo == 1
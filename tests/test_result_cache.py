@@ -0,0 +1,64 @@
+# test_result_cache.py
+"""
+Dos archivos idénticos en subcarpetas distintas: cada uno tiene su propia salida
+replicada y ninguno se da por hecho con la salida del otro.
+"""
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("pytesseract")
+
+from pipeline import BatchPipeline
+from output_policy import PoliticaSalida
+from result_cache import ResultCache
+
+
+class EnhancerSinModelo:
+    """Basta para lotes que solo reducen (la política no usa el modelo)"""
+    memoria_max_mb = 0
+    control = None
+
+    def liberar(self, imagen):
+        pass
+
+
+def _lote(entrada, salida, archivos, borrar=False):
+    pipeline = BatchPipeline(
+        EnhancerSinModelo(), str(entrada), str(salida), 1.0, 1.5, False,
+        formato_salida="png", borrar_originales=borrar, cache=ResultCache(str(salida)),
+        politica_salida=PoliticaSalida("lado_max", 32)
+    )
+    return pipeline.ejecutar(archivos)
+
+
+def test_copias_identicas_en_subcarpetas_distintas(tmp_path):
+    entrada, salida = tmp_path / "entrada", tmp_path / "salida"
+    imagen = np.random.default_rng(3).integers(0, 255, (64, 64, 3), dtype=np.uint8)
+    for carpeta in ("a", "b"):
+        (entrada / carpeta).mkdir(parents=True)
+        cv2.imwrite(str(entrada / carpeta / "foto.png"), imagen)
+    foto_a, foto_b = os.path.join("a", "foto.png"), os.path.join("b", "foto.png")
+
+    primero = _lote(entrada, salida, [foto_a])
+    assert not primero[0].error and not primero[0].desde_cache
+
+    segundo = _lote(entrada, salida, [foto_a, foto_b], borrar=True)
+    por_archivo = {t.nombre_archivo: t for t in segundo}
+    assert por_archivo[foto_a].desde_cache
+    assert not por_archivo[foto_b].desde_cache
+    for archivo in (foto_a, foto_b):
+        trabajo = por_archivo[archivo]
+        assert not trabajo.error
+        assert os.path.dirname(trabajo.nombre_salida) == os.path.dirname(archivo)
+        assert os.path.exists(trabajo.ruta_salida)
+        # El original se borra solo con su propia salida ya escrita
+        assert not os.path.exists(trabajo.ruta_entrada)
+
+    # Y una tercera vez, la copia de b ya tiene su propio resultado en caché
+    cv2.imwrite(str(entrada / "b" / "foto.png"), imagen)
+    tercero = _lote(entrada, salida, [foto_b])
+    assert tercero[0].desde_cache
+    assert os.path.dirname(tercero[0].nombre_salida) == "b"
@@ -0,0 +1,130 @@
+# tiled_writer.py
+import os
+import struct
+
+import cv2
+
+from encoder_pool import ruta_temporal
+
+# Por encima de este tamaño de datos se escribe BigTIFF (offsets de 64 bits)
+LIMITE_TIFF_CLASICO = 2 ** 32 - 2 ** 20
+FILAS_POR_STRIP = 16
+
+# Tipos de campo TIFF
+_SHORT = 3
+_LONG = 4
+_LONG8 = 16
+
+
+class EscritorTiffFranjas:
+    def __init__(self, ruta, alto, ancho, filas_por_strip=FILAS_POR_STRIP):
+        """
+        Escribe una imagen RGB de 8 bits como TIFF sin compresión organizado en strips,
+        recibiéndola de a franjas horizontales: en memoria solo está la franja actual.
+
+        Los píxeles se escriben a continuación del encabezado en el orden en que llegan
+        y el directorio (IFD) con los offsets de los strips se agrega al cerrar. Si los
+        datos superan los 4 GB del TIFF clásico se usa BigTIFF. Todo se escribe en un
+        temporal que recién al cerrar se renombra a `ruta`.
+
+        Args:
+            ruta (str): Archivo de salida
+            alto (int): Filas totales de la imagen
+            ancho (int): Columnas de la imagen
+            filas_por_strip (int): Filas de cada strip (el último puede tener menos)
+        """
+        self.ruta = ruta
+        self.alto = alto
+        self.ancho = ancho
+        self.filas_por_strip = filas_por_strip
+        self.bytes_por_fila = ancho * 3
+        self.big = alto * self.bytes_por_fila > LIMITE_TIFF_CLASICO
+        self.filas_escritas = 0
+        self.temporal = ruta_temporal(ruta)
+        self.archivo = open(self.temporal, "wb")
+        # Encabezado con el offset del IFD en 0: se completa en cerrar()
+        if self.big:
+            self.archivo.write(b"II" + struct.pack("<HHHQ", 43, 8, 0, 0))
+        else:
+            self.archivo.write(b"II" + struct.pack("<HI", 42, 0))
+        self.inicio_datos = self.archivo.tell()
+
+    def escribir(self, franja_bgr):
+        """Agrega filas BGR (uint8, ancho de la imagen) debajo de las ya escritas"""
+        if franja_bgr.shape[1] != self.ancho or franja_bgr.shape[2] != 3:
+            raise ValueError(f"Franja de forma {franja_bgr.shape}; se esperaba ancho {self.ancho} y 3 canales")
+        if self.filas_escritas + len(franja_bgr) > self.alto:
+            raise ValueError("Se recibieron más filas que el alto declarado")
+        self.archivo.write(cv2.cvtColor(franja_bgr, cv2.COLOR_BGR2RGB).data)
+        self.filas_escritas += len(franja_bgr)
+
+    def cerrar(self):
+        """Escribe el IFD, cierra y renombra el temporal a la ruta final. Falla (y descarta) si faltan filas"""
+        try:
+            if self.filas_escritas != self.alto:
+                raise IOError(f"Imagen incompleta: {self.filas_escritas} de {self.alto} filas")
+            self._escribir_ifd()
+            self.archivo.close()
+            os.replace(self.temporal, self.ruta)
+        except BaseException:
+            self.descartar()
+            raise
+
+    def descartar(self):
+        """Cierra sin completar y borra el temporal; `ruta` no se toca"""
+        self.archivo.close()
+        if os.path.exists(self.temporal):
+            os.remove(self.temporal)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if tipo is None:
+            self.cerrar()
+        else:
+            self.descartar()
+
+    def _escribir_ifd(self):
+        strips = -(-self.alto // self.filas_por_strip)
+        bytes_strip = self.filas_por_strip * self.bytes_por_fila
+        offsets = [self.inicio_datos + i * bytes_strip for i in range(strips)]
+        tamanos = [bytes_strip] * (strips - 1) + [(self.alto - (strips - 1) * self.filas_por_strip) * self.bytes_por_fila]
+
+        # Campos de offset: 4 bytes en TIFF clásico, 8 en BigTIFF
+        fmt = "Q" if self.big else "I"
+        tipo_offset = _LONG8 if self.big else _LONG
+        ancho_campo = 8 if self.big else 4
+
+        def fuera_de_linea(datos):
+            """Valor del campo: los datos si entran en él; si no, se escriben aparte y va su offset"""
+            if len(datos) <= ancho_campo:
+                return datos
+            posicion = self.archivo.tell()
+            self.archivo.write(datos)
+            if self.archivo.tell() % 2:
+                self.archivo.write(b"\0")
+            return struct.pack(f"<{fmt}", posicion)
+
+        entradas = [
+            (256, _LONG, 1, struct.pack("<I", self.ancho)),
+            (257, _LONG, 1, struct.pack("<I", self.alto)),
+            (258, _SHORT, 3, fuera_de_linea(struct.pack("<3H", 8, 8, 8))),
+            (259, _SHORT, 1, struct.pack("<H", 1)),             # Sin compresión
+            (262, _SHORT, 1, struct.pack("<H", 2)),             # RGB
+            (273, tipo_offset, strips, fuera_de_linea(struct.pack(f"<{strips}{fmt}", *offsets))),
+            (277, _SHORT, 1, struct.pack("<H", 3)),
+            (278, _LONG, 1, struct.pack("<I", self.filas_por_strip)),
+            (279, tipo_offset, strips, fuera_de_linea(struct.pack(f"<{strips}{fmt}", *tamanos))),
+            (284, _SHORT, 1, struct.pack("<H", 1)),             # Canales intercalados
+        ]
+
+        ifd = self.archivo.tell()
+        self.archivo.write(struct.pack("<Q" if self.big else "<H", len(entradas)))
+        for etiqueta, tipo, cantidad, valor in entradas:
+            self.archivo.write(struct.pack(f"<HH{fmt}", etiqueta, tipo, cantidad) + valor.ljust(ancho_campo, b"\0"))
+        self.archivo.write(struct.pack(f"<{fmt}", 0))      # Sin más IFDs
+
+        # Offset del IFD en el encabezado
+        self.archivo.seek(8 if self.big else 4)
+        self.archivo.write(struct.pack(f"<{fmt}", ifd))
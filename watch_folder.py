@@ -0,0 +1,155 @@
+# watch_folder.py
+import os
+import sys
+import time
+import select
+import struct
+import ctypes
+import ctypes.util
+
+# Constantes de inotify (linux/inotify.h)
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_NONBLOCK = os.O_NONBLOCK
+_EVENTO = struct.Struct("iIII")
+
+
+class _Inotify:
+    """Envoltorio mínimo de inotify vía ctypes (solo Linux)"""
+
+    def __init__(self, carpeta):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = libc.inotify_init1(IN_NONBLOCK)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 falló")
+        if libc.inotify_add_watch(self.fd, os.fsencode(carpeta), IN_CLOSE_WRITE | IN_MOVED_TO) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch falló para {carpeta}")
+
+    def leer(self, timeout):
+        """Espera hasta `timeout` segundos y devuelve los nombres de archivo notificados"""
+        listos, _, _ = select.select([self.fd], [], [], timeout)
+        if not listos:
+            return []
+        try:
+            datos = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        nombres = []
+        desplazamiento = 0
+        while desplazamiento + _EVENTO.size <= len(datos):
+            _, _, _, largo = _EVENTO.unpack_from(datos, desplazamiento)
+            inicio = desplazamiento + _EVENTO.size
+            nombre = datos[inicio:inicio + largo].rstrip(b"\0")
+            if nombre:
+                nombres.append(os.fsdecode(nombre))
+            desplazamiento = inicio + largo
+        return nombres
+
+    def cerrar(self):
+        os.close(self.fd)
+
+
+class VigilanteCarpeta:
+    def __init__(self, carpeta, extensiones, espera_estable=2.0, intervalo=1.0, usar_inotify=True):
+        """
+        Vigila una carpeta y entrega cada imagen nueva cuando terminó de escribirse.
+
+        En Linux usa inotify (IN_CLOSE_WRITE / IN_MOVED_TO); en otros sistemas, o si
+        inotify no está disponible, recorre la carpeta cada `intervalo` segundos.
+        En ambos casos un archivo se considera completo cuando su tamaño y fecha de
+        modificación no cambian durante `espera_estable` segundos.
+
+        Args:
+            carpeta (str): Carpeta a vigilar
+            extensiones (tuple): Extensiones aceptadas (en minúsculas, con punto)
+            espera_estable (float): Segundos sin cambios para dar un archivo por terminado
+            intervalo (float): Período de sondeo / revisión de pendientes
+            usar_inotify (bool): Permite forzar el modo de sondeo
+        """
+        self.carpeta = carpeta
+        self.extensiones = extensiones
+        self.espera_estable = espera_estable
+        self.intervalo = intervalo
+        self._inotify = None
+
+        if usar_inotify and sys.platform.startswith("linux"):
+            try:
+                self._inotify = _Inotify(carpeta)
+            except Exception as e:
+                print(f"Advertencia: inotify no disponible ({e}); se usa sondeo periódico")
+
+    @property
+    def modo(self):
+        return "inotify" if self._inotify else "sondeo"
+
+    def _listar(self):
+        """Imágenes de la carpeta con su firma (tamaño, mtime)"""
+        archivos = {}
+        with os.scandir(self.carpeta) as entradas:
+            for e in entradas:
+                if e.is_file() and e.name.lower().endswith(self.extensiones):
+                    estado = e.stat()
+                    archivos[e.name] = (estado.st_size, estado.st_mtime)
+        return archivos
+
+    def archivos_nuevos(self, debe_detener):
+        """
+        Generador que entrega los nombres de archivo listos para procesar.
+
+        Primero entrega los que ya estaban en la carpeta y luego los que van
+        llegando. Termina cuando `debe_detener()` devuelve True.
+
+        Args:
+            debe_detener (callable): Función sin argumentos consultada en cada ciclo
+        """
+        vistos = {}      # nombre -> firma con la que se entregó
+        pendientes = {}  # nombre -> (tamaño, mtime) de la última revisión
+
+        for nombre in sorted(self._listar()):
+            pendientes[nombre] = None
+
+        try:
+            while not debe_detener():
+                for nombre, firma in self._revisar(pendientes):
+                    vistos[nombre] = firma
+                    yield nombre
+                    if debe_detener():
+                        return
+
+                if self._inotify:
+                    # Cada evento indica un archivo escrito o movido: aunque el nombre
+                    # ya se haya visto, es contenido nuevo
+                    for nombre in self._inotify.leer(self.intervalo):
+                        if nombre.lower().endswith(self.extensiones):
+                            vistos.pop(nombre, None)
+                            pendientes.setdefault(nombre, None)
+                else:
+                    time.sleep(self.intervalo)
+                    for nombre, firma in self._listar().items():
+                        if vistos.get(nombre) != firma:
+                            pendientes.setdefault(nombre, None)
+        finally:
+            if self._inotify:
+                self._inotify.cerrar()
+                self._inotify = None
+
+    def _revisar(self, pendientes):
+        """Devuelve (y saca de `pendientes`) los archivos que ya no cambian, con su firma"""
+        listos = []
+        ahora = time.time()
+        for nombre, previo in list(pendientes.items()):
+            try:
+                estado = os.stat(os.path.join(self.carpeta, nombre))
+            except FileNotFoundError:
+                del pendientes[nombre]
+                continue
+
+            actual = (estado.st_size, estado.st_mtime)
+            if actual == previo and estado.st_size > 0 and ahora - estado.st_mtime >= self.espera_estable:
+                del pendientes[nombre]
+                listos.append((nombre, actual))
+            else:
+                pendientes[nombre] = actual
+        return sorted(listos)